@@ -0,0 +1,381 @@
+"""
+Admission control in front of the agent pipeline.
+
+Each worker runs at most ADMISSION_SLOTS pipelines at once. Bulk work
+(batch items) may hold at most ADMISSION_BULK_SLOTS of them, so some
+capacity always stays free for interactive requests (/api/enhance and its
+stream). Work that finds no free slot waits in a per-client queue:
+
+- interactive queues are always served before bulk ones;
+- within a priority, clients share the slots by weighted fair queueing
+  (start-time fair queueing, weights from ADMISSION_CLIENT_WEIGHTS, 1 by
+  default), so a client with a deep backlog cannot starve the others;
+- queues are bounded (ADMISSION_MAX_QUEUE interactive requests per worker,
+  ADMISSION_MAX_QUEUE_PER_CLIENT per client, ADMISSION_MAX_BULK_QUEUE batch
+  items). Bulk work has no per-client bound: a client's second batch
+  queues behind its first under the client's fair-queueing tags, so it
+  cannot delay other clients' batches. An interactive request waits at
+  most ADMISSION_MAX_WAIT seconds, or less if its deadline is sooner. Work
+  over a limit is rejected at once with AdmissionRejected, which the
+  routes answer with 503 and Retry-After.
+
+Interactive requests wait in their own thread (or asyncio task). Bulk work
+is handed to an executor only once it is granted a slot, so queued batch
+items hold no threads. The ASGI app and the Flask routes it delegates to
+share one controller per process.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+from config import Config
+import metrics
+from agents.deadline import remaining, DeadlineExceeded
+
+PRIORITIES = ('interactive', 'bulk')  # served in this order
+
+
+class AdmissionRejected(Exception):
+    """No slot can be granted now; the client should retry after retry_after seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f'Server is busy ({reason.replace("_", " ")}); retry in {math.ceil(retry_after)}s')
+
+
+def client_id(headers, remote_addr: Optional[str]) -> str:
+    """Who the work is queued for: API key (hashed), then X-User-ID, then client address"""
+    api_key = headers.get('x-api-key')
+    if api_key:
+        return 'key:' + hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+    user = headers.get('x-user-id')
+    if user:
+        return 'user:' + user.strip()[:64]
+    if Config.ADMISSION_TRUST_FORWARDED:
+        forwarded = headers.get('x-forwarded-for', '').split(',')[0].strip()
+        if forwarded:
+            return 'ip:' + forwarded
+    return f'ip:{remote_addr or "unknown"}'
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """'user:alice=2,ip:10.0.0.9=0.5' -> {client id: weight}"""
+    weights = {}
+    for item in spec.split(','):
+        client, _, weight = item.strip().rpartition('=')
+        if client:
+            weights[client] = max(0.01, float(weight))
+    return weights
+
+
+class Ticket:
+    """One unit of admitted (or queued) work; release it once the work is done"""
+
+    def __init__(self, controller: 'AdmissionController', client: str, priority: str):
+        self.controller = controller
+        self.client = client
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.granted_at = None
+        self.released = False
+        self.start_tag = 0.0
+        self._wake = None  # set by the waiter: called once the slot is granted
+
+    @property
+    def wait(self) -> float:
+        """Seconds spent queued before the slot was granted"""
+        return (self.granted_at or time.monotonic()) - self.enqueued
+
+    @property
+    def wait_ms(self) -> float:
+        return round(self.wait * 1000, 1)
+
+    def headers(self) -> Dict[str, str]:
+        """Response headers exposing the queue wait"""
+        return {'X-Queue-Wait-Ms': f'{self.wait_ms:.0f}', 'Server-Timing': f'queue;dur={self.wait_ms}'}
+
+    def release(self):
+        self.controller.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdmissionController:
+    """Per-process slots shared by priority, then by weighted fair queueing across clients"""
+
+    def __init__(self, slots: int, bulk_slots: int, max_queue: int, max_queue_per_client: int,
+                 max_bulk_queue: int, max_wait: float, weights: Dict[str, float] = None, enabled: bool = True):
+        self.enabled = enabled
+        self.slots = max(1, slots)
+        self.bulk_slots = max(1, min(bulk_slots, self.slots))
+        self.max_queue = {'interactive': max_queue, 'bulk': max_bulk_queue}
+        # No client may fill more than its share of the interactive queue; fair
+        # queueing already keeps one client's batches from delaying the others'
+        self.max_queue_per_client = {'interactive': max_queue_per_client, 'bulk': None}
+        self.max_wait = max_wait
+        self.weights = weights or {}
+        self.rejected = 0
+        self._running = {priority: 0 for priority in PRIORITIES}
+        self._queues = {priority: {} for priority in PRIORITIES}   # client -> deque of tickets
+        self._finish = {priority: {} for priority in PRIORITIES}   # client -> finish tag of its last ticket
+        self._virtual = {priority: 0.0 for priority in PRIORITIES}
+        self._queued = {priority: 0 for priority in PRIORITIES}
+        self._service_seconds = Config.SERVER_UPSTREAM_LATENCY  # EWMA of time a slot is held
+        self._lock = threading.Lock()
+
+    # -- scheduling (caller holds the lock) --
+
+    def _has_room(self, priority: str) -> bool:
+        if not self.enabled:
+            return True
+        if sum(self._running.values()) >= self.slots:
+            return False
+        return priority == 'interactive' or self._running['bulk'] < self.bulk_slots
+
+    def _retry_after(self) -> float:
+        """Rough time for the current queue to drain through the slots"""
+        queued = sum(self._queued.values())
+        return max(1.0, (queued + 1) * self._service_seconds / self.slots)
+
+    def _reject(self, reason: str, priority: str):
+        self.rejected += 1
+        metrics.inc('admission_rejections_total', priority=priority, reason=reason)
+        raise AdmissionRejected(reason, self._retry_after())
+
+    def _check_room(self, client: str, priority: str, count: int):
+        """Raise AdmissionRejected unless count more tickets fit the queues"""
+        if self._queued[priority] + count > self.max_queue[priority]:
+            self._reject('queue_full', priority)
+        limit = self.max_queue_per_client[priority]
+        queue = self._queues[priority].get(client)
+        if limit is not None and (len(queue) if queue else 0) + count > limit:
+            self._reject('client_queue_full', priority)
+
+    def _free(self, priority: str) -> int:
+        """Slots work of this priority could be granted right now"""
+        if not self.enabled:
+            return self.slots
+        # Nothing may overtake work already waiting at this priority or above
+        if any(self._queued[p] for p in PRIORITIES[:PRIORITIES.index(priority) + 1]):
+            return 0
+        free = self.slots - sum(self._running.values())
+        if priority == 'bulk':
+            free = min(free, self.bulk_slots - self._running['bulk'])
+        return max(0, free)
+
+    def _admit(self, client: str, priority: str) -> Ticket:
+        """Grant a slot now, or queue a ticket for one (bounds are checked by the caller)"""
+        ticket = Ticket(self, client, priority)
+        if self._free(priority):
+            self._grant(ticket)
+            return ticket
+
+        weight = self.weights.get(client, 1.0)
+        start = max(self._virtual[priority], self._finish[priority].get(client, 0.0))
+        self._finish[priority][client] = start + 1.0 / weight
+        ticket.start_tag = start
+        self._queues[priority].setdefault(client, deque()).append(ticket)
+        self._queued[priority] += 1
+        metrics.inc('in_flight', 1, kind=f'admission_queued_{priority}')
+        return ticket
+
+    def _grant(self, ticket: Ticket):
+        ticket.granted_at = time.monotonic()
+        self._running[ticket.priority] += 1
+        metrics.observe('queue_wait_seconds', ticket.wait, pool=f'admission_{ticket.priority}')
+
+    def _unqueue(self, ticket: Ticket):
+        queue = self._queues[ticket.priority][ticket.client]
+        queue.remove(ticket)
+        if not queue:
+            # An idle client starts again from the virtual time, without banked credit
+            del self._queues[ticket.priority][ticket.client]
+            del self._finish[ticket.priority][ticket.client]
+        self._queued[ticket.priority] -= 1
+        metrics.inc('in_flight', -1, kind=f'admission_queued_{ticket.priority}')
+
+    def _dispatch(self) -> List[Ticket]:
+        """Grant free slots to the next queued tickets; returns them for waking"""
+        granted = []
+        for priority in PRIORITIES:
+            queues = self._queues[priority]
+            while queues and self._has_room(priority):
+                # The head with the smallest start tag goes next
+                ticket = min((queue[0] for queue in queues.values()), key=lambda t: t.start_tag)
+                self._unqueue(ticket)
+                self._virtual[priority] = ticket.start_tag
+                self._grant(ticket)
+                granted.append(ticket)
+            if queues:
+                break  # lower priorities wait until this one has drained
+        return granted
+
+    def _withdraw(self, ticket: Ticket) -> bool:
+        """Take a waiting ticket out of its queue; False if it was granted meanwhile"""
+        with self._lock:
+            if ticket.granted_at is not None:
+                return False
+            self._unqueue(ticket)
+            self.rejected += 1
+            metrics.inc('admission_rejections_total', priority=ticket.priority, reason='wait_timeout')
+            return True
+
+    def _wait_timeout(self) -> float:
+        left = remaining()
+        return self.max_wait if left is None else min(self.max_wait, left)
+
+    def _timed_out(self, timeout: float):
+        if timeout < self.max_wait:
+            raise DeadlineExceeded()
+        with self._lock:
+            retry_after = self._retry_after()
+        raise AdmissionRejected('wait_timeout', retry_after)
+
+    # -- public API --
+
+    def acquire(self, client: str, priority: str = 'interactive') -> Ticket:
+        """Block until a slot is granted; raises AdmissionRejected or DeadlineExceeded"""
+        event = threading.Event()
+        with self._lock:
+            if not self._free(priority):
+                self._check_room(client, priority, 1)
+            ticket = self._admit(client, priority)
+            if ticket.granted_at is not None:
+                return ticket
+            ticket._wake = event.set
+        timeout = self._wait_timeout()
+        if not event.wait(timeout) and self._withdraw(ticket):
+            self._timed_out(timeout)
+        return ticket
+
+    async def acquire_async(self, client: str, priority: str = 'interactive') -> Ticket:
+        """acquire() for asyncio tasks"""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        with self._lock:
+            if not self._free(priority):
+                self._check_room(client, priority, 1)
+            ticket = self._admit(client, priority)
+            if ticket.granted_at is not None:
+                return ticket
+            ticket._wake = lambda: loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+        timeout = self._wait_timeout()
+        try:
+            await asyncio.wait_for(asyncio.shield(granted), timeout)
+        except asyncio.TimeoutError:
+            if self._withdraw(ticket):
+                self._timed_out(timeout)
+        except asyncio.CancelledError:
+            if not self._withdraw(ticket):
+                self.release(ticket)
+            raise
+        return ticket
+
+    def submit_all(self, client: str, priority: str, executor, fn, args_list: list, pool: str = None) -> List[Future]:
+        """Queue fn(ticket, *args) for each args, run on executor as slots are granted.
+
+        Either all of them are queued or none: AdmissionRejected is raised
+        before anything runs if they do not fit. Each slot is released when
+        its call finishes; the returned futures carry the results. With pool,
+        the wait for an executor thread is recorded under that name.
+        """
+        context = contextvars.copy_context()
+
+        def starter(ticket, future, args):
+            def run():
+                try:
+                    if future.set_running_or_notify_cancel():
+                        future.set_result(context.copy().run(fn, ticket, *args))
+                except BaseException as e:
+                    future.set_exception(e)
+                finally:
+                    self.release(ticket)
+            return lambda: executor.submit(metrics.queued(pool, run) if pool else run)
+
+        futures, granted = [], []
+        with self._lock:
+            overflow = len(args_list) - self._free(priority)
+            if self.enabled and overflow > 0:
+                self._check_room(client, priority, overflow)
+            for args in args_list:
+                ticket = self._admit(client, priority)
+                future = Future()
+                ticket._wake = starter(ticket, future, args)
+                futures.append(future)
+                if ticket.granted_at is not None:
+                    granted.append(ticket)
+        for ticket in granted:
+            ticket._wake()
+        return futures
+
+    def release(self, ticket: Ticket):
+        """Free a granted slot and hand it to the next queued ticket"""
+        with self._lock:
+            if ticket.released or ticket.granted_at is None:
+                return
+            ticket.released = True
+            self._running[ticket.priority] -= 1
+            held = time.monotonic() - ticket.granted_at
+            self._service_seconds += 0.2 * (held - self._service_seconds)
+            granted = self._dispatch()
+        for waiting in granted:
+            waiting._wake()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'slots': self.slots,
+                'bulkSlots': self.bulk_slots,
+                'running': dict(self._running),
+                'queued': dict(self._queued),
+                'queuedClients': {priority: len(self._queues[priority]) for priority in PRIORITIES},
+                'rejected': self.rejected,
+                'serviceSeconds': round(self._service_seconds, 3)
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Return the process-wide admission controller"""
+    global _controller
+
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    Config.ADMISSION_SLOTS,
+                    Config.ADMISSION_BULK_SLOTS or Config.BATCH_CONCURRENCY,
+                    Config.ADMISSION_MAX_QUEUE,
+                    Config.ADMISSION_MAX_QUEUE_PER_CLIENT,
+                    Config.ADMISSION_MAX_BULK_QUEUE,
+                    Config.ADMISSION_MAX_WAIT,
+                    parse_weights(Config.ADMISSION_CLIENT_WEIGHTS),
+                    enabled=Config.ADMISSION_ENABLED
+                )
+    return _controller
+
+
+def _after_fork_in_child():
+    global _controller, _controller_lock
+    _controller = None
+    _controller_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -1,6 +1,53 @@
-from .base import BaseAgent
-from .separator import SeparatorAgent
-from .refiner import RefinerAgent
-from .pipeline import AgentPipeline
+"""
+Agent pipeline package.
 
-__all__ = ['BaseAgent', 'SeparatorAgent', 'RefinerAgent', 'AgentPipeline']
\ No newline at end of file
+Names are resolved lazily (PEP 562): importing the package, or one of its
+light submodules such as agents.cache, does not pull in every agent, and
+the openai SDK is only imported when the first client is built. Call
+agents.warmup.warm_up() to pay those costs before serving traffic.
+"""
+
+import importlib
+
+# exported name -> submodule defining it
+_EXPORTS = {
+    'BaseAgent': 'base',
+    'AsyncBaseAgent': 'async_base',
+    'SeparatorAgent': 'separator',
+    'AsyncSeparatorAgent': 'separator',
+    'CompactSeparatorAgent': 'separator',
+    'AsyncCompactSeparatorAgent': 'separator',
+    'RefinerAgent': 'refiner',
+    'AsyncRefinerAgent': 'refiner',
+    'FusedAgent': 'fused',
+    'AsyncFusedAgent': 'fused',
+    'AgentPipeline': 'pipeline',
+    'get_pipeline': 'pipeline',
+    'PIPELINE_MODES': 'pipeline',
+    'AsyncAgentPipeline': 'async_pipeline',
+    'get_async_pipeline': 'async_pipeline',
+    'get_client': 'client',
+    'get_async_client': 'client',
+    'close_async_clients': 'client',
+    'reset_clients': 'client',
+}
+
+__all__ = ['BaseAgent', 'SeparatorAgent', 'RefinerAgent', 'AgentPipeline', 'get_pipeline',
+           'CompactSeparatorAgent', 'AsyncCompactSeparatorAgent',
+           'FusedAgent', 'AsyncFusedAgent', 'PIPELINE_MODES',
+           'AsyncBaseAgent', 'AsyncSeparatorAgent', 'AsyncRefinerAgent',
+           'AsyncAgentPipeline', 'get_async_pipeline',
+           'get_client', 'get_async_client', 'close_async_clients', 'reset_clients']
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,95 @@
+import time
+from typing import Dict, Any, AsyncIterator
+import metrics
+from .base import BaseAgent
+from .client import get_async_client
+from .cache import make_cache_key
+from .singleflight import AsyncSingleFlight
+from .ratelimit import get_rate_limiter
+from .hedge import get_hedger
+from .router import get_router
+
+_inflight = AsyncSingleFlight()
+
+class AsyncBaseAgent(BaseAgent):
+    """Base class for agents that call Azure through the async client"""
+    
+    @property
+    def client(self):
+        """Shared, pooled async client for the running event loop"""
+        return get_async_client()
+    
+    async def process(self, input_data: str, use_cache: bool = True) -> Dict[str, Any]:
+        """Process input through the agent without blocking the event loop"""
+        tier = self.choose_tier(input_data)
+        result = await self.process_params(self.build_params(input_data, tier), use_cache)
+        
+        if tier == 'small' and not self.is_valid(result) and get_router().escalate:
+            get_router().record_escalation(self.route_name)
+            result = await self.process_params(self.build_params(input_data, 'large'), use_cache)
+        return result
+    
+    async def process_params(self, params: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+        """Serve params from cache, a shared in-flight call or a new call"""
+        cached = self.cache_get(params, use_cache)
+        if cached is not None:
+            return self.parse_response(cached)
+        
+        if not use_cache:
+            return await self.complete(params, use_cache)
+        
+        return await _inflight.do(make_cache_key(params), self.complete, params, use_cache)
+    
+    async def complete(self, params: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+        """Call the model, parse the response and cache it"""
+        agent = self.route_name or type(self).__name__
+        start = time.monotonic()
+        try:
+            with metrics.in_flight('llm_calls'):
+                response = await get_hedger(f"{type(self).__name__}:{params['model']}").acall(self.call_model, params)
+        except Exception as e:
+            metrics.record_llm_call(agent, params['model'], time.monotonic() - start, error=e)
+            raise
+        seconds = time.monotonic() - start
+        usage = getattr(response, 'usage', None)
+        get_router().record(self.route_name, params['model'], seconds, usage)
+        metrics.record_llm_call(agent, params['model'], seconds, usage)
+        content = response.choices[0].message.content
+        
+        with metrics.timer('stage_seconds', stage='parse'):
+            result = self.parse_response(content)
+        self.cache_set(params, content, result, use_cache)
+        return result
+    
+    async def call_model(self, params: Dict[str, Any]):
+        """One model call, paced to quota, retried and bounded by the request deadline"""
+        return await get_rate_limiter().acall(self.client.chat.completions.create, params)
+    
+    async def stream_content(self, params: Dict[str, Any]) -> AsyncIterator[str]:
+        """Call the model with stream=True, yielding the content as it arrives.
+        
+        Pacing and retries cover opening the stream; see BaseAgent.stream_content.
+        """
+        agent = self.route_name or type(self).__name__
+        start = time.monotonic()
+        error = None
+        usage = None
+        try:
+            with metrics.in_flight('llm_calls'):
+                stream = await self.call_model(dict(params, stream=True, stream_options={'include_usage': True}))
+                try:
+                    async for chunk in stream:
+                        if getattr(chunk, 'usage', None) is not None:
+                            usage = chunk.usage
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+                finally:
+                    await stream.close()
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            seconds = time.monotonic() - start
+            if error is None:
+                get_router().record(self.route_name, params['model'], seconds, usage)
+            metrics.record_llm_call(agent, params['model'], seconds, usage, error=error)
@@ -0,0 +1,245 @@
+import asyncio
+import logging
+from typing import Dict, Any, List, Tuple
+from config import Config
+import metrics
+from .separator import AsyncSeparatorAgent, AsyncCompactSeparatorAgent
+from .refiner import AsyncRefinerAgent
+from .fused import AsyncFusedAgent
+from .pipeline import AgentPipeline, normalize_text, refine_key
+from .singleflight import AsyncSingleFlight
+from .preparser import separation_strategy
+from .deadline import remaining, DeadlineExceeded
+from .chunking import chunk_text, merge_chunk_entries
+from .incremental import plan_incremental, previous_entries
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAgentPipeline:
+    """Orchestrate the two-agent pipeline on an asyncio event loop"""
+
+    def __init__(self, max_concurrency: int = None):
+        self.separator_agent = AsyncSeparatorAgent()
+        self.compact_separator_agent = AsyncCompactSeparatorAgent()
+        self.refiner_agent = AsyncRefinerAgent()
+        self.fused_agent = AsyncFusedAgent()
+        self.max_concurrency = max_concurrency or Config.REFINER_CONCURRENCY
+        self.flight = AsyncSingleFlight()
+
+    async def refine_entry(self, entry: Dict[str, Any], semaphore: asyncio.Semaphore,
+                           use_cache: bool = True) -> Dict[str, Any]:
+        """Refine a single entry, isolating failures to that entry"""
+        async with semaphore:
+            try:
+                with metrics.timer('stage_seconds', stage='refine'):
+                    refined_result = await self.refiner_agent.process(entry, use_cache=use_cache)
+                return {'text': refined_result['refined_narrative']}
+            except Exception as e:
+                logger.warning("Refinement failed for entry '%s': %s", entry.get('activity', 'unknown'), e)
+                return {'text': entry['activity'], 'error': str(e)}
+
+    async def refine_entries(self, entries: List[Dict[str, Any]], use_cache: bool = True,
+                             started: Dict[Any, asyncio.Task] = None,
+                             semaphore: asyncio.Semaphore = None) -> List[Dict[str, Any]]:
+        """Refine entries concurrently, returning results in input order.
+
+        started maps refine_key to refinements already running (see
+        separate_speculatively); the entries reuse the ones they match.
+        """
+        semaphore = semaphore or asyncio.Semaphore(self.max_concurrency)
+
+        # Duplicate activities within a dictation are refined once
+        unique = {}
+        for entry in entries:
+            unique.setdefault(refine_key(entry), entry)
+
+        started = dict(started or {})
+        tasks = {}
+        for key, entry in unique.items():
+            task = started.pop(key, None)
+            if task is not None:
+                metrics.inc('speculative_refinements_total', outcome='used')
+            else:
+                task = asyncio.ensure_future(self.refine_entry(entry, semaphore, use_cache))
+            tasks[key] = task
+        self.discard_speculation(started)
+        if tasks:
+            await asyncio.wait(tasks.values(), timeout=remaining())
+
+        # Out of time: fall back to the separated activity for the stragglers
+        refined = {}
+        for key, task in tasks.items():
+            if task.done():
+                refined[key] = task.result()
+            else:
+                task.cancel()
+                refined[key] = {'text': unique[key]['activity'], 'error': str(DeadlineExceeded())}
+        return [dict(refined[refine_key(entry)]) for entry in entries]
+
+    @staticmethod
+    def discard_speculation(started: Dict[Any, asyncio.Task]):
+        """Cancel speculative refinements the validated entries do not need"""
+        for task in started.values():
+            task.cancel()
+        if started:
+            metrics.inc('speculative_refinements_total', len(started), outcome='discarded')
+
+    async def separate_speculatively(self, raw_text: str, semaphore: asyncio.Semaphore,
+                                     use_cache: bool = True) -> Tuple[Dict[str, Any], Dict[Any, asyncio.Task]]:
+        """Separate with a streamed separator call, refining each entry as soon as it closes"""
+        if (not Config.SEPARATOR_STREAMING or len(chunk_text(raw_text)) > 1
+                or separation_strategy(raw_text)[0] != 'full'):
+            return await self.separate(raw_text, use_cache), {}
+
+        started = {}
+        separated_result = {'entries': []}
+        try:
+            async for event, payload in self.separator_agent.iter_entries(raw_text, use_cache):
+                if event == 'entry':
+                    key = refine_key(payload)
+                    if key not in started:
+                        started[key] = asyncio.ensure_future(self.refine_entry(payload, semaphore, use_cache))
+                else:
+                    separated_result = payload
+        except BaseException:
+            self.discard_speculation(started)
+            raise
+        return separated_result, started
+
+    async def separate(self, raw_text: str, use_cache: bool = True) -> Dict[str, Any]:
+        """Separate entries, splitting long dictations into chunks separated concurrently"""
+        chunks = chunk_text(raw_text)
+        if len(chunks) == 1:
+            return await self.separate_chunk(raw_text, use_cache)
+
+        results = await asyncio.gather(*(self.separate_chunk(chunk, use_cache) for chunk in chunks))
+        return {'entries': merge_chunk_entries(chunks, [result.get('entries', []) for result in results])}
+
+    async def separate_chunk(self, raw_text: str, use_cache: bool = True) -> Dict[str, Any]:
+        """Separate entries, letting the local pre-parser skip or shrink the call"""
+        strategy, parsed = separation_strategy(raw_text)
+        if strategy == 'skip':
+            return {'entries': parsed['entries']}
+
+        if strategy == 'compact':
+            separated_result = await self.compact_separator_agent.process(raw_text, use_cache=use_cache)
+            if separated_result.get('entries'):
+                return separated_result
+            logger.warning("Compact separator returned no entries, retrying with full prompt")
+
+        return await self.separator_agent.process(raw_text, use_cache=use_cache)
+
+    async def process_fused(self, raw_text: str, use_cache: bool = True):
+        """Run the single-call mode; returns None when the caller should fall back"""
+        if len(chunk_text(raw_text)) > 1:
+            return None
+
+        try:
+            with metrics.timer('stage_seconds', stage='fused'):
+                fused_result = await self.fused_agent.process(raw_text, use_cache=use_cache)
+        except Exception as e:
+            logger.warning("Fused call failed, falling back to two-stage pipeline: %s", e)
+            return None
+
+        if not fused_result.get('valid'):
+            logger.warning("Fused output failed validation, falling back to two-stage pipeline")
+            return None
+
+        entries = fused_result['entries']
+        hours_list = [AgentPipeline.validate_hours(entry) for entry in entries]
+        refined_results = [{'text': entry['narrative']} for entry in entries]
+
+        return AgentPipeline.assemble_result(raw_text, entries, hours_list, refined_results)
+
+    async def separate_region(self, region: str, mode: str,
+                              use_cache: bool = True) -> List[Tuple[Dict[str, Any], Any]]:
+        """(entry, refined or None) pairs for one edited region of a dictation"""
+        if mode == 'fused':
+            result = await self.process_fused(region, use_cache)
+            if result is not None:
+                return [({'activity': n['original'], 'hours': n['hours']}, {'text': n['text']})
+                        for n in result['narratives']]
+        separated_result = await self.separate(region, use_cache)
+        return [(entry, None) for entry in separated_result.get('entries', [])]
+
+    async def process_incremental(self, raw_text: str, previous: Dict[str, Any] = None, mode: str = None,
+                                  use_cache: bool = True) -> Dict[str, Any]:
+        """Async counterpart of AgentPipeline.process_incremental"""
+        mode = mode or Config.PIPELINE_MODE
+        segments = None
+        if previous:
+            old_entries, old_refined = previous_entries(previous['narratives'])
+            segments = plan_incremental(previous['text'], old_entries, raw_text)
+        if segments is None:
+            result = await self.process(raw_text, mode, use_cache)
+            return dict(result, narratives=[dict(n, reused=False) for n in result['narratives']],
+                        incremental={'reused': 0, 'processed': len(result['narratives']), 'fullRun': True})
+
+        with metrics.timer('stage_seconds', stage='separate'):
+            separated = iter(await asyncio.gather(*(self.separate_region(value, mode, use_cache)
+                                                    for kind, value in segments if kind == 'separate')))
+
+        entries, refined_results, reused = [], [], []
+        for kind, value in segments:
+            pairs = ([(old_entries[index], old_refined[index]) for index in value] if kind == 'keep'
+                     else next(separated))
+            for entry, refined in pairs:
+                entries.append(entry)
+                refined_results.append(refined if kind == 'separate' or 'error' not in refined else None)
+                reused.append(kind == 'keep' and refined_results[-1] is not None)
+
+        hours_list = [AgentPipeline.validate_hours(entry) for entry in entries]
+        pending = [index for index, refined in enumerate(refined_results) if refined is None]
+        for index, refined in zip(pending, await self.refine_entries([entries[i] for i in pending], use_cache)):
+            refined_results[index] = refined
+
+        result = AgentPipeline.assemble_result(raw_text, entries, hours_list, refined_results)
+        for narrative, flag in zip(result['narratives'], reused):
+            narrative['reused'] = flag
+        result['incremental'] = {'reused': sum(reused), 'processed': len(entries) - sum(reused), 'fullRun': False}
+        return result
+
+    async def process(self, raw_text: str, mode: str = None, use_cache: bool = True) -> Dict[str, Any]:
+        mode = mode or Config.PIPELINE_MODE
+        if not use_cache:
+            return await self.run(raw_text, mode, use_cache)
+
+        key = f"{mode}:{normalize_text(raw_text)}"
+        result = await self.flight.do(key, self.run, raw_text, mode, use_cache)
+        return dict(result, original=raw_text)
+
+    async def run(self, raw_text: str, mode: str, use_cache: bool = True) -> Dict[str, Any]:
+        """Run the pipeline once, without request coalescing"""
+        if mode == 'fused':
+            result = await self.process_fused(raw_text, use_cache)
+            if result is not None:
+                return result
+
+        # Step 1: Separate entries (includes basic cleanup); refinement of
+        # streamed entries starts while the separator is still generating
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        with metrics.timer('stage_seconds', stage='separate'):
+            separated_result, started = await self.separate_speculatively(raw_text, semaphore, use_cache)
+        entries = separated_result.get('entries', [])
+
+        # Validate hours before processing
+        hours_list = [AgentPipeline.validate_hours(entry) for entry in entries]
+
+        # Step 2: Refine all entries concurrently
+        refined_results = await self.refine_entries(entries, use_cache, started, semaphore)
+
+        return AgentPipeline.assemble_result(raw_text, entries, hours_list, refined_results)
+
+
+_async_pipeline = None
+
+
+def get_async_pipeline() -> AsyncAgentPipeline:
+    """Return the process-wide async pipeline, creating it on first use"""
+    global _async_pipeline
+
+    # Agents hold no loop-bound state, so one instance serves every loop
+    if _async_pipeline is None:
+        _async_pipeline = AsyncAgentPipeline()
+    return _async_pipeline
@@ -1,66 +1,192 @@
 from abc import ABC, abstractmethod
-from openai import AzureOpenAI
-from typing import Dict, Any
+from typing import Dict, Any, Iterator
 import os
-from dotenv import load_dotenv
+import time
+import metrics
+from .client import get_client, client_settings
+from .cache import get_cache, make_cache_key
+from .singleflight import SingleFlight
+from .ratelimit import get_rate_limiter
+from .hedge import get_hedger
+from .router import get_router
 
-load_dotenv()
+# Identical prompts in flight at the same time share one upstream call
+_inflight = SingleFlight()
 
 class BaseAgent(ABC):
     """Base class for all processing agents"""
     
+    # MODEL_ROUTING policy name; None always uses self.model
+    route_name = None
+    
     def __init__(self, model=None):
-        # Use Azure deployment name
+        # Use Azure deployment name; an explicit model pins the agent to it
         self.model = model or os.getenv('AZURE_OPENAI_GPT_DEPLOYMENT', 'gpt-4.1')
+        self.pinned = model is not None
         
-        # Get Azure configuration
-        api_key = os.getenv('AZURE_OPENAI_API_KEY')
-        endpoint = os.getenv('AZURE_OPENAI_ENDPOINT')
-        api_version = os.getenv('AZURE_OPENAI_API_VERSION')
-        
-        if not api_key:
-            raise ValueError("AZURE_OPENAI_API_KEY environment variable is required")
-        if not endpoint:
-            raise ValueError("AZURE_OPENAI_ENDPOINT environment variable is required")
-            
-        self.client = AzureOpenAI(
-            api_key=api_key,
-            azure_endpoint=endpoint,
-            api_version=api_version
-        )
+        # Fail fast on missing configuration
+        client_settings()
+    
+    @property
+    def client(self):
+        """Shared, pooled client for the current worker process"""
+        # Looked up on every use so agents built before a fork stay valid
+        return get_client()
     
     @abstractmethod
     def get_prompt(self, input_data: str) -> str:
-        """Generate agent-specific prompt"""
+        """Generate the agent-specific user message for this input"""
         pass
     
-    def process(self, input_data: str) -> Dict[str, Any]:
-        """Process input through the agent"""
+    def get_system_prompt(self) -> str:
+        """Static instructions sent ahead of every input; override in subclasses"""
+        return None
+    
+    def routing_text(self, input_data) -> str:
+        """Text the router judges complexity on"""
+        return input_data if isinstance(input_data, str) else str(input_data)
+    
+    def choose_tier(self, input_data) -> str:
+        """Deployment tier ('small' or 'large') for this input"""
+        if self.pinned:
+            return 'large'
+        return get_router().choose(self.route_name, self.routing_text(input_data))
+    
+    def build_params(self, input_data: str, tier: str = 'large') -> Dict[str, Any]:
+        """Build the chat completion request for this input"""
         prompt = self.get_prompt(input_data)
+        model = self.model if self.pinned or tier == 'large' else get_router().deployment(tier)
         
-        # Check if this agent expects JSON output
-        expects_json = hasattr(self, 'expects_json_output') and self.expects_json_output()
+        # Static instructions first so every call shares a cacheable prefix
+        messages = []
+        system_prompt = self.get_system_prompt()
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
         
         # Prepare API call parameters
         params = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
+            "model": model,
+            "messages": messages,
             "temperature": 0.3
         }
         
         # Add response_format for JSON if needed
-        if expects_json:
-            params["response_format"] = {"type": "json_object"}
+        response_format = self.get_response_format()
+        if response_format:
+            params["response_format"] = response_format
+        
+        return params
+    
+    def process(self, input_data: str, use_cache: bool = True) -> Dict[str, Any]:
+        """Process input through the agent, escalating failed small-model results"""
+        tier = self.choose_tier(input_data)
+        result = self.process_params(self.build_params(input_data, tier), use_cache)
+        
+        if tier == 'small' and not self.is_valid(result) and get_router().escalate:
+            get_router().record_escalation(self.route_name)
+            result = self.process_params(self.build_params(input_data, 'large'), use_cache)
+        return result
+    
+    def process_params(self, params: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+        """Serve params from cache, a shared in-flight call or a new call"""
+        cached = self.cache_get(params, use_cache)
+        if cached is not None:
+            return self.parse_response(cached)
         
-        response = self.client.chat.completions.create(**params)
+        if not use_cache:
+            return self.complete(params, use_cache)
+        
+        # Callers sharing a key receive the same parsed result; treat it as read-only
+        return _inflight.do(make_cache_key(params), self.complete, params, use_cache)
+    
+    def complete(self, params: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+        """Call the model, parse the response and cache it"""
+        agent = self.route_name or type(self).__name__
+        start = time.monotonic()
+        try:
+            with metrics.in_flight('llm_calls'):
+                response = get_hedger(f"{type(self).__name__}:{params['model']}").call(self.call_model, params)
+        except Exception as e:
+            metrics.record_llm_call(agent, params['model'], time.monotonic() - start, error=e)
+            raise
+        seconds = time.monotonic() - start
+        usage = getattr(response, 'usage', None)
+        get_router().record(self.route_name, params['model'], seconds, usage)
+        metrics.record_llm_call(agent, params['model'], seconds, usage)
         content = response.choices[0].message.content
         
-        return self.parse_response(content)
+        with metrics.timer('stage_seconds', stage='parse'):
+            result = self.parse_response(content)
+        self.cache_set(params, content, result, use_cache)
+        return result
+    
+    def call_model(self, params: Dict[str, Any]):
+        """One model call, paced to quota, retried and bounded by the request deadline"""
+        return get_rate_limiter().call(self.client.chat.completions.create, params)
+    
+    def stream_content(self, params: Dict[str, Any]) -> Iterator[str]:
+        """Call the model with stream=True, yielding the content as it arrives.
+        
+        Pacing and retries cover opening the stream. The final chunk carries
+        the token usage, which is accounted like a complete() call's. Streams
+        are not hedged or coalesced with identical calls in flight.
+        """
+        agent = self.route_name or type(self).__name__
+        start = time.monotonic()
+        error = None
+        usage = None
+        try:
+            with metrics.in_flight('llm_calls'):
+                stream = self.call_model(dict(params, stream=True, stream_options={'include_usage': True}))
+                try:
+                    for chunk in stream:
+                        if getattr(chunk, 'usage', None) is not None:
+                            usage = chunk.usage
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+                finally:
+                    stream.close()
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            seconds = time.monotonic() - start
+            if error is None:
+                get_router().record(self.route_name, params['model'], seconds, usage)
+            metrics.record_llm_call(agent, params['model'], seconds, usage, error=error)
+    
+    def cache_get(self, params: Dict[str, Any], use_cache: bool = True):
+        """Return a cached raw response for these params, if any"""
+        cache = get_cache() if use_cache else None
+        if cache is None:
+            return None
+        return cache.get(make_cache_key(params))
+    
+    def cache_set(self, params: Dict[str, Any], content: str, result: Dict[str, Any], use_cache: bool = True):
+        """Store a raw response once it has parsed successfully"""
+        cache = get_cache() if use_cache else None
+        if cache is None or content is None or not self.is_cacheable(result):
+            return
+        cache.set(make_cache_key(params), content)
+    
+    def is_valid(self, result: Dict[str, Any]) -> bool:
+        """Override to flag failed parses; they are not cached and are escalated"""
+        return True
+    
+    def is_cacheable(self, result: Dict[str, Any]) -> bool:
+        return self.is_valid(result)
     
     def expects_json_output(self) -> bool:
         """Override in subclasses that expect JSON responses"""
         return False
     
+    def get_response_format(self):
+        """Response format for the API call; override for structured outputs"""
+        if self.expects_json_output():
+            return {"type": "json_object"}
+        return None
+    
     @abstractmethod
     def parse_response(self, response: str) -> Dict[str, Any]:
         """Parse the agent's response"""
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from config import Config
+import metrics
+from prompts import PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(params: Dict[str, Any]) -> str:
+    """Content address for a chat completion request"""
+    material = json.dumps({
+        'model': params.get('model'),
+        'prompt_version': PROMPT_VERSION,
+        'messages': params.get('messages'),
+        'temperature': params.get('temperature'),
+        'response_format': params.get('response_format')
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Base class for agent response caches with hit/miss counters"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        metrics.inc('cache_lookups_total', backend=self.name, result='miss' if value is None else 'hit')
+        return value
+
+    def set(self, key: str, value: str):
+        self._set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'size': self.size()
+        }
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+
+class MemoryCache(ResponseCache):
+    """In-process LRU cache with TTL"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int, ttl: float):
+        super().__init__(max_entries, ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, created = item
+            if self._expired(created):
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache(ResponseCache):
+    """On-disk cache shared by every worker process on the host"""
+
+    name = 'sqlite'
+
+    # Run size/TTL eviction every N writes rather than on each one
+    PURGE_INTERVAL = 100
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'created REAL NOT NULL, accessed REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and per process; never share across a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _get(self, key):
+        try:
+            conn = self._connect()
+            row = conn.execute('SELECT value, created FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self._expired(created):
+                conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.evictions += 1
+                return None
+            conn.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), key))
+            return value
+        except sqlite3.Error as e:
+            logger.warning("Cache read failed: %s", e)
+            return None
+
+    def _set(self, key, value):
+        try:
+            conn = self._connect()
+            now = time.time()
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)',
+                (key, value, now, now)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_INTERVAL == 0:
+                self.purge()
+        except sqlite3.Error as e:
+            logger.warning("Cache write failed: %s", e)
+
+    def purge(self):
+        """Drop expired entries, then the least recently used beyond max_entries"""
+        conn = self._connect()
+        if self.ttl > 0:
+            cursor = conn.execute('DELETE FROM responses WHERE created < ?', (time.time() - self.ttl,))
+            self.evictions += max(cursor.rowcount, 0)
+        cursor = conn.execute(
+            'DELETE FROM responses WHERE key IN ('
+            'SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+        self.evictions += max(cursor.rowcount, 0)
+
+    def size(self) -> int:
+        try:
+            return self._connect().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def clear(self):
+        self._connect().execute('DELETE FROM responses')
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[ResponseCache]:
+    """Return the configured process-wide response cache, or None if disabled"""
+    global _cache
+
+    if Config.AGENT_CACHE_BACKEND == 'none':
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if Config.AGENT_CACHE_BACKEND == 'sqlite':
+                    _cache = SQLiteCache(Config.AGENT_CACHE_PATH,
+                                         Config.AGENT_CACHE_MAX_ENTRIES,
+                                         Config.AGENT_CACHE_TTL)
+                else:
+                    _cache = MemoryCache(Config.AGENT_CACHE_MAX_ENTRIES,
+                                         Config.AGENT_CACHE_TTL)
+    return _cache
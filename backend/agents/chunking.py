@@ -0,0 +1,152 @@
+"""
+Chunked separation for long dictations.
+
+A long dictation is cut into chunks of about SEPARATOR_CHUNK_WORDS words at
+sentence boundaries, never in front of a sentence that continues the
+previous activity ("It took two hours."). Each chunk repeats the last
+SEPARATOR_CHUNK_OVERLAP sentences of the one before it so an activity cut
+by the boundary is seen whole at least once; merge_chunk_entries() then
+drops the duplicates this produces where neighbouring chunks meet.
+"""
+
+import re
+from typing import Dict, Any, List
+from config import Config
+from .preparser import split_sentences, expand_abbreviations, DANGLING_RE
+
+# Sentences that cannot start a chunk because they lean on the previous one
+CONTINUATION_RE = re.compile(r'^(?:and|but|also|plus|after\s+which)\b', re.IGNORECASE)
+
+# Entries within this many positions of a chunk boundary are compared
+BOUNDARY_WINDOW = 3
+SIMILARITY_THRESHOLD = 0.6
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_STOP_WORDS = frozenset(['a', 'an', 'the', 'of', 'to', 'for', 'with', 'on', 'in', 'and', 'regarding', 'about'])
+
+
+def word_count(text: str) -> int:
+    return len(text.split())
+
+
+def _continues_previous(sentence: str) -> bool:
+    return bool(DANGLING_RE.match(sentence) or CONTINUATION_RE.match(sentence))
+
+
+def sentence_units(text: str) -> List[List[str]]:
+    """Sentences grouped into units that must stay together"""
+    units = []
+    for sentence in split_sentences(text):
+        if units and _continues_previous(sentence):
+            units[-1].append(sentence)
+        else:
+            units.append([sentence])
+    return units
+
+
+def chunk_text(text: str, max_words: int = None, overlap: int = None) -> List[str]:
+    """Split text into chunks of at most max_words words (a single very long
+    sentence may exceed it); returns [text] when no split is needed"""
+    max_words = Config.SEPARATOR_CHUNK_WORDS if max_words is None else max_words
+    overlap = Config.SEPARATOR_CHUNK_OVERLAP if overlap is None else overlap
+    if max_words <= 0 or word_count(text) <= max_words:
+        return [text]
+
+    units = sentence_units(text)
+    chunks = []
+    current = []
+    size = 0
+    for unit in units:
+        unit_words = sum(word_count(sentence) for sentence in unit)
+        if current and size + unit_words > max_words:
+            chunks.append(current)
+            # Carry the tail of this chunk into the next as context
+            current = list(current[-overlap:]) if overlap > 0 else []
+            size = sum(word_count(s) for u in current for s in u)
+            if size + unit_words > max_words:
+                current, size = [], 0
+        current.append(unit)
+        size += unit_words
+    if current:
+        chunks.append(current)
+
+    return [' '.join(sentence for unit in chunk for sentence in unit) for chunk in chunks]
+
+
+def activity_tokens(activity: str) -> frozenset:
+    """Content words of an activity or text, abbreviations expanded"""
+    words = _WORD_RE.findall(expand_abbreviations(activity).lower())
+    return frozenset(word for word in words if word not in _STOP_WORDS)
+
+
+def _hours(entry: Dict[str, Any]) -> float:
+    try:
+        return float(entry.get('hours', 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def shared_text(previous: str, chunk: str) -> str:
+    """The leading sentences of chunk that repeat the end of previous"""
+    shared = ''
+    prefix = []
+    for sentence in split_sentences(chunk):
+        prefix.append(sentence)
+        candidate = ' '.join(prefix)
+        if not previous.endswith(candidate):
+            break
+        shared = candidate
+    return shared
+
+
+def _from_text(entry: Dict[str, Any], text_tokens: frozenset) -> bool:
+    """Most of the entry's words appear in the given text"""
+    tokens = activity_tokens(entry.get('activity', ''))
+    return bool(tokens) and len(tokens & text_tokens) / len(tokens) >= SIMILARITY_THRESHOLD
+
+
+def _same_activity(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """Two entries describe the same work"""
+    hours_a, hours_b = _hours(a), _hours(b)
+    if hours_a and hours_b and abs(hours_a - hours_b) > 0.01:
+        return False
+    tokens_a, tokens_b = activity_tokens(a.get('activity', '')), activity_tokens(b.get('activity', ''))
+    if not tokens_a or not tokens_b:
+        return False
+    # Different numbers (exhibit 9 vs exhibit 10) mean different work
+    if {t for t in tokens_a if t.isdigit()} != {t for t in tokens_b if t.isdigit()}:
+        return False
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b) >= SIMILARITY_THRESHOLD
+
+
+def _merge_pair(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep the fuller description and whichever copy recorded the time"""
+    merged = dict(a if len(a.get('activity', '')) >= len(b.get('activity', '')) else b)
+    merged['hours'] = max(_hours(a), _hours(b))
+    return merged
+
+
+def merge_chunk_entries(chunks: List[str], chunk_entries: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Concatenate per-chunk entries, de-duplicating activities at the seams.
+
+    An entry at the head of a chunk is dropped as a duplicate only if it
+    comes from the repeated overlap text and matches an entry at the tail
+    of what has been merged so far; the two copies are combined.
+    """
+    merged = []
+    for number, entries in enumerate(chunk_entries):
+        boundary = len(merged)
+        overlap = shared_text(chunks[number - 1], chunks[number]) if number else ''
+        overlap_tokens = activity_tokens(overlap)
+        for position, entry in enumerate(entries):
+            duplicate = None
+            if overlap_tokens and position < BOUNDARY_WINDOW and _from_text(entry, overlap_tokens):
+                for index in range(max(0, boundary - BOUNDARY_WINDOW), boundary):
+                    if _same_activity(merged[index], entry):
+                        duplicate = index
+                        break
+            if duplicate is None:
+                merged.append(entry)
+            else:
+                merged[duplicate] = _merge_pair(merged[duplicate], entry)
+    return merged
@@ -0,0 +1,102 @@
+import logging
+import os
+import threading
+import time
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Upstream calls are being refused while the circuit is open"""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f'Azure OpenAI is unavailable; retry in {retry_after:.0f}s')
+
+
+class CircuitBreaker:
+    """Fail fast while the upstream is degraded.
+
+    After failure_threshold consecutive failed attempts the circuit opens and
+    calls are refused for reset_timeout seconds. It then lets a single probe
+    through (half-open): success closes the circuit, failure re-opens it.
+    A threshold of 0 disables the breaker.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go upstream now"""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == 'closed':
+                return
+            wait = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == 'open' and wait <= 0:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+            raise CircuitOpenError(max(wait, 1.0))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = 'closed'
+            self._probing = False
+
+    def record_failure(self):
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning("Circuit opened after %d consecutive upstream failures", self.failures)
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """End a call that neither succeeded nor failed upstream (e.g. a client error)"""
+        with self._lock:
+            self._probing = False
+
+    def stats(self) -> dict:
+        return {'state': self.state, 'failures': self.failures, 'rejected': self.rejected}
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Return the process-wide breaker for Azure OpenAI calls"""
+    global _breaker
+
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(Config.CIRCUIT_FAILURE_THRESHOLD, Config.CIRCUIT_RESET_SECONDS)
+    return _breaker
+
+
+def _after_fork_in_child():
+    global _breaker, _breaker_lock
+    _breaker = None
+    _breaker_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from typing import TYPE_CHECKING
+from config import Config
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import AzureOpenAI, AsyncAzureOpenAI
+
+# httpx and openai take most of the app's import time; they are imported when
+# the first client is built (or by agents.warmup), not when this module loads
+
+logger = logging.getLogger(__name__)
+
+# Process-wide client registry. One pooled AzureOpenAI client is shared by
+# every agent in a worker process, keyed by the settings that affect it.
+_clients = {}
+# Async clients are bound to the event loop that first used them
+_async_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_owner_pid = os.getpid()
+
+
+def client_settings():
+    """Read Azure configuration, raising if required values are missing"""
+    api_key = os.getenv('AZURE_OPENAI_API_KEY')
+    endpoint = os.getenv('AZURE_OPENAI_ENDPOINT')
+    api_version = os.getenv('AZURE_OPENAI_API_VERSION')
+
+    if not api_key:
+        raise ValueError("AZURE_OPENAI_API_KEY environment variable is required")
+    if not endpoint:
+        raise ValueError("AZURE_OPENAI_ENDPOINT environment variable is required")
+
+    return api_key, endpoint, api_version
+
+
+def _pool_options():
+    """Keep-alive pool limits and timeouts from Config"""
+    import httpx
+    return {
+        'limits': httpx.Limits(
+            max_connections=Config.AZURE_OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.AZURE_OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=Config.AZURE_OPENAI_KEEPALIVE_EXPIRY
+        ),
+        'timeout': httpx.Timeout(
+            Config.AZURE_OPENAI_READ_TIMEOUT,
+            connect=Config.AZURE_OPENAI_CONNECT_TIMEOUT
+        )
+    }
+
+
+def _build_http_client() -> 'httpx.Client':
+    """Create a keep-alive connection pool sized from Config"""
+    import httpx
+    return httpx.Client(**_pool_options())
+
+
+def get_client() -> 'AzureOpenAI':
+    """Return the shared AzureOpenAI client for this process"""
+    global _owner_pid
+
+    settings = client_settings()
+
+    with _lock:
+        # A forked child must never reuse sockets opened by its parent
+        if os.getpid() != _owner_pid:
+            _clients.clear()
+            _owner_pid = os.getpid()
+
+        client = _clients.get(settings)
+        if client is None:
+            from openai import AzureOpenAI
+            api_key, endpoint, api_version = settings
+            client = AzureOpenAI(
+                api_key=api_key,
+                azure_endpoint=endpoint,
+                api_version=api_version,
+                max_retries=0,  # retries are paced by agents.ratelimit
+                http_client=_build_http_client()
+            )
+            _clients[settings] = client
+        return client
+
+
+def get_async_client() -> 'AsyncAzureOpenAI':
+    """Return the shared AsyncAzureOpenAI client for the running event loop"""
+    settings = client_settings()
+    loop = asyncio.get_running_loop()
+
+    with _lock:
+        per_loop = _async_clients.setdefault(loop, {})
+        client = per_loop.get(settings)
+        if client is None:
+            import httpx
+            from openai import AsyncAzureOpenAI
+            api_key, endpoint, api_version = settings
+            client = AsyncAzureOpenAI(
+                api_key=api_key,
+                azure_endpoint=endpoint,
+                api_version=api_version,
+                max_retries=0,  # retries are paced by agents.ratelimit
+                http_client=httpx.AsyncClient(**_pool_options())
+            )
+            per_loop[settings] = client
+        return client
+
+
+async def close_async_clients():
+    """Close the async clients owned by the running event loop"""
+    loop = asyncio.get_running_loop()
+
+    with _lock:
+        per_loop = _async_clients.pop(loop, {})
+    for client in per_loop.values():
+        await client.close()
+
+
+def reset_clients(close: bool = True):
+    """Drop all pooled clients, e.g. after a fork or on shutdown.
+
+    Pass close=False in a forked child: the inherited sockets belong to the
+    parent and must not be shut down from here.
+    """
+    global _owner_pid
+
+    with _lock:
+        if close:
+            for client in _clients.values():
+                try:
+                    client.close()
+                except Exception as e:
+                    logger.warning("Failed to close pooled client: %s", e)
+        _clients.clear()
+        _async_clients.clear()
+        _owner_pid = os.getpid()
+
+
+def _after_fork_in_child():
+    global _lock
+    _lock = threading.Lock()
+    reset_clients(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
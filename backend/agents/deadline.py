@@ -0,0 +1,88 @@
+"""
+Request deadlines.
+
+A deadline set around a request (see deadline()) is carried in a context
+variable to every agent call made on its behalf: each Azure attempt gets the
+remaining time as its timeout, and no new attempt starts once it has passed.
+Work submitted to thread pools must be run with contextvars.copy_context()
+to see it; asyncio tasks inherit it automatically.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time before the work finished"""
+
+    def __init__(self, message: str = 'Request deadline exceeded'):
+        super().__init__(message)
+
+
+@contextmanager
+def deadline(seconds: float):
+    """Bound everything inside the block to seconds from now.
+
+    A nested deadline can only shorten the one already in effect. A falsy
+    seconds value leaves the current deadline (if any) unchanged.
+    """
+    if not seconds or seconds <= 0:
+        yield
+        return
+
+    with deadline_at(time.monotonic() + seconds):
+        yield
+
+
+@contextmanager
+def deadline_at(expires):
+    """deadline() for an absolute time.monotonic() value, e.g. one taken with
+    current_deadline() earlier in the request; None leaves it unchanged"""
+    if expires is None:
+        yield
+        return
+
+    current = _deadline.get()
+    if current is not None:
+        expires = min(expires, current)
+
+    token = _deadline.set(expires)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline():
+    """The deadline in effect as a time.monotonic() value, or None"""
+    return _deadline.get()
+
+
+def remaining():
+    """Seconds left before the current deadline, or None without one"""
+    expires = _deadline.get()
+    if expires is None:
+        return None
+    return max(0.0, expires - time.monotonic())
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check_deadline():
+    """Raise DeadlineExceeded if the current deadline has passed"""
+    if expired():
+        raise DeadlineExceeded()
+
+
+def call_timeout(default: float = None):
+    """Timeout for one upstream call: the remaining time, capped at default"""
+    left = remaining()
+    if left is None:
+        return default
+    return left if default is None else min(left, default)
@@ -0,0 +1,94 @@
+import json
+import logging
+from typing import Dict, Any
+from .base import BaseAgent
+from .async_base import AsyncBaseAgent
+from .separator import strip_code_fences
+from prompts import FUSED_SYSTEM_PROMPT, FUSED_USER_PROMPT
+
+logger = logging.getLogger(__name__)
+
+# Structured output schema: separation, hours and narrative in one call
+FUSED_SCHEMA = {
+    "name": "billing_entries",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "entries": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "activity": {"type": "string"},
+                        "hours": {"type": "number"},
+                        "narrative": {"type": "string"}
+                    },
+                    "required": ["activity", "hours", "narrative"],
+                    "additionalProperties": False
+                }
+            }
+        },
+        "required": ["entries"],
+        "additionalProperties": False
+    }
+}
+
+class FusedAgent(BaseAgent):
+    """Separate activities and refine their narratives in a single call"""
+    
+    route_name = 'fused'
+    
+    def expects_json_output(self) -> bool:
+        """This agent expects JSON output"""
+        return True
+    
+    def get_response_format(self):
+        return {"type": "json_schema", "json_schema": FUSED_SCHEMA}
+    
+    def get_system_prompt(self) -> str:
+        return FUSED_SYSTEM_PROMPT
+    
+    def get_prompt(self, input_text: str) -> str:
+        return FUSED_USER_PROMPT.format(input_text=input_text)
+    
+    def is_valid(self, result: Dict[str, Any]) -> bool:
+        return bool(result.get('valid'))
+
+    def parse_response(self, response: str) -> Dict[str, Any]:
+        """Validate the fused output strictly; 'valid' is False on any problem"""
+        try:
+            response = strip_code_fences(response)
+            result = json.loads(response)
+            
+            if not isinstance(result, dict) or not isinstance(result.get('entries'), list):
+                raise ValueError("Response missing 'entries' list")
+            
+            for entry in result['entries']:
+                if not isinstance(entry, dict):
+                    raise ValueError("Entry is not an object")
+                activity = entry.get('activity')
+                if not isinstance(activity, str) or not activity.strip():
+                    raise ValueError("Entry missing 'activity' field")
+                narrative = entry.get('narrative')
+                if not isinstance(narrative, str) or not narrative.strip():
+                    raise ValueError("Entry missing 'narrative' field")
+                hours = entry.get('hours')
+                if isinstance(hours, bool) or not isinstance(hours, (int, float)):
+                    raise ValueError(f"Entry has invalid 'hours' value: {hours!r}")
+                entry['narrative'] = narrative.strip()
+            
+            result['valid'] = True
+            return result
+            
+        except json.JSONDecodeError as e:
+            logger.warning("JSON parsing error in FusedAgent: %s; response was: %s...",
+                           e, response[:200])  # Log first 200 chars
+            return {"entries": [], "valid": False}
+        except Exception as e:
+            logger.warning("Error in FusedAgent parse_response: %s", e)
+            return {"entries": [], "valid": False}
+
+
+class AsyncFusedAgent(FusedAgent, AsyncBaseAgent):
+    """FusedAgent backed by the async client"""
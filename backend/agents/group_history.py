@@ -0,0 +1,167 @@
+"""
+Results remembered by groupId for incremental re-enhancement.
+
+/api/enhance keeps each result here so a later request can name it with
+previousGroupId instead of sending it back. The store is separate from
+the agent response cache: group results must not evict model responses
+or count towards the cache's hit rate, and they have to outlive
+AGENT_CACHE_BACKEND=none. The memory backend (the default) only
+remembers results enhanced by the same worker process. The SQLite backend
+is shared by every worker on the host, but keeps client dictations on
+disk until they expire, so it is opt-in.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryGroupHistory:
+    """Per-process LRU map of groupId to result, with TTL"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, group_id: str) -> Optional[str]:
+        with self._lock:
+            item = self._entries.get(group_id)
+            if item is None:
+                return None
+            value, created = item
+            if self.ttl > 0 and time.time() - created > self.ttl:
+                del self._entries[group_id]
+                return None
+            self._entries.move_to_end(group_id)
+            return value
+
+    def set(self, group_id: str, value: str):
+        with self._lock:
+            self._entries[group_id] = (value, time.time())
+            self._entries.move_to_end(group_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteGroupHistory:
+    """groupId table on disk, shared by every worker process on the host"""
+
+    name = 'sqlite'
+
+    # Run size/TTL eviction every N writes rather than on each one
+    PURGE_INTERVAL = 100
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS group_results ('
+            'group_id TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)'
+        )
+        self._connect().execute('CREATE INDEX IF NOT EXISTS group_results_created ON group_results (created)')
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread and per process; never share across a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, group_id: str) -> Optional[str]:
+        try:
+            row = self._connect().execute(
+                'SELECT value, created FROM group_results WHERE group_id = ?', (group_id,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Group history read failed: %s", e)
+            return None
+        if row is None or (self.ttl > 0 and time.time() - row[1] > self.ttl):
+            return None
+        return row[0]
+
+    def set(self, group_id: str, value: str):
+        try:
+            self._connect().execute(
+                'INSERT OR REPLACE INTO group_results (group_id, value, created) VALUES (?, ?, ?)',
+                (group_id, value, time.time())
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_INTERVAL == 0:
+                self.purge()
+        except sqlite3.Error as e:
+            logger.warning("Group history write failed: %s", e)
+
+    def purge(self):
+        """Drop expired results, then the oldest beyond max_entries"""
+        conn = self._connect()
+        if self.ttl > 0:
+            conn.execute('DELETE FROM group_results WHERE created < ?', (time.time() - self.ttl,))
+        conn.execute(
+            'DELETE FROM group_results WHERE group_id IN ('
+            'SELECT group_id FROM group_results ORDER BY created DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+
+    def size(self) -> int:
+        try:
+            return self._connect().execute('SELECT COUNT(*) FROM group_results').fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_group_history():
+    """Return the process's group history store, or None if INCREMENTAL_GROUP_HISTORY is off"""
+    global _history
+
+    if not Config.INCREMENTAL_GROUP_HISTORY:
+        return None
+
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                if Config.INCREMENTAL_HISTORY_BACKEND == 'sqlite':
+                    _history = SQLiteGroupHistory(Config.INCREMENTAL_HISTORY_PATH,
+                                                  Config.INCREMENTAL_HISTORY_MAX_ENTRIES,
+                                                  Config.INCREMENTAL_HISTORY_TTL)
+                else:
+                    _history = MemoryGroupHistory(Config.INCREMENTAL_HISTORY_MAX_ENTRIES,
+                                                  Config.INCREMENTAL_HISTORY_TTL)
+    return _history
+
+
+def _after_fork_in_child():
+    global _history, _history_lock
+    _history = None
+    _history_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
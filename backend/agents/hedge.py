@@ -0,0 +1,181 @@
+"""
+Hedged requests.
+
+Once an agent has enough latency history, a call that is still running
+after the HEDGE_PERCENTILE latency gets a duplicate; whichever finishes
+first wins. The sync path runs both attempts on a small thread pool (the
+loser runs to completion in the background); the async path cancels it.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config import Config
+from .deadline import remaining, DeadlineExceeded
+
+
+class LatencyTracker:
+    """Recent successful call latencies for one agent"""
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct: float):
+        """The pct-th percentile latency, or None without enough samples"""
+        with self._lock:
+            if len(self.samples) < Config.HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+
+class Hedger:
+    """Run an agent's model calls, hedging the slow ones"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latency = LatencyTracker()
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self):
+        """Seconds to wait before sending a duplicate, or None to not hedge"""
+        if not Config.HEDGE_ENABLED:
+            return None
+        delay = self.latency.percentile(Config.HEDGE_PERCENTILE)
+        if delay is None:
+            return None
+        delay = max(delay, Config.HEDGE_MIN_DELAY)
+        left = remaining()
+        # No point in a duplicate that could not finish in time anyway
+        if left is not None and left <= delay:
+            return None
+        return delay
+
+    def _timed(self, fn, *args):
+        start = time.monotonic()
+        result = fn(*args)
+        self.latency.record(time.monotonic() - start)
+        return result
+
+    def call(self, fn, *args):
+        """fn(*args), duplicated after the hedge delay if it is still running"""
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed(fn, *args)
+
+        executor = get_hedge_executor()
+        # Each attempt gets its own copy of the context so it sees the deadline
+        primary = executor.submit(contextvars.copy_context().run, self._timed, fn, *args)
+        done, _ = wait([primary], timeout=delay)
+        pending = {primary}
+        if not done:
+            hedge = executor.submit(contextvars.copy_context().run, self._timed, fn, *args)
+            pending.add(hedge)
+            self.hedged += 1
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded()
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _atimed(self, fn, *args):
+        start = time.monotonic()
+        result = await fn(*args)
+        self.latency.record(time.monotonic() - start)
+        return result
+
+    async def acall(self, fn, *args):
+        """Async counterpart of call(); the losing attempt is cancelled"""
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._atimed(fn, *args)
+
+        primary = asyncio.ensure_future(self._atimed(fn, *args))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                pending.add(asyncio.ensure_future(self._atimed(fn, *args)))
+                self.hedged += 1
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=remaining(),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise DeadlineExceeded()
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            'p50': self.latency.percentile(50),
+            'hedgeDelay': self.hedge_delay(),
+            'hedged': self.hedged,
+            'hedgeWins': self.hedge_wins
+        }
+
+
+_hedgers = {}
+_executor = None
+_lock = threading.Lock()
+
+
+def get_hedger(name: str) -> Hedger:
+    """Return the hedger (and latency history) for one kind of agent"""
+    hedger = _hedgers.get(name)
+    if hedger is None:
+        with _lock:
+            hedger = _hedgers.setdefault(name, Hedger(name))
+    return hedger
+
+
+def get_hedge_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=Config.HEDGE_POOL_SIZE, thread_name_prefix='hedge')
+    return _executor
+
+
+def hedge_stats() -> dict:
+    return {name: hedger.stats() for name, hedger in _hedgers.items()}
+
+
+def _after_fork_in_child():
+    global _executor, _lock
+    _executor = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,149 @@
+"""
+Incremental re-enhancement of an edited dictation.
+
+The previous and edited texts are split into sentence units (as for
+chunking) and diffed. Each previous entry is attributed to the unit its
+words come from. Units the edit did not touch, and that are more than
+INCREMENTAL_CONTEXT_UNITS away from it, keep their entries and refined
+narratives. Each edited region, widened by that context, is separated on
+its own and only its entries are refined, so the work is proportional to
+the edit rather than to the dictation.
+"""
+
+import json
+import logging
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+from config import Config
+from .group_history import get_group_history
+from .chunking import sentence_units, activity_tokens, word_count
+
+logger = logging.getLogger(__name__)
+
+# An entry is attributed to a unit holding at least this share of its words;
+# weaker matches follow the entry before them, as entries come in text order
+ATTRIBUTION_THRESHOLD = 0.5
+
+
+def _unit_key(unit: List[str]) -> str:
+    return ' '.join(' '.join(unit).split()).lower()
+
+
+def attribute_entries(entries: List[Dict[str, Any]], units: List[List[str]]) -> List[int]:
+    """Index of the unit each entry was separated from"""
+    unit_tokens = [activity_tokens(' '.join(unit)) for unit in units]
+    owners = []
+    for entry in entries:
+        tokens = activity_tokens(str(entry.get('activity', '')))
+        best, best_score = None, 0.0
+        if tokens:
+            for index, candidate in enumerate(unit_tokens):
+                score = len(tokens & candidate) / len(tokens)
+                if score > best_score:
+                    best, best_score = index, score
+        if best is None or best_score < ATTRIBUTION_THRESHOLD:
+            best = owners[-1] if owners else 0
+        owners.append(best)
+    return owners
+
+
+def plan_incremental(previous_text: str, previous_entries: List[Dict[str, Any]],
+                     text: str) -> Optional[List[Tuple[str, Any]]]:
+    """Segments of the edited text in order, or None if a full run is cheaper.
+
+    ('keep', [indexes into previous_entries]) for unchanged units and
+    ('separate', region text) for each edited region and its context.
+    """
+    old_units = sentence_units(previous_text)
+    new_units = sentence_units(text)
+    if not old_units or not new_units:
+        return None
+
+    owners = attribute_entries(previous_entries, old_units)
+    entries_of = [[] for _ in old_units]
+    for index, owner in enumerate(owners):
+        entries_of[owner].append(index)
+
+    # Map unchanged new units to their old unit; mark edits, and deletion points, dirty
+    matcher = SequenceMatcher(None, [_unit_key(u) for u in old_units], [_unit_key(u) for u in new_units],
+                              autojunk=False)
+    source = [None] * len(new_units)
+    changed = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            for offset in range(j2 - j1):
+                source[j1 + offset] = i1 + offset
+        else:
+            # A deletion (j1 == j2) only dirties the context around the gap
+            changed.append((j1, j2))
+
+    if not changed:
+        return [('keep', [index for unit in source for index in entries_of[unit]])]
+
+    context = Config.INCREMENTAL_CONTEXT_UNITS
+    dirty = [False] * len(new_units)
+    for start, end in changed:
+        for j in range(max(0, start - context), min(len(new_units), end + context)):
+            dirty[j] = True
+
+    dirty_words = sum(word_count(' '.join(unit)) for unit, flag in zip(new_units, dirty) if flag)
+    if dirty_words > Config.INCREMENTAL_MAX_CHANGE * word_count(text):
+        return None
+
+    segments = []
+    for j, unit in enumerate(new_units):
+        if dirty[j]:
+            if segments and segments[-1][0] == 'separate':
+                segments[-1] = ('separate', segments[-1][1] + ' ' + ' '.join(unit))
+            else:
+                segments.append(('separate', ' '.join(unit)))
+        elif entries_of[source[j]]:
+            if segments and segments[-1][0] == 'keep':
+                segments[-1][1].extend(entries_of[source[j]])
+            else:
+                segments.append(('keep', list(entries_of[source[j]])))
+    return segments
+
+
+def previous_entries(narratives: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Separated entries and refinements from a previous /api/enhance response's narratives"""
+    entries = [{'activity': n['original'], 'hours': n.get('hours', 0.0)} for n in narratives]
+    refined = []
+    for narrative in narratives:
+        item = {'text': narrative.get('text') or narrative['original']}
+        if narrative.get('error'):
+            item['error'] = narrative['error']  # refined again rather than reused
+        refined.append(item)
+    return entries, refined
+
+
+def remember_result(group_id: str, text: str, narratives: List[Dict[str, Any]]):
+    """Keep a result in the group history so it can be re-enhanced by groupId.
+
+    A failing store is logged, never raised: the enhancement itself succeeded.
+    """
+    kept = [{key: n[key] for key in ('original', 'hours', 'text', 'error') if n.get(key) is not None}
+            for n in narratives]
+    try:
+        history = get_group_history()
+        if history is not None:
+            history.set(group_id, json.dumps({'text': text, 'narratives': kept}))
+    except Exception as e:
+        logger.warning("Could not remember result for group %s: %s", group_id, e)
+
+
+def recall_result(group_id: str) -> Optional[Dict[str, Any]]:
+    """The remembered result for a groupId, or None if unknown, expired or unreadable"""
+    try:
+        history = get_group_history()
+        value = history.get(group_id) if history is not None and group_id else None
+    except Exception as e:
+        logger.warning("Could not recall result for group %s: %s", group_id, e)
+        return None
+    if value is None:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        logger.warning("Discarding unreadable result for group %s", group_id)
+        return None
@@ -0,0 +1,96 @@
+"""
+Incremental extraction of array items from a streamed JSON document.
+
+The separator answers {"entries": [{...}, {...}]}. ItemStreamParser is fed
+the response as it arrives and returns each object of the top-level
+"entries" array as soon as its closing brace is seen, long before the
+document is complete. It only tracks strings, nesting and the key of the
+top-level object being read; whether the finished document is valid is
+still decided by the agent's parse_response.
+"""
+
+import json
+from typing import Any, Dict, List
+
+
+class ItemStreamParser:
+    """Yield the objects of a top-level array (by key) as they close"""
+
+    def __init__(self, key: str = 'entries'):
+        self.key = key
+        self.buffer = []       # chunks seen so far
+        self.length = 0
+        self.stack = []        # '{' or '[' per open container
+        self.in_string = False
+        self.escaped = False
+        self.string_start = None
+        self.last_string = None
+        self.pending_key = None  # key of the top-level value being read
+        self.in_items = False    # inside the top-level array named key
+        self.item_start = None   # offset of the open item object, if any
+        self.failed = False      # a structure that cannot be valid JSON was seen
+
+    def text(self) -> str:
+        return ''.join(self.buffer)
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Add a chunk of the response; return the items completed by it"""
+        offset = self.length
+        self.buffer.append(chunk)
+        self.length += len(chunk)
+        if self.failed:
+            return []
+
+        completed = []
+        text = None
+        for i, char in enumerate(chunk, offset):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if len(self.stack) == 1 and self.item_start is None:
+                        # Only top-level keys matter; their text is short
+                        if text is None:
+                            text = self.text()
+                        self.last_string = text[self.string_start:i + 1]
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = i
+            elif char == ':':
+                if len(self.stack) == 1 and self.last_string is not None:
+                    try:
+                        self.pending_key = json.loads(self.last_string)
+                    except ValueError:
+                        self.pending_key = None
+            elif char == ',':
+                if len(self.stack) == 1:
+                    self.pending_key = None
+                    self.last_string = None
+            elif char in '{[':
+                if char == '[' and len(self.stack) == 1 and self.pending_key == self.key:
+                    self.in_items = True
+                elif char == '{' and self.in_items and len(self.stack) == 2:
+                    self.item_start = i
+                self.stack.append(char)
+            elif char in '}]':
+                if not self.stack or self.stack.pop() != ('{' if char == '}' else '['):
+                    self.failed = True
+                    return completed
+                if char == '}' and self.item_start is not None and len(self.stack) == 2:
+                    if text is None:
+                        text = self.text()
+                    try:
+                        item = json.loads(text[self.item_start:i + 1])
+                    except ValueError:
+                        item = None
+                    if isinstance(item, dict):
+                        completed.append(item)
+                    self.item_start = None
+                elif char == ']' and self.in_items and len(self.stack) == 1:
+                    self.in_items = False
+        return completed
@@ -1,57 +1,429 @@
-from typing import Dict, Any
-from .separator import SeparatorAgent
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import (Future, ThreadPoolExecutor, as_completed, wait, FIRST_EXCEPTION,
+                                TimeoutError as FuturesTimeoutError)
+from typing import Dict, Any, List, Iterator, Tuple
+from config import Config
+import metrics
+from .separator import SeparatorAgent, CompactSeparatorAgent
 from .refiner import RefinerAgent
+from .fused import FusedAgent
+from .singleflight import SingleFlight, cross_worker_lock_dir
+from .preparser import separation_strategy
+from .deadline import remaining, DeadlineExceeded
+from .chunking import chunk_text, merge_chunk_entries
+from .incremental import plan_incremental, previous_entries
+
+logger = logging.getLogger(__name__)
+
+# 'two_stage': separator then one refiner call per entry
+# 'fused': one structured call, falling back to two_stage if it fails validation
+PIPELINE_MODES = ('two_stage', 'fused')
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different resubmissions match"""
+    return ' '.join(text.split())
+
+
+def refine_key(entry: Dict[str, Any]):
+    """Entries with the same key get the same refined narrative"""
+    return normalize_text(str(entry.get('activity', ''))).lower(), str(entry.get('hours', 'unspecified'))
+
 
 class AgentPipeline:
     """Orchestrate the two-agent pipeline"""
-    
-    def __init__(self):
+
+    def __init__(self, max_workers: int = None):
         self.separator_agent = SeparatorAgent()
+        self.compact_separator_agent = CompactSeparatorAgent()
         self.refiner_agent = RefinerAgent()
-    
-    def process(self, raw_text: str) -> Dict[str, Any]:
-        # Step 1: Separate entries (includes basic cleanup)
-        separated_result = self.separator_agent.process(raw_text)
-        entries = separated_result.get('entries', [])
+        self.fused_agent = FusedAgent()
+
+        # Bounded pool shared by all requests handled by this pipeline
+        self.max_workers = max_workers or Config.REFINER_CONCURRENCY
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+        # Identical dictations in flight share one pipeline run
+        self.flight = SingleFlight(cross_worker_lock_dir())
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='refiner'
+                    )
+        return self._executor
+
+    def shutdown(self):
+        """Release the refiner worker threads"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    @staticmethod
+    def validate_hours(entry: Dict[str, Any]) -> float:
+        """Coerce an entry's hours to a number within 0-24"""
+        hours = entry.get('hours', 0.0)
+
+        # Ensure hours is a number
+        try:
+            hours = float(hours)
+        except (ValueError, TypeError):
+            logger.warning("Invalid hours value '%s' for entry, defaulting to 0.0", hours)
+            hours = 0.0
+
+        # Validate reasonable hour range (0-24 hours per entry)
+        if hours < 0:
+            logger.warning("Negative hours (%s) detected, setting to 0.0", hours)
+            hours = 0.0
+        elif hours > 24:
+            logger.warning("Unreasonable hours (%s) detected for single entry, capping at 24.0", hours)
+            hours = 24.0
+
+        # Log if hours seem unusual but acceptable
+        if hours > 12:
+            logger.info("Large hour value (%s) for entry: %s", hours, entry.get('activity', 'unknown'))
+
+        return hours
+
+    def refine_entry(self, entry: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+        """Refine a single entry, isolating failures to that entry"""
+        try:
+            with metrics.timer('stage_seconds', stage='refine'):
+                refined_result = self.refiner_agent.process(entry, use_cache=use_cache)
+            return {'text': refined_result['refined_narrative']}
+        except Exception as e:
+            logger.warning("Refinement failed for entry '%s': %s", entry.get('activity', 'unknown'), e)
+            # Fall back to the separated activity so the rest of the dictation survives
+            return {'text': entry['activity'], 'error': str(e)}
+
+    def submit_refine(self, entry: Dict[str, Any], use_cache: bool = True) -> Future:
+        """Start refining an entry on the shared pool"""
+        # Run in a copy of this context so the refinement sees the request deadline
+        return self.executor.submit(contextvars.copy_context().run,
+                                    metrics.queued('refiner', self.refine_entry), entry, use_cache)
+
+    @staticmethod
+    def discard_speculation(started: Dict[Any, Future]):
+        """Drop speculative refinements the validated entries do not need"""
+        for future in started.values():
+            future.cancel()  # one already running finishes; its narrative is only cached
+        if started:
+            metrics.inc('speculative_refinements_total', len(started), outcome='discarded')
+
+    def iter_refine(self, entries: List[Dict[str, Any]], use_cache: bool = True,
+                    started: Dict[Any, Future] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (index, refined) for each entry as soon as its refinement completes.
+
+        started maps refine_key to refinements already running (see
+        separate_speculatively); the entries reuse the ones they match.
+        """
+        # Duplicate activities within a dictation are refined once
+        positions = {}
+        for index, entry in enumerate(entries):
+            positions.setdefault(refine_key(entry), []).append(index)
+
+        started = dict(started or {})
+        if not started and (len(positions) <= 1 or self.max_workers <= 1):
+            for indexes in positions.values():
+                refined = self.refine_entry(entries[indexes[0]], use_cache)
+                for index in indexes:
+                    yield index, dict(refined)
+            return
+
+        futures = {}
+        reused = 0
+        for key, indexes in positions.items():
+            future = started.pop(key, None)
+            if future is None:
+                future = self.submit_refine(entries[indexes[0]], use_cache)
+            else:
+                reused += 1
+            futures[future] = indexes
+        if reused:
+            metrics.inc('speculative_refinements_total', reused, outcome='used')
+        self.discard_speculation(started)
+
+        pending = dict(futures)
+        try:
+            for future in as_completed(futures, timeout=remaining()):
+                for index in pending.pop(future):
+                    yield index, dict(future.result())
+        except FuturesTimeoutError:
+            # Out of time: fall back to the separated activity for the stragglers
+            error = str(DeadlineExceeded())
+            for indexes in pending.values():
+                for index in indexes:
+                    yield index, {'text': entries[index]['activity'], 'error': error}
+
+    def refine_entries(self, entries: List[Dict[str, Any]], use_cache: bool = True) -> List[Dict[str, Any]]:
+        """Refine entries concurrently, returning results in input order"""
+        refined_results = [None] * len(entries)
+        for index, refined in self.iter_refine(entries, use_cache):
+            refined_results[index] = refined
+        return refined_results
+
+    def separate_speculatively(self, raw_text: str,
+                               use_cache: bool = True) -> Tuple[Dict[str, Any], Dict[Any, Future]]:
+        """Separate with a streamed separator call, refining each entry as soon as it closes.
+
+        Returns the validated separation and {refine_key: future} for the
+        refinements already started, so generation and refinement overlap.
+        Uses plain separate() when streaming is off or the dictation would not
+        go to the full separator in one call.
+        """
+        if (not Config.SEPARATOR_STREAMING or self.max_workers <= 1
+                or len(chunk_text(raw_text)) > 1 or separation_strategy(raw_text)[0] != 'full'):
+            return self.separate(raw_text, use_cache), {}
+
+        started = {}
+        separated_result = {'entries': []}
+        try:
+            for event, payload in self.separator_agent.iter_entries(raw_text, use_cache):
+                if event == 'entry':
+                    key = refine_key(payload)
+                    if key not in started:
+                        started[key] = self.submit_refine(payload, use_cache)
+                else:
+                    separated_result = payload
+        except Exception:
+            self.discard_speculation(started)
+            raise
+        return separated_result, started
+
+    def separate(self, raw_text: str, use_cache: bool = True) -> Dict[str, Any]:
+        """Separate entries, splitting long dictations into chunks separated in parallel"""
+        chunks = chunk_text(raw_text)
+        if len(chunks) == 1:
+            return self.separate_chunk(raw_text, use_cache)
+        
+        futures = [self.executor.submit(contextvars.copy_context().run,
+                                        metrics.queued('refiner', self.separate_chunk), chunk, use_cache)
+                   for chunk in chunks]
+        # Every chunk is needed, so stop at the first failure or at the deadline
+        done, not_done = wait(futures, timeout=remaining(), return_when=FIRST_EXCEPTION)
+        for future in not_done:
+            future.cancel()
+        failed = next((future for future in done if future.exception() is not None), None)
+        if failed is not None:
+            raise failed.exception()
+        if not_done:
+            raise DeadlineExceeded()
+        return {'entries': merge_chunk_entries(chunks, [future.result().get('entries', []) for future in futures])}
+
+    def separate_chunk(self, raw_text: str, use_cache: bool = True) -> Dict[str, Any]:
+        """Separate entries, letting the local pre-parser skip or shrink the call"""
+        strategy, parsed = separation_strategy(raw_text)
+        if strategy == 'skip':
+            return {'entries': parsed['entries']}
+        
+        if strategy == 'compact':
+            separated_result = self.compact_separator_agent.process(raw_text, use_cache=use_cache)
+            if separated_result.get('entries'):
+                return separated_result
+            logger.warning("Compact separator returned no entries, retrying with full prompt")
+        
+        return self.separator_agent.process(raw_text, use_cache=use_cache)
+
+    def process_fused(self, raw_text: str, use_cache: bool = True):
+        """Run the single-call mode; returns None when the caller should fall back"""
+        if len(chunk_text(raw_text)) > 1:
+            # Too long for one call; the two-stage path separates it in chunks
+            return None
         
-        # Step 2: Refine each entry
+        try:
+            with metrics.timer('stage_seconds', stage='fused'):
+                fused_result = self.fused_agent.process(raw_text, use_cache=use_cache)
+        except Exception as e:
+            logger.warning("Fused call failed, falling back to two-stage pipeline: %s", e)
+            return None
+        
+        if not fused_result.get('valid'):
+            logger.warning("Fused output failed validation, falling back to two-stage pipeline")
+            return None
+        
+        entries = fused_result['entries']
+        hours_list = [self.validate_hours(entry) for entry in entries]
+        refined_results = [{'text': entry['narrative']} for entry in entries]
+        
+        return self.assemble_result(raw_text, entries, hours_list, refined_results)
+
+    def separate_region(self, region: str, mode: str,
+                        use_cache: bool = True) -> List[Tuple[Dict[str, Any], Any]]:
+        """(entry, refined or None) pairs for one edited region of a dictation"""
+        if mode == 'fused':
+            result = self.process_fused(region, use_cache)
+            if result is not None:
+                return [({'activity': n['original'], 'hours': n['hours']}, {'text': n['text']})
+                        for n in result['narratives']]
+        return [(entry, None) for entry in self.separate(region, use_cache).get('entries', [])]
+
+    def process_incremental(self, raw_text: str, previous: Dict[str, Any] = None, mode: str = None,
+                            use_cache: bool = True) -> Dict[str, Any]:
+        """Re-enhance an edited dictation, reusing the unchanged part of a previous result.
+
+        previous is {'text': ..., 'narratives': [...]} as returned for the
+        earlier version. Each narrative gains a 'reused' flag and the result
+        an 'incremental' summary; without a usable previous result (or when
+        most of the text changed) the whole dictation is processed.
+        """
+        mode = mode or Config.PIPELINE_MODE
+        segments = None
+        if previous:
+            old_entries, old_refined = previous_entries(previous['narratives'])
+            segments = plan_incremental(previous['text'], old_entries, raw_text)
+        if segments is None:
+            result = self.process(raw_text, mode, use_cache)
+            return dict(result, narratives=[dict(n, reused=False) for n in result['narratives']],
+                        incremental={'reused': 0, 'processed': len(result['narratives']), 'fullRun': True})
+
+        regions = [value for kind, value in segments if kind == 'separate']
+        with metrics.timer('stage_seconds', stage='separate'):
+            if len(regions) > 1 and all(len(chunk_text(region)) == 1 for region in regions):
+                # Regions are separated in parallel; chunked ones would nest pool work
+                futures = [self.executor.submit(contextvars.copy_context().run,
+                                                metrics.queued('refiner', self.separate_region),
+                                                region, mode, use_cache)
+                           for region in regions]
+                separated = iter([future.result() for future in futures])
+            else:
+                separated = iter([self.separate_region(region, mode, use_cache) for region in regions])
+
+        entries, refined_results, reused = [], [], []
+        for kind, value in segments:
+            pairs = ([(old_entries[index], old_refined[index]) for index in value] if kind == 'keep'
+                     else next(separated))
+            for entry, refined in pairs:
+                entries.append(entry)
+                refined_results.append(refined if kind == 'separate' or 'error' not in refined else None)
+                reused.append(kind == 'keep' and refined_results[-1] is not None)
+
+        hours_list = [self.validate_hours(entry) for entry in entries]
+        pending = [index for index, refined in enumerate(refined_results) if refined is None]
+        for position, refined in self.iter_refine([entries[index] for index in pending], use_cache):
+            refined_results[pending[position]] = refined
+
+        result = self.assemble_result(raw_text, entries, hours_list, refined_results)
+        for narrative, flag in zip(result['narratives'], reused):
+            narrative['reused'] = flag
+        result['incremental'] = {'reused': sum(reused), 'processed': len(entries) - sum(reused), 'fullRun': False}
+        return result
+
+    def process(self, raw_text: str, mode: str = None, use_cache: bool = True) -> Dict[str, Any]:
+        mode = mode or Config.PIPELINE_MODE
+        if not use_cache:
+            return self.run(raw_text, mode, use_cache)
+        
+        key = f"{mode}:{normalize_text(raw_text)}"
+        result = self.flight.do(key, self.run, raw_text, mode, use_cache)
+        # A shared result may carry another caller's spacing of the same text
+        return dict(result, original=raw_text)
+
+    def run(self, raw_text: str, mode: str, use_cache: bool = True) -> Dict[str, Any]:
+        """Run the pipeline once, without request coalescing"""
+        for event, payload in self.iter_run(raw_text, mode, use_cache):
+            if event == 'result':
+                return payload
+
+    def iter_run(self, raw_text: str, mode: str = None,
+                 use_cache: bool = True) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Run the pipeline once, yielding (event, payload) as each stage completes.
+
+        Events are 'separated' with the validated entries, one 'narrative'
+        per entry in completion order, and finally 'result' carrying the
+        same dict that process() returns.
+        """
+        mode = mode or Config.PIPELINE_MODE
+        if mode == 'fused':
+            result = self.process_fused(raw_text, use_cache)
+            if result is not None:
+                yield 'separated', {'entries': [{'activity': n['original'], 'hours': n['hours']}
+                                                for n in result['narratives']]}
+                for index, narrative in enumerate(result['narratives']):
+                    yield 'narrative', {'index': index, 'narrative': narrative}
+                yield 'result', result
+                return
+        
+        # Step 1: Separate entries (includes basic cleanup); refinement of
+        # streamed entries starts while the separator is still generating
+        with metrics.timer('stage_seconds', stage='separate'):
+            separated_result, started = self.separate_speculatively(raw_text, use_cache)
+        entries = separated_result.get('entries', [])
+
+        # Validate hours before processing
+        hours_list = [self.validate_hours(entry) for entry in entries]
+        yield 'separated', {'entries': [{'activity': entry['activity'], 'hours': round(hours, 2)}
+                                        for entry, hours in zip(entries, hours_list)]}
+
+        # Step 2: Refine all entries concurrently, reporting each as it lands
+        refined_results = [None] * len(entries)
+        for index, refined in self.iter_refine(entries, use_cache, started):
+            refined_results[index] = refined
+            yield 'narrative', {'index': index,
+                                'narrative': self.make_narrative(entries[index], hours_list[index], refined)}
+
+        yield 'result', self.assemble_result(raw_text, entries, hours_list, refined_results)
+
+    @staticmethod
+    def make_narrative(entry: Dict[str, Any], hours: float, refined: Dict[str, Any]) -> Dict[str, Any]:
+        """Pipeline narrative for one entry"""
+        narrative = {
+            'text': refined['text'],
+            'hours': round(hours, 2),  # Round to 2 decimal places
+            'original': entry['activity']
+        }
+        if 'error' in refined:
+            narrative['error'] = refined['error']
+        return narrative
+
+    @staticmethod
+    def assemble_result(raw_text: str, entries: List[Dict[str, Any]],
+                        hours_list: List[float], refined_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine separated entries and their refinements into the pipeline result"""
         refined_narratives = []
         total_hours = 0.0
-        
-        for entry in entries:
-            # Validate hours before processing
-            hours = entry.get('hours', 0.0)
-            
-            # Ensure hours is a number
-            try:
-                hours = float(hours)
-            except (ValueError, TypeError):
-                print(f"Warning: Invalid hours value '{hours}' for entry, defaulting to 0.0")
-                hours = 0.0
-            
-            # Validate reasonable hour range (0-24 hours per entry)
-            if hours < 0:
-                print(f"Warning: Negative hours ({hours}) detected, setting to 0.0")
-                hours = 0.0
-            elif hours > 24:
-                print(f"Warning: Unreasonable hours ({hours}) detected for single entry, capping at 24.0")
-                hours = 24.0
-            
-            # Log if hours seem unusual but acceptable
-            if hours > 12:
-                print(f"Notice: Large hour value ({hours}) for entry: {entry.get('activity', 'unknown')}")
-            
-            refined_result = self.refiner_agent.process(entry)
-            refined_narratives.append({
-                'text': refined_result['refined_narrative'],
-                'hours': round(hours, 2),  # Round to 2 decimal places
-                'original': entry['activity']
-            })
+
+        for entry, hours, refined in zip(entries, hours_list, refined_results):
+            refined_narratives.append(AgentPipeline.make_narrative(entry, hours, refined))
             total_hours += hours
-        
+
         return {
             'original': raw_text,
             'cleaned': raw_text,  # No separate cleaning step now
             'narratives': refined_narratives,
             'total_hours': round(total_hours, 1)
-        }
\ No newline at end of file
+        }
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> AgentPipeline:
+    """Return the process-wide pipeline, creating it on first use"""
+    global _pipeline
+
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = AgentPipeline()
+    return _pipeline
+
+
+def _after_fork_in_child():
+    # Worker threads do not survive a fork; let the child start its own pool
+    if _pipeline is not None:
+        _pipeline._executor = None
+        _pipeline._executor_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
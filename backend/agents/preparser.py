@@ -0,0 +1,271 @@
+"""
+Deterministic pre-parser for dictations.
+
+Splits a dictation into activities on sentence and clause boundaries and
+extracts stated durations as decimal hours, following the same rules that
+SEPARATOR_SYSTEM_PROMPT teaches the model. Each parse carries a confidence
+score; the pipeline uses it to skip the separator call entirely or to send
+the much smaller SEPARATOR_COMPACT_SYSTEM_PROMPT instead.
+"""
+
+import re
+from typing import Dict, Any, List, Tuple
+from config import Config
+
+NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11,
+    'twelve': 12, 'fifteen': 15, 'twenty': 20, 'thirty': 30,
+    'forty-five': 45, 'forty five': 45, 'forty': 40, 'sixty': 60, 'ninety': 90
+}
+
+_DIGITS = r'(?:\d+(?:\.\d+)?|\.\d+)'
+# 'a' and 'an' only count before a spelled-out singular unit ("an hour"), so
+# "I am" and "10 am" are not read as a minute
+_WORDS = '|'.join(re.escape(word) for word in sorted(NUMBER_WORDS, key=len, reverse=True)
+                  if word not in ('a', 'an'))
+_NUM = rf'(?:{_DIGITS}|{_WORDS})'
+_HOUR = r'(?:hours?|hrs?)\b'
+_MIN = r'(?:minutes?|mins?)\b'
+# A number with its unit; the bare 'h' and 'm' units only directly after digits
+_HOURS = rf'(?:{_DIGITS}(?:[\s-]*{_HOUR}|\s?h\b)|(?:{_WORDS})[\s-]*{_HOUR}|an?\s+hour\b)'
+_MINUTES = rf'(?:{_DIGITS}(?:[\s-]*{_MIN}|\s?m\b)|(?:{_WORDS})[\s-]*{_MIN}|an?\s+minute\b)'
+LEADING_NUMBER_RE = re.compile(rf'{_NUM}|an?\b', re.IGNORECASE)
+
+# Qualifiers around a duration that belong to the time phrase, not the activity
+_LEAD = r'(?:(?:for|spent|took|lasted|about|approximately|approx\.?|around|roughly|~)\s+)*'
+
+DURATION_RE = re.compile(
+    rf'(?<![\w.]){_LEAD}(?:'
+    rf'(?P<half>half\s+(?:an?\s+)?hour)'
+    rf'|(?P<quarter>(?:a\s+)?quarter\s+(?:of\s+an?\s+)?hour)'
+    rf'|(?P<hh>{_HOURS})\s+and\s+a\s+half'
+    rf'|(?P<ah>{_NUM})\s+and\s+a\s+half[\s-]*{_HOUR}'
+    rf'|(?P<h>{_HOURS})(?:[\s,]*(?:and\s+)?(?P<hm>{_MINUTES}))?'
+    rf'|(?P<m>{_MINUTES})'
+    rf')(?:\s+(?:long|on|of)\b)?',
+    re.IGNORECASE
+)
+
+# Time stated too loosely to convert without judgement
+VAGUE_RE = re.compile(
+    r'\b(?:(?:a\s+)?(?:couple|few|several)\s+(?:of\s+)?(?:hours|minutes)'
+    r'|a\s+while|a\s+bit|all\s+(?:day|morning|afternoon)'
+    r'|most\s+of\s+the\s+(?:day|morning|afternoon)'
+    r'|\d+(?:\.\d+)?\s*(?:-|to|or)\s*\d+(?:\.\d+)?\s*(?:hours?|hrs?|minutes?|mins?))\b',
+    re.IGNORECASE
+)
+
+# Abbreviation expansions from the SEPARATOR_SYSTEM_PROMPT cleanup rules
+ABBREVIATIONS = [
+    (re.compile(r'\bw/o\b', re.I), 'without'),
+    (re.compile(r'\bw/\s*', re.I), 'with '),
+    (re.compile(r'\bre:\s*', re.I), 'regarding '),
+    (re.compile(r'\babt\b', re.I), 'about'),
+    (re.compile(r'\bapprox\b\.?', re.I), 'approximately'),
+    (re.compile(r'\bdocs\b', re.I), 'documents'),
+    (re.compile(r'\bmtg\b', re.I), 'meeting'),
+    (re.compile(r'\batty\b', re.I), 'attorney'),
+    (re.compile(r'\bt/c\b', re.I), 'telephone call'),
+]
+
+FILLER_RE = re.compile(r'\b(?:um+|uh+|er+|hmm+|you know|i mean)\b,?\s*', re.IGNORECASE)
+
+# Sentence ends, semicolons and line breaks always separate activities
+SENTENCE_RE = re.compile(r'(?<=[.!?;])\s+|\n+')
+# "..., then ..." and similar sequencing phrases also separate activities
+SEQUENCE_RE = re.compile(r'\s*,?\s+(?:and\s+)?(?:then|after\s+that|afterwards)\s*,?\s+|^\s*(?:then|also)\s+',
+                         re.IGNORECASE)
+# Weaker boundaries, only used when a clause carries more than one duration
+CLAUSE_RE = re.compile(r'\s*,\s*(?:and\s+)?|\s+and\s+', re.IGNORECASE)
+
+LEADING_WORDS_RE = re.compile(r'^(?:(?:and|also|then|i|i\s+have|i\'ve|we|so|ok(?:ay)?|spent|for)\b[\s,]*)+',
+                              re.IGNORECASE)
+TRAILING_WORDS_RE = re.compile(r'[\s,]*\b(?:for|on|of|in|to|with|and|spent|which\s+took|that\s+took|it\s+took)\s*$',
+                               re.IGNORECASE)
+DANGLING_RE = re.compile(r'^(?:it|that|this|which|took|lasted)\b', re.IGNORECASE)
+
+# Word shapes the separator's cleanup would have corrected: no vowel, a letter
+# tripled, letters and digits run together, a word repeated
+WORD_RE = re.compile(r"[A-Za-z0-9']+")
+ORDINAL_RE = re.compile(r'^\d+(?:st|nd|rd|th)$', re.IGNORECASE)
+VOWELS = set('aeiouy')
+
+
+def _number(token: str) -> float:
+    """Value of the number a duration group starts with ("2.5 hours" -> 2.5)"""
+    token = ' '.join(LEADING_NUMBER_RE.match(token).group(0).lower().split())
+    if token in NUMBER_WORDS:
+        return float(NUMBER_WORDS[token])
+    return float(token)
+
+
+def _match_hours(match: re.Match) -> float:
+    groups = match.groupdict()
+    if groups['half']:
+        return 0.5
+    if groups['quarter']:
+        return 0.25
+    if groups['hh']:
+        return _number(groups['hh']) + 0.5
+    if groups['ah']:
+        return _number(groups['ah']) + 0.5
+    if groups['h']:
+        hours = _number(groups['h'])
+        if groups['hm']:
+            hours += _number(groups['hm']) / 60
+        return hours
+    return _number(groups['m']) / 60
+
+
+def find_durations(text: str) -> List[Tuple[re.Match, float]]:
+    """Return each duration mention in text with its value in hours"""
+    return [(match, _match_hours(match)) for match in DURATION_RE.finditer(text)]
+
+
+def expand_abbreviations(text: str) -> str:
+    for pattern, replacement in ABBREVIATIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text on sentence ends, semicolons and line breaks"""
+    return [part.strip() for part in SENTENCE_RE.split(text) if part and part.strip()]
+
+
+def _split_clauses(sentence: str) -> List[str]:
+    parts = [part for part in SEQUENCE_RE.split(sentence) if part and part.strip()]
+    clauses = []
+    for part in parts:
+        if len(find_durations(part)) <= 1:
+            clauses.append(part)
+            continue
+
+        # Several durations in one clause: group comma/"and" pieces so each
+        # group closes on the piece that states its time
+        group = []
+        groups = []
+        for piece in CLAUSE_RE.split(part):
+            if not piece.strip():
+                continue
+            group.append(piece)
+            if find_durations(piece):
+                groups.append(', '.join(group))
+                group = []
+        if group and groups:
+            groups[-1] = ', '.join([groups[-1]] + group)
+        clauses.extend(groups or [part])
+    return clauses
+
+
+def misshapen_words(text: str) -> List[str]:
+    """Words that look misspelled or garbled (expanded abbreviations and acronyms pass)"""
+    found = []
+    previous = None
+    for word in WORD_RE.findall(text):
+        lower = word.lower().strip("'")
+        letters = ''.join(c for c in lower if c.isalpha())
+        if previous == lower and letters:
+            found.append(f'{word} {word}')
+        elif word.isupper() or ORDINAL_RE.match(lower):
+            pass
+        elif letters and any(c.isdigit() for c in lower):
+            found.append(word)
+        elif len(letters) >= 3 and not VOWELS & set(letters):
+            found.append(word)
+        elif re.search(r'([a-z])\1\1', letters):
+            found.append(word)
+        previous = lower
+    return found
+
+
+def _clean_activity(clause: str) -> str:
+    activity = DURATION_RE.sub(' ', clause)
+    activity = re.sub(r'\(\s*\)', ' ', activity)
+    activity = ' '.join(activity.split()).strip(' ,.;:!?-')
+    # Stripping a word can expose another (e.g. "and then for"), so repeat
+    for _ in range(3):
+        activity = LEADING_WORDS_RE.sub('', activity)
+        activity = TRAILING_WORDS_RE.sub('', activity)
+        activity = activity.strip(' ,.;:!?-')
+    return activity
+
+
+def preparse(text: str) -> Dict[str, Any]:
+    """Split a dictation into entries without calling the model.
+
+    Returns {'entries': [{'activity', 'hours'}], 'confidence': 0-1,
+    'reasons': [...]} where reasons explain any confidence reduction.
+    """
+    reasons = []
+    confidence = 1.0
+
+    def lower(value, reason):
+        nonlocal confidence
+        confidence = min(confidence, value)
+        reasons.append(reason)
+
+    if not text or not text.strip():
+        return {'entries': [], 'confidence': 0.0, 'reasons': ['empty input']}
+
+    if FILLER_RE.search(text):
+        lower(0.7, 'filler words need cleanup')
+        text = FILLER_RE.sub('', text)
+    if VAGUE_RE.search(text):
+        lower(0.3, 'vague or ranged duration')
+
+    text = expand_abbreviations(text)
+    # Skipping the separator also skips its spelling and grammar cleanup
+    misshapen = misshapen_words(text)
+    if misshapen:
+        lower(0.8, f"words need cleanup: {', '.join(misshapen[:5])}")
+
+    entries = []
+    for sentence in split_sentences(text):
+        clauses = _split_clauses(sentence)
+        if len(clauses) > 1 and len(find_durations(sentence)) > 1 and not SEQUENCE_RE.search(sentence):
+            lower(0.8, 'activities split on commas')
+
+        for clause in clauses:
+            durations = find_durations(clause)
+            activity = _clean_activity(clause)
+
+            if not activity:
+                lower(0.2, f"no activity text in '{clause}'")
+                continue
+            if DANGLING_RE.match(activity) or len(activity.split()) < 2:
+                lower(0.3, f"activity '{activity}' may belong to a neighbouring sentence")
+            if len(durations) > 1:
+                lower(0.4, f"several durations in '{clause}'")
+            if not durations:
+                lower(0.9, f"no time stated for '{activity}'")
+
+            hours = float(sum(value for _, value in durations))
+            if hours > 24:
+                lower(0.2, f"implausible duration {hours} for '{activity}'")
+            entries.append({'activity': activity, 'hours': round(hours, 2)})
+
+    if not entries:
+        return {'entries': [], 'confidence': 0.0, 'reasons': reasons + ['no activities found']}
+
+    return {'entries': entries, 'confidence': confidence, 'reasons': reasons}
+
+
+def separation_strategy(text: str) -> Tuple[str, Dict[str, Any]]:
+    """Choose how to separate a dictation: 'skip', 'compact' or 'full'.
+
+    'skip' means the pre-parsed entries can be used as-is (only for text
+    with nothing left to clean up), 'compact' means
+    the small separator prompt is enough, 'full' means the regular
+    separator call. Always 'full' unless PREPARSER_MODE is 'auto'.
+    """
+    if Config.PREPARSER_MODE != 'auto':
+        return 'full', None
+
+    parsed = preparse(text)
+    if parsed['confidence'] >= Config.PREPARSER_SKIP_CONFIDENCE:
+        return 'skip', parsed
+    if parsed['confidence'] >= Config.PREPARSER_COMPACT_CONFIDENCE:
+        return 'compact', parsed
+    return 'full', parsed
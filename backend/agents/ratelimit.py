@@ -0,0 +1,420 @@
+import asyncio
+import email.utils
+import os
+import random
+import struct
+import threading
+import time
+from config import Config
+from .circuit import get_circuit_breaker
+from .deadline import remaining, check_deadline, call_timeout, DeadlineExceeded
+
+try:
+    import fcntl
+except ImportError:  # Windows: shared buckets fall back to per-process ones
+    fcntl = None
+
+# Rough prompt size in tokens; Azure counts max_tokens (or its own estimate)
+# against TPM when the request is admitted, so this only has to be close
+CHARS_PER_TOKEN = 4
+
+# Status codes worth retrying besides 429
+TRANSIENT_STATUS_CODES = (408, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by everything in a worker process.
+
+    rate is tokens added per second and capacity the burst size; a rate of
+    0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens if available; otherwise return the seconds to wait"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self._refill(now)
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until tokens are available"""
+        # Never ask for more than a full bucket or we would wait forever
+        tokens = min(tokens, self.capacity)
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            self.check_wait(wait)
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0):
+        """Wait for tokens without blocking the event loop"""
+        tokens = min(tokens, self.capacity)
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            self.check_wait(wait)
+            await asyncio.sleep(wait)
+
+    @staticmethod
+    def check_wait(wait: float):
+        """Fail now rather than wait past the request deadline"""
+        left = remaining()
+        if left is not None and wait > left:
+            raise DeadlineExceeded()
+
+    def pause(self, seconds: float):
+        """Hold every caller back, e.g. for a 429's Retry-After"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket whose state lives in a file shared by every worker on the host.
+
+    Each acquire takes an exclusive flock on the state file, refills from the
+    wall clock and writes the new balance back, so all processes draw from one
+    quota. Pauses are shared too: one worker's 429 holds back the others.
+    """
+
+    _STATE = struct.Struct('ddd')  # tokens, updated, paused_until
+
+    def __init__(self, path: str, rate: float, capacity: float = None):
+        super().__init__(rate, capacity)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _update(self, change):
+        """Run change(now, tokens, paused_until) -> (result, tokens, paused_until) under the file lock"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            now = time.time()
+            raw = os.pread(fd, self._STATE.size, 0)
+            if len(raw) == self._STATE.size:
+                tokens, updated, paused_until = self._STATE.unpack(raw)
+                tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+            else:
+                tokens, paused_until = self.capacity, 0.0
+            result, tokens, paused_until = change(now, tokens, paused_until)
+            os.pwrite(fd, self._STATE.pack(tokens, now, paused_until), 0)
+            return result
+        finally:
+            os.close(fd)  # also releases the lock
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        if self.rate <= 0:
+            return 0.0
+
+        def take(now, available, paused_until):
+            if now < paused_until:
+                return paused_until - now, available, paused_until
+            if available >= tokens:
+                return 0.0, available - tokens, paused_until
+            return (tokens - available) / self.rate, available, paused_until
+
+        return self._update(take)
+
+    def pause(self, seconds: float):
+        if self.rate <= 0:
+            return
+        self._update(lambda now, available, paused_until:
+                     (None, available, max(paused_until, now + seconds)))
+
+
+def make_bucket(name: str, rate: float, capacity: float = None, state_dir: str = None) -> TokenBucket:
+    """Per-process bucket, or a host-wide one when state_dir is set"""
+    if state_dir and fcntl is not None:
+        return SharedTokenBucket(os.path.join(state_dir, f'{name}.bucket'), rate, capacity)
+    return TokenBucket(rate, capacity)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight calls.
+
+    Every success grows the limit by 1/limit (about +1 per round trip of
+    calls); throttling halves it, at most once per DECREASE_INTERVAL so a
+    burst of 429s from one overload only counts once.
+    """
+
+    DECREASE_INTERVAL = 1.0
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max(max_limit, min_limit)
+        self.min_limit = min_limit
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def try_enter(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def enter(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait(remaining())
+                check_deadline()
+            self.in_flight += 1
+
+    async def enter_async(self):
+        while not self.try_enter():
+            check_deadline()
+            await asyncio.sleep(0.05)
+
+    def exit(self, throttled: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._last_decrease >= self.DECREASE_INTERVAL:
+                    self.limit = max(float(self.min_limit), self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+def estimate_tokens(params: dict) -> int:
+    """Estimated TPM cost of a chat completion: prompt size plus the completion budget"""
+    chars = sum(len(message.get('content') or '') for message in params.get('messages', []))
+    completion = params.get('max_tokens') or Config.AZURE_OPENAI_COMPLETION_TOKENS
+    return chars // CHARS_PER_TOKEN + completion
+
+
+def is_throttled(error: Exception) -> bool:
+    import openai  # already loaded by the client that raised the error
+    return isinstance(error, openai.RateLimitError)
+
+
+def is_retryable(error: Exception) -> bool:
+    import openai
+    if is_throttled(error) or isinstance(error, openai.APIConnectionError):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in TRANSIENT_STATUS_CODES
+
+
+def retry_after(error: Exception):
+    """Seconds the server asked us to wait, from retry-after-ms or Retry-After"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+    except ValueError:
+        pass
+
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AzureRateLimiter:
+    """Paces Azure OpenAI calls to the deployment's quota and retries failures.
+
+    Calls wait for the request (RPM) and token (TPM) buckets, run under an
+    adaptive concurrency limit, and on 429 or transient errors are retried
+    with full-jitter exponential backoff, or after Retry-After when the
+    server sends one. Each attempt is bounded by the request deadline and
+    refused outright while the circuit breaker is open.
+    """
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, max_concurrency: int = 16,
+                 max_retries: int = 6, base_delay: float = 0.5, max_delay: float = 30.0,
+                 state_dir: str = None):
+        # Azure enforces quota over short windows, so allow bursts of ~10 seconds' worth
+        self.requests = make_bucket('requests', rpm / 60, max(rpm / 6, 1.0), state_dir)
+        self.tokens = make_bucket('tokens', tpm / 60, max(tpm / 6, 1.0), state_dir)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.throttled = 0
+        self.retries = 0
+
+    def retry_delay(self, error: Exception, attempt: int):
+        """Seconds to wait before retrying, or None if the error should be raised"""
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        self.retries += 1
+
+        delay = retry_after(error) if is_throttled(error) else None
+        if delay is not None:
+            self.throttled += 1
+            self.requests.pause(delay)
+            # Jitter so workers released together do not collide again
+            return min(delay, self.max_delay) + random.uniform(0, self.base_delay)
+        if is_throttled(error):
+            self.throttled += 1
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def attempt_kwargs(self, params: dict) -> dict:
+        """Request kwargs for one attempt, bounded by the request deadline.
+
+        Call it once the concurrency slot is held: before_call() may take the
+        breaker's half-open probe, which only an outcome passed to record()
+        gives back, so nothing else may fail between here and the attempt.
+        """
+        check_deadline()
+        timeout = call_timeout()
+        get_circuit_breaker().before_call()
+        return dict(params, timeout=timeout) if timeout is not None else params
+
+    def record(self, error: Exception = None):
+        """Report an attempt's outcome to the circuit breaker"""
+        breaker = get_circuit_breaker()
+        if error is None:
+            breaker.record_success()
+        elif is_retryable(error) and not is_throttled(error):
+            # 429s mean we are over quota, not that Azure is down; pacing handles them
+            breaker.record_failure()
+        else:
+            breaker.release()
+
+    def check_retry(self, error: Exception, attempt: int):
+        """Seconds to wait before the next attempt; raises if there should be none"""
+        delay = self.retry_delay(error, attempt)
+        if delay is None:
+            raise error
+        left = remaining()
+        if left is not None and delay >= left:
+            raise DeadlineExceeded() from error
+        return delay
+
+    def call(self, create, params: dict):
+        """Run create(**params) within quota, retrying throttled and transient failures"""
+        cost = estimate_tokens(params)
+        attempt = 0
+        while True:
+            self.requests.acquire()
+            self.tokens.acquire(cost)
+            self.concurrency.enter()
+            try:
+                kwargs = self.attempt_kwargs(params)
+            except BaseException:
+                self.concurrency.exit()
+                raise
+            throttled = False
+            try:
+                response = create(**kwargs)
+                self.record()
+                return response
+            except Exception as e:
+                throttled = is_throttled(e)
+                self.record(e)
+                delay = self.check_retry(e, attempt)
+            finally:
+                self.concurrency.exit(throttled)
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, create, params: dict):
+        """Async counterpart of call() for the AsyncAzureOpenAI client"""
+        cost = estimate_tokens(params)
+        attempt = 0
+        while True:
+            await self.requests.acquire_async()
+            await self.tokens.acquire_async(cost)
+            await self.concurrency.enter_async()
+            try:
+                kwargs = self.attempt_kwargs(params)
+            except BaseException:
+                self.concurrency.exit()
+                raise
+            throttled = False
+            try:
+                response = await create(**kwargs)
+                self.record()
+                return response
+            except asyncio.CancelledError:
+                get_circuit_breaker().release()
+                raise
+            except Exception as e:
+                throttled = is_throttled(e)
+                self.record(e)
+                delay = self.check_retry(e, attempt)
+            finally:
+                self.concurrency.exit(throttled)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> dict:
+        return {
+            'concurrencyLimit': int(self.concurrency.limit),
+            'inFlight': self.concurrency.in_flight,
+            'throttled': self.throttled,
+            'retries': self.retries
+        }
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> AzureRateLimiter:
+    """Return the process-wide limiter for Azure OpenAI calls"""
+    global _limiter
+
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = AzureRateLimiter(
+                    rpm=Config.AZURE_OPENAI_RPM_LIMIT,
+                    tpm=Config.AZURE_OPENAI_TPM_LIMIT,
+                    max_concurrency=Config.AZURE_OPENAI_MAX_CONCURRENCY,
+                    max_retries=Config.AZURE_OPENAI_MAX_RETRIES,
+                    base_delay=Config.AZURE_OPENAI_RETRY_BASE_DELAY,
+                    max_delay=Config.AZURE_OPENAI_RETRY_MAX_DELAY,
+                    state_dir=Config.RATE_LIMIT_STATE_DIR or None
+                )
+    return _limiter
+
+
+def _after_fork_in_child():
+    global _limiter, _limiter_lock
+    # Locks and in-flight counts from the parent are meaningless here
+    _limiter = None
+    _limiter_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -1,17 +1,33 @@
 from typing import Dict, Any
 from .base import BaseAgent
-from prompts import REFINER_PROMPT
+from .async_base import AsyncBaseAgent
+from prompts import REFINER_SYSTEM_PROMPT, REFINER_USER_PROMPT
 
 class RefinerAgent(BaseAgent):
     """Refine activities into professional billing narratives"""
     
+    route_name = 'refiner'
+    
+    def get_system_prompt(self) -> str:
+        return REFINER_SYSTEM_PROMPT
+    
     def get_prompt(self, entry: Dict[str, Any]) -> str:
-        return REFINER_PROMPT.format(
+        return REFINER_USER_PROMPT.format(
             activity=entry['activity'],
             hours=entry.get('hours', 'unspecified')
         )
 
+    def routing_text(self, entry: Dict[str, Any]) -> str:
+        return str(entry.get('activity', ''))
+    
+    def is_valid(self, result: Dict[str, Any]) -> bool:
+        return bool(result['refined_narrative'])
+
     def parse_response(self, response: str) -> Dict[str, Any]:
         return {
             'refined_narrative': response.strip()
-        }
\ No newline at end of file
+        }
+
+
+class AsyncRefinerAgent(RefinerAgent, AsyncBaseAgent):
+    """RefinerAgent backed by the async client"""
@@ -0,0 +1,128 @@
+"""
+Model routing between a small and a large Azure deployment.
+
+Each agent declares a route name; MODEL_ROUTING maps it to 'small', 'large'
+or 'auto'. 'auto' sends simple inputs (one short activity with at most one
+stated duration) to the small deployment and everything else to the large
+one. When a small-model response fails the agent's validation the call is
+retried on the large deployment (ROUTER_ESCALATE). Without a small
+deployment configured every call goes to the large one.
+"""
+
+import logging
+import os
+import threading
+from typing import Dict, Any
+from config import Config
+from .preparser import split_sentences, find_durations
+
+logger = logging.getLogger(__name__)
+
+TIERS = ('small', 'large')
+
+
+def parse_policies(spec: str) -> Dict[str, str]:
+    """'refiner=auto,separator=large' -> {'refiner': 'auto', 'separator': 'large'}"""
+    policies = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        route, policy = (part.strip().lower() for part in item.split('=', 1))
+        if policy not in TIERS + ('auto',):
+            logger.warning("Unknown routing policy '%s' for '%s', using 'large'", policy, route)
+            policy = 'large'
+        policies[route] = policy
+    return policies
+
+
+def is_simple(text: str, max_words: int) -> bool:
+    """One short activity with at most one stated duration"""
+    text = text.strip()
+    if not text or len(text.split()) > max_words:
+        return False
+    return len(split_sentences(text)) <= 1 and len(find_durations(text)) <= 1
+
+
+class ModelRouter:
+    """Pick a deployment per call and keep per-route latency and token statistics"""
+
+    def __init__(self, large: str, small: str = None, policies: Dict[str, str] = None,
+                 small_max_words: int = 12, escalate: bool = True):
+        self.deployments = {'large': large, 'small': small or large}
+        self.enabled = bool(small) and small != large
+        self.policies = policies or {}
+        self.small_max_words = small_max_words
+        self.escalate = escalate
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def choose(self, route: str, text: str) -> str:
+        """Tier for this call: 'small' or 'large'"""
+        if not self.enabled or route is None:
+            return 'large'
+        policy = self.policies.get(route, 'large')
+        if policy == 'auto':
+            return 'small' if is_simple(text, self.small_max_words) else 'large'
+        return policy
+
+    def deployment(self, tier: str) -> str:
+        return self.deployments[tier]
+
+    def tier_of(self, model: str) -> str:
+        return 'small' if self.enabled and model == self.deployments['small'] else 'large'
+
+    def _route_stats(self, route: str, tier: str) -> Dict[str, Any]:
+        key = f'{route}:{tier}'
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = {'calls': 0, 'seconds': 0.0, 'promptTokens': 0,
+                                        'completionTokens': 0, 'escalations': 0}
+        return stats
+
+    def record(self, route: str, model: str, seconds: float, usage=None):
+        """Account one completed upstream call"""
+        with self._lock:
+            stats = self._route_stats(route or 'default', self.tier_of(model))
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            if usage is not None:
+                stats['promptTokens'] += getattr(usage, 'prompt_tokens', 0) or 0
+                stats['completionTokens'] += getattr(usage, 'completion_tokens', 0) or 0
+
+    def record_escalation(self, route: str):
+        with self._lock:
+            self._route_stats(route, 'small')['escalations'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                key: {
+                    'calls': stats['calls'],
+                    'meanLatencyMs': round(stats['seconds'] / stats['calls'] * 1000, 1) if stats['calls'] else None,
+                    'promptTokens': stats['promptTokens'],
+                    'completionTokens': stats['completionTokens'],
+                    'escalations': stats['escalations']
+                }
+                for key, stats in self._stats.items()
+            }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """Return the process-wide model router"""
+    global _router
+
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter(
+                    large=os.getenv('AZURE_OPENAI_GPT_DEPLOYMENT', 'gpt-4.1'),
+                    small=Config.AZURE_OPENAI_SMALL_DEPLOYMENT or None,
+                    policies=parse_policies(Config.MODEL_ROUTING),
+                    small_max_words=Config.ROUTER_SMALL_MAX_WORDS,
+                    escalate=Config.ROUTER_ESCALATE
+                )
+    return _router
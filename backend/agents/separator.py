@@ -1,29 +1,59 @@
 import json
-from typing import Dict, Any
+import logging
+from typing import Dict, Any, Iterator, Tuple
+import metrics
 from .base import BaseAgent
-from prompts import SEPARATOR_PROMPT
+from .jsonstream import ItemStreamParser
+from .router import get_router
+from .async_base import AsyncBaseAgent
+from prompts import SEPARATOR_SYSTEM_PROMPT, SEPARATOR_COMPACT_SYSTEM_PROMPT, SEPARATOR_USER_PROMPT
+
+logger = logging.getLogger(__name__)
+
+
+def strip_code_fences(response: str) -> str:
+    """Remove markdown code blocks if present"""
+    response = response.strip()
+    if response.startswith('```json'):
+        response = response[7:]
+    if response.startswith('```'):
+        response = response[3:]
+    if response.endswith('```'):
+        response = response[:-3]
+    return response.strip()
+
 
 class SeparatorAgent(BaseAgent):
     """Identify and separate distinct billing activities"""
     
+    route_name = 'separator'
+    
     def expects_json_output(self) -> bool:
         """This agent expects JSON output"""
         return True
     
+    def get_system_prompt(self) -> str:
+        return SEPARATOR_SYSTEM_PROMPT
+    
     def get_prompt(self, input_text: str) -> str:
-        return SEPARATOR_PROMPT.format(input_text=input_text)
+        return SEPARATOR_USER_PROMPT.format(input_text=input_text)
+    
+    def is_valid(self, result: Dict[str, Any]) -> bool:
+        # An empty result usually means the response failed to parse
+        return bool(result.get('entries'))
+
+    @staticmethod
+    def validate_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Check one entry has the required fields, defaulting hours"""
+        if 'activity' not in entry:
+            raise ValueError("Entry missing 'activity' field")
+        if 'hours' not in entry:
+            entry['hours'] = 0.0  # Default to 0 if missing
+        return entry
 
     def parse_response(self, response: str) -> Dict[str, Any]:
         try:
-            # Remove markdown code blocks if present
-            response = response.strip()
-            if response.startswith('```json'):
-                response = response[7:]
-            if response.startswith('```'):
-                response = response[3:]
-            if response.endswith('```'):
-                response = response[:-3]
-            response = response.strip()
+            response = strip_code_fences(response)
             
             result = json.loads(response)
             
@@ -32,17 +62,93 @@ class SeparatorAgent(BaseAgent):
                 raise ValueError("Response missing 'entries' field")
             
             for entry in result['entries']:
-                if 'activity' not in entry:
-                    raise ValueError("Entry missing 'activity' field")
-                if 'hours' not in entry:
-                    entry['hours'] = 0.0  # Default to 0 if missing
+                self.validate_entry(entry)
                     
             return result
             
         except json.JSONDecodeError as e:
-            print(f"JSON parsing error in SeparatorAgent: {e}")
-            print(f"Response was: {response[:200]}...")  # Log first 200 chars
+            logger.warning("JSON parsing error in SeparatorAgent: %s; response was: %s...",
+                           e, response[:200])  # Log first 200 chars
             return {"entries": []}
         except Exception as e:
-            print(f"Error in SeparatorAgent parse_response: {e}")
-            return {"entries": []}
\ No newline at end of file
+            logger.warning("Error in SeparatorAgent parse_response: %s", e)
+            return {"entries": []}
+
+
+    def iter_entries(self, input_text: str, use_cache: bool = True) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Separate with a streamed call, yielding ('entry', entry) as each entry closes.
+
+        Ends with ('result', result): parse_response on the whole response,
+        which is authoritative. Streamed entries are speculative; if the
+        document fails validation they are not part of the result.
+        """
+        tier = self.choose_tier(input_text)
+        params = self.build_params(input_text, tier)
+        cached = self.cache_get(params, use_cache)
+        if cached is not None:
+            yield 'result', self.parse_response(cached)
+            return
+
+        parser = ItemStreamParser('entries')
+        for chunk in self.stream_content(params):
+            for entry in parser.feed(chunk):
+                try:
+                    yield 'entry', self.validate_entry(entry)
+                except ValueError:
+                    # The whole response will fail validation; stop speculating
+                    parser.failed = True
+        content = parser.text()
+
+        with metrics.timer('stage_seconds', stage='parse'):
+            result = self.parse_response(content)
+        self.cache_set(params, content, result, use_cache)
+
+        if tier == 'small' and not self.is_valid(result) and get_router().escalate:
+            get_router().record_escalation(self.route_name)
+            result = self.process_params(self.build_params(input_text, 'large'), use_cache)
+        yield 'result', result
+
+
+class AsyncSeparatorAgent(SeparatorAgent, AsyncBaseAgent):
+    """SeparatorAgent backed by the async client"""
+    
+    async def iter_entries(self, input_text: str, use_cache: bool = True):
+        """Async counterpart of SeparatorAgent.iter_entries"""
+        tier = self.choose_tier(input_text)
+        params = self.build_params(input_text, tier)
+        cached = self.cache_get(params, use_cache)
+        if cached is not None:
+            yield 'result', self.parse_response(cached)
+            return
+
+        parser = ItemStreamParser('entries')
+        async for chunk in self.stream_content(params):
+            for entry in parser.feed(chunk):
+                try:
+                    yield 'entry', self.validate_entry(entry)
+                except ValueError:
+                    parser.failed = True
+        content = parser.text()
+
+        with metrics.timer('stage_seconds', stage='parse'):
+            result = self.parse_response(content)
+        self.cache_set(params, content, result, use_cache)
+
+        if tier == 'small' and not self.is_valid(result) and get_router().escalate:
+            get_router().record_escalation(self.route_name)
+            result = await self.process_params(self.build_params(input_text, 'large'), use_cache)
+        yield 'result', result
+
+
+
+class CompactSeparatorAgent(SeparatorAgent):
+    """SeparatorAgent with the short prompt, for inputs the pre-parser mostly understood"""
+    
+    route_name = 'compact_separator'
+    
+    def get_system_prompt(self) -> str:
+        return SEPARATOR_COMPACT_SYSTEM_PROMPT
+
+
+class AsyncCompactSeparatorAgent(CompactSeparatorAgent, AsyncBaseAgent):
+    """CompactSeparatorAgent backed by the async client"""
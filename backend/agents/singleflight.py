@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import suppress
+from typing import Any, Callable, Optional
+from config import Config
+from .deadline import remaining, DeadlineExceeded
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-worker coalescing is unavailable
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def cross_worker_lock_dir() -> Optional[str]:
+    """SINGLEFLIGHT_LOCK_DIR, if cross-worker coalescing can work with the configured cache.
+
+    Only a cache shared by the workers (sqlite) lets the second run be served
+    from the first one's responses; without it the lock would just make
+    identical dictations wait for each other, so it is not used.
+    """
+    if not Config.SINGLEFLIGHT_LOCK_DIR:
+        return None
+    if Config.AGENT_CACHE_BACKEND != 'sqlite':
+        logger.warning("SINGLEFLIGHT_LOCK_DIR is ignored: cross-worker coalescing needs "
+                       "AGENT_CACHE_BACKEND=sqlite (it is '%s')", Config.AGENT_CACHE_BACKEND)
+        return None
+    return Config.SINGLEFLIGHT_LOCK_DIR
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into a single execution.
+
+    Callers that arrive while a call for their key is running wait for it and
+    share its result (or exception). With lock_dir set, the leader also holds
+    an exclusive file lock per key, so identical calls in other worker
+    processes run one after another; combined with a shared response cache
+    the second run is served entirely from cache. Waiting for another
+    process's lock is bounded by the caller's deadline.
+    """
+
+    LOCK_POLL_SECONDS = 0.05      # first wait between attempts on a held lock
+    LOCK_MAX_POLL_SECONDS = 0.5   # waits double up to this
+
+    def __init__(self, lock_dir: str = None):
+        self.lock_dir = lock_dir if fcntl else None
+        self._calls = {}
+        self._lock = threading.Lock()
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            # Followers give up at their own deadline, not the leader's
+            if not call.done.wait(remaining()):
+                raise DeadlineExceeded()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn, *args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _run(self, key, fn, *args, **kwargs):
+        if not self.lock_dir:
+            return fn(*args, **kwargs)
+
+        path = os.path.join(self.lock_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.lock')
+        lock_file = self._acquire_file_lock(path)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            # Removed while still held, so the directory does not grow with every key
+            with suppress(FileNotFoundError):
+                os.unlink(path)
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _acquire_file_lock(self, path: str):
+        """Lock path exclusively, polling until the deadline; returns the open file"""
+        delay = self.LOCK_POLL_SECONDS
+        while True:
+            lock_file = open(path, 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                left = remaining()
+                if left is not None and left <= 0:
+                    raise DeadlineExceeded()
+                time.sleep(delay if left is None else min(delay, left))
+                delay = min(delay * 2, self.LOCK_MAX_POLL_SECONDS)
+                continue
+
+            # The previous holder may have unlinked the file after we opened it
+            try:
+                current = os.fstat(lock_file.fileno()).st_ino == os.stat(path).st_ino
+            except FileNotFoundError:
+                current = False
+            if current:
+                return lock_file
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines running on one event loop"""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        call_key = (id(loop), key)
+        future = self._calls.get(call_key)
+        if future is not None:
+            # shield: a cancelled or timed-out follower must not cancel the shared call
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), remaining())
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded()
+
+        future = self._calls[call_key] = loop.create_future()
+        try:
+            result = await fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so a leader-only failure is not logged as unhandled
+            future.exception()
+            raise
+        finally:
+            del self._calls[call_key]
@@ -0,0 +1,67 @@
+"""
+Warm-up before a process starts serving.
+
+The agents package imports the openai SDK and builds its clients, cache and
+pipelines on first use, which keeps startup fast but puts that cost on the
+first requests a worker serves. These hooks pay it earlier:
+
+- import_dependencies() only imports modules. It is safe in a preloading
+  gunicorn master, where the imported code is then shared with every worker.
+- warm_up() builds the process's pooled client, cache backend and pipelines.
+  It opens files and sockets, so it runs in each worker, never before a fork.
+"""
+
+import importlib
+import logging
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Imported up front by import_dependencies(), in dependency order
+HEAVY_MODULES = ('httpx', 'openai', 'agents.pipeline', 'agents.async_pipeline')
+
+
+def import_dependencies() -> float:
+    """Import the modules the agents defer; returns the seconds spent"""
+    start = time.perf_counter()
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+    return time.perf_counter() - start
+
+
+def warm_up() -> Dict[str, float]:
+    """Prime this process's client, cache and pipelines; returns seconds per step.
+
+    A failing step (e.g. missing Azure settings) is logged and skipped: the
+    worker still starts, and requests report the error as they would cold.
+    """
+    from .client import get_client
+    from .cache import get_cache
+    from .ratelimit import get_rate_limiter
+    from .router import get_router
+    from .pipeline import get_pipeline
+    from .async_pipeline import get_async_pipeline
+
+    steps = (
+        ('imports', import_dependencies),
+        ('client', get_client),
+        ('cache', get_cache),
+        ('rate_limiter', get_rate_limiter),
+        ('router', get_router),
+        ('pipeline', get_pipeline),
+        ('async_pipeline', get_async_pipeline),
+    )
+    timings = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning("Warm-up step %s failed: %s", name, e)
+            continue
+        timings[name] = time.perf_counter() - start
+
+    logger.info("Warm-up done in %.0f ms (%s)", sum(timings.values()) * 1000,
+                ', '.join(f'{name} {seconds * 1000:.0f} ms' for name, seconds in timings.items()))
+    return timings
@@ -0,0 +1,157 @@
+"""
+Negotiated response compression.
+
+Responses whose type is in COMPRESSION_MIMETYPES (JSON, NDJSON and CSV by
+default) are compressed with the first algorithm in COMPRESSION_ALGORITHMS
+that the client's Accept-Encoding allows. Brotli ('br') is used only when
+the brotli package is installed. Buffered bodies smaller than
+COMPRESSION_MIN_BYTES are sent as they are. Streamed bodies (NDJSON batch
+results, CSV exports) are compressed chunk by chunk and flushed after each
+chunk, so every line still reaches the client as soon as it is produced.
+"""
+
+import logging
+import zlib
+from importlib.util import find_spec
+from typing import Iterable, Iterator, Optional, Tuple
+from flask import request
+from werkzeug.http import parse_accept_header
+from config import Config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class GzipEncoder:
+    def __init__(self):
+        # wbits 31: a gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(Config.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    def __init__(self):
+        import brotli
+        self._compressor = brotli.Compressor(quality=Config.COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+# Content-Encoding token -> encoder class
+ENCODERS = {'gzip': GzipEncoder}
+if find_spec('brotli') is not None:
+    ENCODERS['br'] = BrotliEncoder
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The encoding to use for a request's Accept-Encoding, or None for identity"""
+    if not Config.COMPRESSION_ENABLED or not accept_encoding:
+        return None
+    accepted = parse_accept_header(accept_encoding)
+    best, best_quality = None, 0
+    # Highest client quality wins; ties go to the server's order
+    for encoding in Config.COMPRESSION_ALGORITHMS:
+        quality = accepted[encoding] if encoding in ENCODERS else 0
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compressible(mimetype: str) -> bool:
+    return Config.COMPRESSION_ENABLED and mimetype in Config.COMPRESSION_MIMETYPES
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    encoder = ENCODERS[encoding]()
+    compressed = encoder.compress(body) + encoder.finish()
+    metrics.inc('response_bytes_total', len(body), encoding=encoding, kind='uncompressed')
+    metrics.inc('response_bytes_total', len(compressed), encoding=encoding, kind='sent')
+    return compressed
+
+
+def compress_payload(body: bytes, mimetype: str, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+    """(body, Content-Encoding or None) for a buffered response"""
+    if not compressible(mimetype) or len(body) < Config.COMPRESSION_MIN_BYTES:
+        return body, None
+    encoding = negotiate(accept_encoding)
+    if encoding is None:
+        return body, None
+    return compress_body(body, encoding), encoding
+
+
+def compress_stream(chunks: Iterable, encoding: str) -> Iterator[bytes]:
+    """Compress a streamed body, flushing after each chunk; closes the source when done"""
+    encoder = ENCODERS[encoding]()
+    size = sent = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if not chunk:
+                continue
+            data = encoder.compress(chunk) + encoder.flush()
+            size += len(chunk)
+            sent += len(data)
+            yield data
+        data = encoder.finish()
+        sent += len(data)
+        yield data
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+        metrics.inc('response_bytes_total', size, encoding=encoding, kind='uncompressed')
+        metrics.inc('response_bytes_total', sent, encoding=encoding, kind='sent')
+
+
+def compress_response(response, accept_encoding: str):
+    """Compress a Flask response in place when its type, size and the client allow it"""
+    if (not compressible(response.mimetype) or request.method == 'HEAD'
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or 'no-transform' in response.headers.get('Cache-Control', '')):
+        return response
+
+    # The body depends on Accept-Encoding whether or not this one is compressed
+    response.vary.add('Accept-Encoding')
+    if response.is_streamed:
+        encoding = negotiate(accept_encoding)
+        if encoding is None:
+            return response
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body, encoding = compress_payload(response.get_data(), response.mimetype, accept_encoding)
+        if encoding is None:
+            return response
+        response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """Register the compression hook on a Flask app"""
+    if Config.COMPRESSION_ENABLED:
+        missing = [e for e in Config.COMPRESSION_ALGORITHMS if e not in ENCODERS]
+        if missing:
+            logger.warning("Compression %s unavailable (install brotli for br); skipping it", ', '.join(missing))
+        logger.info("Compression: %s", ', '.join(e for e in Config.COMPRESSION_ALGORITHMS if e in ENCODERS) or 'none')
+
+    @app.after_request
+    def compress(response):
+        return compress_response(response, request.headers.get('Accept-Encoding', ''))
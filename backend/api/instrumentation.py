@@ -0,0 +1,58 @@
+"""Per-request correlation ids, request metrics and access logs"""
+
+import logging
+import time
+from flask import g, request
+import metrics
+from logs import new_request_id, set_request_id, request_id_var
+
+logger = logging.getLogger('timecomposer.request')
+
+
+def request_started(supplied_id: str = None):
+    """Bind a correlation id and count the request in flight; returns the state request_finished needs"""
+    request_id = new_request_id(supplied_id)
+    token = set_request_id(request_id)
+    metrics.inc('in_flight', 1, kind='requests')
+    return {'id': request_id, 'token': token, 'start': time.perf_counter()}
+
+
+def request_finished(state, method: str, endpoint: str, path: str, status: int):
+    """Record the request's latency and status, log it and release the correlation id"""
+    seconds = time.perf_counter() - state['start']
+    metrics.inc('in_flight', -1, kind='requests')
+    metrics.inc('requests_total', endpoint=endpoint, method=method, status=status)
+    metrics.observe('request_seconds', seconds, endpoint=endpoint)
+    logger.info("%s %s %d", method, path, status, extra={'fields': {
+        'method': method, 'path': path, 'status': status, 'durationMs': round(seconds * 1000, 1)
+    }})
+    try:
+        request_id_var.reset(state['token'])
+    except ValueError:
+        # Finished in a different context than it started (e.g. a streamed body)
+        request_id_var.set(None)
+
+
+def init_app(app):
+    """Register the hooks on a Flask app"""
+
+    @app.before_request
+    def start_request():
+        g.request_state = request_started(request.headers.get('X-Request-ID'))
+
+    @app.after_request
+    def tag_response(response):
+        state = g.get('request_state')
+        if state is not None:
+            response.headers['X-Request-ID'] = state['id']
+            g.response_status = response.status_code
+        return response
+
+    # Runs after a streamed body is fully sent, so latency covers the whole stream
+    @app.teardown_request
+    def finish_request(exc):
+        state = g.pop('request_state', None)
+        if state is None:
+            return
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_finished(state, request.method, endpoint, request.path, g.get('response_status', 500))
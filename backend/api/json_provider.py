@@ -0,0 +1,100 @@
+"""
+JSON encoding for API responses.
+
+With JSON_PROVIDER=auto (the default) the Flask app encodes and decodes with
+orjson when it is installed, and with the standard library otherwise.
+OrjsonProvider keeps Flask's behaviour: sorted keys, the same fallbacks for
+dates, decimals, UUIDs and dataclasses, and indentation in debug mode.
+dumps() gives the streamed responses (SSE, NDJSON) and the ASGI app the same
+encoder outside of a Flask response.
+"""
+
+import json
+import logging
+from importlib.util import find_spec
+from flask.json.provider import DefaultJSONProvider
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+JSON_PROVIDERS = ('auto', 'orjson', 'stdlib')
+
+
+def json_backend() -> str:
+    """'orjson' or 'stdlib', from JSON_PROVIDER and what is installed"""
+    if Config.JSON_PROVIDER not in JSON_PROVIDERS:
+        raise ValueError(f"Unknown JSON_PROVIDER '{Config.JSON_PROVIDER}' (expected one of: {', '.join(JSON_PROVIDERS)})")
+    if Config.JSON_PROVIDER == 'stdlib':
+        return 'stdlib'
+    if find_spec('orjson') is None:
+        if Config.JSON_PROVIDER == 'orjson':
+            raise RuntimeError("JSON_PROVIDER=orjson needs the orjson package (pip install orjson)")
+        return 'stdlib'
+    return 'orjson'
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask's default provider with orjson doing the work"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        import orjson
+        self._orjson = orjson
+
+    def _encode(self, obj, indent: bool = False) -> bytes:
+        option = self._orjson.OPT_NON_STR_KEYS | self._orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= self._orjson.OPT_SORT_KEYS
+        if indent:
+            option |= self._orjson.OPT_INDENT_2
+        # Datetimes go through Flask's default too, so they keep its HTTP date format
+        return self._orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            # json.dumps options orjson has no equivalent for (cls, separators, ...)
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._encode(obj).decode('utf-8')
+        except self._orjson.JSONEncodeError:
+            return super().dumps(obj)  # e.g. integers wider than 64 bits
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return self._orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        try:
+            body = self._encode(obj, indent) + b'\n'
+        except self._orjson.JSONEncodeError:
+            return super().response(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+if json_backend() == 'orjson':
+    import orjson
+
+    def dumps(obj) -> str:
+        """Compact JSON text for streamed and ASGI responses"""
+        try:
+            return orjson.dumps(obj, default=DefaultJSONProvider.default,
+                                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME).decode('utf-8')
+        except orjson.JSONEncodeError:
+            return json.dumps(obj, default=DefaultJSONProvider.default)
+else:
+    def dumps(obj) -> str:
+        """Compact JSON text for streamed and ASGI responses"""
+        return json.dumps(obj, default=DefaultJSONProvider.default, separators=(',', ':'))
+
+
+def init_app(app):
+    """Install the configured JSON provider on a Flask app"""
+    backend = json_backend()
+    if backend == 'orjson':
+        app.json = OrjsonProvider(app)
+    elif Config.JSON_PROVIDER == 'auto':
+        logger.warning("orjson is not installed; encoding JSON with the standard library")
+    logger.info("JSON provider: %s", backend)
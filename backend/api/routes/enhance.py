@@ -1,44 +1,217 @@
-from flask import Blueprint, request, jsonify
-from agents import AgentPipeline
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from agents import get_pipeline, PIPELINE_MODES
+from agents.circuit import CircuitOpenError
+from agents.deadline import deadline, deadline_at, current_deadline, DeadlineExceeded
+from agents.incremental import remember_result, recall_result
+from admission import AdmissionRejected, client_id, get_admission_controller
+from api.json_provider import dumps
+from config import Config
+import math
 import uuid
 
 enhance_bp = Blueprint('enhance', __name__)
 
+
+def validate_enhance_request(data):
+    """Return (text, error) for an enhance request body"""
+    if not data or 'text' not in data:
+        return None, 'No text provided'
+    
+    text = data.get('text', '')
+    if not text.strip():
+        return None, 'Empty text provided'
+    
+    mode = data.get('mode')
+    if mode is not None and mode not in PIPELINE_MODES:
+        return None, f"Unsupported mode '{mode}'"
+    
+    return text, None
+
+
+def is_incremental(data):
+    """The request re-enhances an earlier result (previousGroupId or previous)"""
+    return bool(data.get('previousGroupId') or data.get('previous'))
+
+
+def load_previous(data):
+    """Return (previous, error): the earlier result to re-enhance incrementally.
+
+    previous is None when the request is not incremental or its groupId is no
+    longer remembered; the dictation is then processed in full.
+    """
+    previous = data.get('previous')
+    if previous:
+        valid = (isinstance(previous, dict)
+                 and isinstance(previous.get('originalText'), str)
+                 and isinstance(previous.get('narratives'), list)
+                 and all(isinstance(n, dict) and isinstance(n.get('original'), str)
+                         for n in previous['narratives']))
+        if not valid:
+            return None, "'previous' must be an earlier /api/enhance response"
+        return {'text': previous['originalText'], 'narratives': previous['narratives']}, None
+    
+    group_id = data.get('previousGroupId')
+    if group_id is not None and not isinstance(group_id, str):
+        return None, "'previousGroupId' must be a string"
+    return recall_result(group_id) if group_id else None, None
+
+
+def request_deadline(headers):
+    """Seconds an enhancement may take: ENHANCE_DEADLINE_SECONDS, or less if
+    the client sends X-Request-Timeout (seconds)"""
+    seconds = Config.ENHANCE_DEADLINE_SECONDS
+    try:
+        requested = float(headers.get('X-Request-Timeout', ''))
+    except ValueError:
+        return seconds
+    if requested > 0:
+        seconds = min(seconds, requested) if seconds > 0 else requested
+    return seconds
+
+
+def request_client():
+    """The client the request is queued for by admission control"""
+    return client_id(request.headers, request.remote_addr)
+
+
+def error_status(e):
+    """HTTP status and extra headers for a failed enhancement"""
+    if isinstance(e, DeadlineExceeded):
+        return 504, {}
+    if isinstance(e, (CircuitOpenError, AdmissionRejected)):
+        return 503, {'Retry-After': str(math.ceil(e.retry_after))}
+    return 500, {}
+
+
+def format_narrative(narrative):
+    """Format a pipeline narrative for frontend consumption"""
+    formatted = {
+        'text': narrative.get('text', ''),
+        'hours': narrative.get('hours', 0.0),
+        'clientCode': None,  # To be filled by user
+        'matterNumber': None,  # To be filled by user
+        'original': narrative.get('original', '')
+    }
+    if narrative.get('error'):
+        formatted['error'] = narrative['error']  # Refinement failed for this entry only
+    if 'reused' in narrative:
+        formatted['reused'] = narrative['reused']  # Kept from the previous result (incremental)
+    return formatted
+
+
+def format_enhance_response(text, result, compact=False):
+    """Build the /api/enhance response body from a pipeline result, remembering
+    it under its groupId for incremental re-enhancement.
+
+    compact leaves out the text the client sent: originalText, and cleanedText
+    unless cleaning changed it.
+    """
+    # Generate a group ID for narratives from this session
+    group_id = str(uuid.uuid4())
+    
+    body = {
+        'groupId': group_id,
+        'originalText': text,
+        'cleanedText': result['cleaned'],
+        'narratives': [format_narrative(n) for n in result.get('narratives', [])],
+        'totalHours': result['total_hours']
+    }
+    if 'incremental' in result:
+        body['incremental'] = result['incremental']
+    remember_result(group_id, text, body['narratives'])
+    if compact:
+        del body['originalText']
+        if body['cleanedText'] == text:
+            del body['cleanedText']
+    return body
+
+
 @enhance_bp.route('/api/enhance', methods=['POST'])
 def enhance():
     try:
         data = request.get_json()
-        if not data or 'text' not in data:
-            return jsonify({'error': 'No text provided'}), 400
+        text, error = validate_enhance_request(data)
+        if not error:
+            previous, error = load_previous(data)
+        if error:
+            return jsonify({'error': error}), 400
         
-        text = data.get('text', '')
-        if not text.strip():
-            return jsonify({'error': 'Empty text provided'}), 400
+        pipeline = get_pipeline()
+        use_cache = not data.get('bypassCache', False)
+        with deadline(request_deadline(request.headers)):
+            with get_admission_controller().acquire(request_client()) as ticket:
+                if is_incremental(data):
+                    result = pipeline.process_incremental(text, previous, mode=data.get('mode'), use_cache=use_cache)
+                else:
+                    result = pipeline.process(text, mode=data.get('mode'), use_cache=use_cache)
         
-        pipeline = AgentPipeline()
-        result = pipeline.process(text)
-        
-        # Generate a group ID for narratives from this session
-        group_id = str(uuid.uuid4())
-        
-        # Format narratives for frontend consumption
-        narratives = []
-        for narrative in result.get('narratives', []):
-            narratives.append({
-                'text': narrative.get('text', ''),
-                'hours': narrative.get('hours', 0.0),
-                'clientCode': None,  # To be filled by user
-                'matterNumber': None,  # To be filled by user
-                'original': narrative.get('original', '')
-            })
+        return jsonify(format_enhance_response(text, result, compact=bool(data.get('compact')))), 200, ticket.headers()
+    
+    except Exception as e:
+        status, headers = error_status(e)
+        return jsonify({'error': f'Enhancement failed: {str(e)}'}), status, headers
+
+
+
+def sse_event(event, payload):
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {dumps(payload)}\n\n"
+
+
+@enhance_bp.route('/api/enhance/stream', methods=['POST'])
+def enhance_stream():
+    """Stream the separator result, then each narrative as it is refined.
+    
+    Events: 'separated' (entries and hours), 'narrative' (index plus the same
+    narrative object /api/enhance returns), then 'done' carrying the full
+    /api/enhance response body, or 'error'.
+    """
+    try:
+        data = request.get_json()
+        text, error = validate_enhance_request(data)
+        if error:
+            return jsonify({'error': error}), 400
         
-        return jsonify({
-            'groupId': group_id,
-            'originalText': text,
-            'cleanedText': result['cleaned'],
-            'narratives': narratives,
-            'totalHours': result['total_hours']
-        })
+        pipeline = get_pipeline()
+        events = pipeline.iter_run(text, data.get('mode'), use_cache=not data.get('bypassCache', False))
+        compact = bool(data.get('compact'))
+        # One deadline for the whole request: time spent queued counts against it
+        with deadline(request_deadline(request.headers)):
+            expires = current_deadline()
+            ticket = get_admission_controller().acquire(request_client())
     
     except Exception as e:
-        return jsonify({'error': f'Enhancement failed: {str(e)}'}), 500
\ No newline at end of file
+        status, headers = error_status(e)
+        return jsonify({'error': f'Enhancement failed: {str(e)}'}), status, headers
+    
+    def generate():
+        try:
+            with deadline_at(expires):
+                for event, payload in events:
+                    if event == 'separated':
+                        entries = payload['entries']
+                        yield sse_event('separated', {
+                            'entries': [{'original': e['activity'], 'hours': e['hours']} for e in entries],
+                            'totalHours': round(sum(e['hours'] for e in entries), 1)
+                        })
+                    elif event == 'narrative':
+                        yield sse_event('narrative', {
+                            'index': payload['index'],
+                            'narrative': format_narrative(payload['narrative'])
+                        })
+                    elif event == 'result':
+                        yield sse_event('done', format_enhance_response(text, payload, compact))
+        except Exception as e:
+            status, _ = error_status(e)
+            yield sse_event('error', {'error': f'Enhancement failed: {str(e)}', 'status': status})
+        finally:
+            ticket.release()
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', **ticket.headers()}
+    )
+    # The generator never runs if the client goes away first
+    response.call_on_close(ticket.release)
+    return response
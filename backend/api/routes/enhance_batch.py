@@ -0,0 +1,162 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from agents import get_pipeline
+from agents.deadline import deadline
+from agents.ratelimit import TokenBucket
+from admission import get_admission_controller
+from api.routes.enhance import (validate_enhance_request, format_enhance_response, request_client,
+                                 request_deadline, error_status)
+from api.json_provider import dumps
+from config import Config
+import os
+import threading
+
+enhance_batch_bp = Blueprint('enhance_batch', __name__)
+
+# Shared by every batch request in this worker so bulk work stays bounded
+_executor = None
+_executor_lock = threading.Lock()
+_rate_limiter = TokenBucket(Config.BATCH_RATE_LIMIT)
+
+
+def get_batch_executor():
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=Config.BATCH_CONCURRENCY,
+                                               thread_name_prefix='batch')
+    return _executor
+
+
+def _after_fork_in_child():
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def parse_batch_items(data):
+    """Return (items, error); items are dicts with index, id, text and mode"""
+    if not data:
+        return None, 'No items provided'
+
+    if 'items' in data:
+        raw_items = data['items']
+    elif 'texts' in data:
+        raw_items = [{'text': text} for text in data['texts']] if isinstance(data['texts'], list) else None
+    else:
+        return None, 'No items provided'
+
+    if not isinstance(raw_items, list) or not raw_items:
+        return None, 'No items provided'
+    if len(raw_items) > Config.BATCH_MAX_ITEMS:
+        return None, f'Too many items: {len(raw_items)} (limit {Config.BATCH_MAX_ITEMS})'
+
+    items = []
+    for index, raw in enumerate(raw_items):
+        if not isinstance(raw, dict):
+            raw = {'text': raw}
+        items.append({
+            'index': index,
+            'id': raw.get('id'),
+            'text': raw.get('text'),
+            'mode': raw.get('mode', data.get('mode'))
+        })
+    return items, None
+
+
+def enhance_item(item, use_cache, compact=False, seconds=None):
+    """Run one batch item, returning a per-item result or error.
+
+    seconds bounds the item from when it has been paced, like the deadline
+    of a single /api/enhance request; time spent queued does not count.
+    """
+    outcome = {'index': item['index'], 'id': item['id']}
+
+    payload = {'text': item['text'], 'mode': item['mode']} if isinstance(item['text'], str) else None
+    text, error = validate_enhance_request(payload)
+    if error:
+        outcome.update(status='error', error=error)
+        return outcome
+
+    try:
+        _rate_limiter.acquire()
+        with deadline(seconds):
+            result = get_pipeline().process(text, mode=item['mode'], use_cache=use_cache)
+        outcome.update(status='ok', result=format_enhance_response(text, result, compact))
+    except Exception as e:
+        outcome.update(status='error', error=f'Enhancement failed: {str(e)}')
+    return outcome
+
+
+def run_batch_item(ticket, item, use_cache, compact=False, seconds=None):
+    """enhance_item() once admission control has granted the item a slot"""
+    outcome = enhance_item(item, use_cache, compact, seconds)
+    outcome['queueWaitMs'] = ticket.wait_ms
+    return outcome
+
+
+def wants_ndjson():
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    accept = request.accept_mimetypes
+    return accept.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+
+
+@enhance_batch_bp.route('/api/enhance/batch', methods=['POST'])
+def enhance_batch():
+    """Enhance many dictations in one call.
+
+    Items are queued as bulk work for the client (see admission.py), run on
+    a bounded per-worker pool (BATCH_CONCURRENCY) and start no faster than
+    BATCH_RATE_LIMIT per second. Each item has the deadline of an
+    /api/enhance request (ENHANCE_DEADLINE_SECONDS or X-Request-Timeout),
+    counted from when it starts, so a batch may take as long as its size
+    and the rate limit require. Each item reports its own
+    result or error and how long it was queued (queueWaitMs). A batch that
+    does not fit the bulk queue is rejected whole with 503 and Retry-After.
+    With ?stream=1 or Accept: application/x-ndjson, results are streamed as
+    NDJSON lines in completion order, followed by a summary.
+    """
+    try:
+        data = request.get_json()
+        items, error = parse_batch_items(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        use_cache = not data.get('bypassCache', False)
+        compact = bool(data.get('compact'))
+        seconds = request_deadline(request.headers)
+        # Items run in a copy of this context so their logs carry the request id
+        futures = get_admission_controller().submit_all(
+            request_client(), 'bulk', get_batch_executor(), run_batch_item,
+            [(item, use_cache, compact, seconds) for item in items], pool='batch')
+
+        if wants_ndjson():
+            def generate():
+                succeeded = 0
+                for future in as_completed(futures):
+                    outcome = future.result()
+                    succeeded += outcome['status'] == 'ok'
+                    yield dumps(outcome) + '\n'
+                yield dumps({'done': True, 'succeeded': succeeded,
+                             'failed': len(futures) - succeeded}) + '\n'
+
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        results = [future.result() for future in futures]
+        succeeded = sum(1 for outcome in results if outcome['status'] == 'ok')
+        return jsonify({
+            'results': results,
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded
+        })
+
+    except Exception as e:
+        status, headers = error_status(e)
+        return jsonify({'error': f'Batch enhancement failed: {str(e)}'}), status, headers
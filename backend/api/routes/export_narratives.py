@@ -1,94 +1,107 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify
+from werkzeug.exceptions import HTTPException
+from werkzeug.wsgi import get_input_stream
 from datetime import datetime
-import csv
+from config import Config
+from exporters import EXPORT_WRITERS, get_writer
 import io
+import json
+import tempfile
 
 export_narratives_bp = Blueprint('export_narratives', __name__)
 
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def iter_ndjson(stream):
+    """Yield one narrative dict per non-blank NDJSON line"""
+    for line_number, line in enumerate(iter(stream.readline, b''), 1):
+        if not line.strip():
+            continue
+        try:
+            narrative = json.loads(line)
+        except ValueError:
+            raise ValueError(f'Invalid JSON on line {line_number}')
+        if not isinstance(narrative, dict):
+            raise ValueError(f'Line {line_number} is not a narrative object')
+        yield narrative
+
+
+def stream_file(spool):
+    """Yield a spooled file in chunks, closing it at the end"""
+    try:
+        spool.seek(0)
+        while True:
+            chunk = spool.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        spool.close()
+
+
 @export_narratives_bp.route('/api/export/narratives', methods=['POST'])
 def export_narratives():
-    """Export narratives to CSV format in InTapp Import format"""
+    """Export narratives in InTapp Import format, or another format from EXPORT_WRITERS.
+
+    Accepts a JSON body ({"narratives": [...], "format": "csv"}) or, for large
+    exports, NDJSON with one narrative per line (Content-Type:
+    application/x-ndjson, ?format=..., chunked transfer allowed, limited by
+    EXPORT_MAX_CONTENT_LENGTH rather than MAX_CONTENT_LENGTH).
+
+    Rows are written to a spooled temporary file (memory up to EXPORT_SPOOL_BYTES,
+    then disk) and streamed out in chunks, so memory stays flat however many
+    entries are exported. The whole input is read before the response starts:
+    bad input still gets a 400, and a client that finishes its upload before
+    reading the response cannot deadlock against the stream.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=Config.EXPORT_SPOOL_BYTES, mode='w+b')
+    streaming = False
     try:
-        data = request.get_json()
-        narratives = data.get('narratives', [])
-        export_format = data.get('format', 'csv')
-        
-        if not narratives:
+        if request.mimetype in NDJSON_MIMETYPES:
+            export_format = request.args.get('format', 'csv')
+            stream = get_input_stream(request.environ,
+                                      max_content_length=Config.EXPORT_MAX_CONTENT_LENGTH or None)
+            if isinstance(stream, io.RawIOBase):
+                # LimitedStream's own readline reads a byte at a time
+                stream = io.BufferedReader(stream, STREAM_CHUNK_SIZE)
+            narratives = iter_ndjson(stream)
+        else:
+            data = request.get_json()
+            narratives = data.get('narratives', [])
+            export_format = data.get('format', 'csv')
+            if not narratives:
+                return jsonify({'error': 'No narratives provided'}), 400
+
+        writer = get_writer(export_format)
+        if writer is None:
+            return jsonify({'error': f"Unsupported format '{export_format}' "
+                                     f"(supported: {', '.join(EXPORT_WRITERS)})"}), 400
+
+        try:
+            count = writer.write(narratives, spool)
+        except ValueError as e:
+            return jsonify({'error': f'Failed to export narratives: {str(e)}'}), 400
+        if count == 0:
             return jsonify({'error': 'No narratives provided'}), 400
-        
-        if export_format != 'csv':
-            return jsonify({'error': 'Only CSV format is currently supported'}), 400
-        
-        # Create CSV in memory
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write InTapp format header rows
-        # Row 1: Activity for: (leave name blank)
-        writer.writerow(['Activity for: '])
-        
-        # Row 2: Empty row
-        writer.writerow([])
-        
-        # Row 3: Column headers
-        writer.writerow([
-            'Activity Type',    # A3 - leave entries blank
-            'Narrative',        # B3 - use narrative field
-            'Client ID',        # C3 - use clientCode field
-            'Client Name',      # D3 - leave entries blank
-            'Matter ID',        # E3 - use matterNumber field
-            'Matter Name',      # F3 - leave entries blank
-            'Duration',         # G3 - convert hours to minutes
-            'Time',             # H3 - format as "M/D/YY h:mm AM/PM"
-            'Comments',         # I3 - leave entries blank
-            'Notes'             # J3 - leave entries blank
-        ])
-        
-        # Write narrative data
-        for narrative in narratives:
-            # Extract date from createdAt or use current date
-            created_at = narrative.get('createdAt', datetime.utcnow().isoformat())
-            try:
-                date_obj = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-            except:
-                date_obj = datetime.utcnow()
-            
-            # Format time as "M/D/YY h:mm AM/PM" with internal quotes
-            time_str = f'"{date_obj.strftime("%-m/%-d/%y %-I:%M %p")}"'
-            
-            # Convert decimal hours to minutes using lower bound
-            # 0.1 = 6 min, 0.2 = 12 min, 0.3 = 18 min, etc.
-            hours = float(narrative.get('hours', 0.0))
-            minutes = int(hours * 60)
-            duration_str = f"{minutes} min"
-            
-            writer.writerow([
-                '',                                     # Activity Type - blank
-                narrative.get('narrative', ''),         # Narrative
-                narrative.get('clientCode', ''),        # Client ID
-                '',                                     # Client Name - blank
-                narrative.get('matterNumber', ''),      # Matter ID
-                '',                                     # Matter Name - blank
-                duration_str,                           # Duration
-                time_str,                               # Time with quotes
-                '',                                     # Comments - blank
-                ''                                      # Notes - blank
-            ])
-        
-        # Get CSV content
-        csv_content = output.getvalue()
-        output.close()
-        
-        # Create response with CSV file
-        response = current_app.response_class(
-            csv_content,
-            mimetype='text/csv',
+
+        response = Response(
+            stream_file(spool),
+            mimetype=writer.mimetype,
             headers={
-                'Content-Disposition': f'attachment; filename=time_entries_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+                'Content-Disposition': f'attachment; filename=time_entries_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{writer.extension}'
             }
         )
-        
+        streaming = True
         return response
-    
+
+    except HTTPException:
+        raise  # e.g. 413 when the upload exceeds EXPORT_MAX_CONTENT_LENGTH
+
     except Exception as e:
-        return jsonify({'error': f'Failed to export narratives: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Failed to export narratives: {str(e)}'}), 500
+
+    finally:
+        # Once streaming, stream_file closes the spool when the body is done
+        if not streaming:
+            spool.close()
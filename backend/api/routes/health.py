@@ -1,11 +1,24 @@
 from flask import Blueprint, jsonify
 from datetime import datetime
+from agents.cache import get_cache
+from agents.ratelimit import get_rate_limiter
+from agents.circuit import get_circuit_breaker
+from agents.hedge import hedge_stats
+from agents.router import get_router
+from admission import get_admission_controller
 
 health_bp = Blueprint('health', __name__)
 
 @health_bp.route('/api/health', methods=['GET'])
 def health_check():
+    cache = get_cache()
     return jsonify({
         'status': 'healthy', 
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': datetime.utcnow().isoformat(),
+        'cache': cache.stats() if cache else None,
+        'rateLimit': get_rate_limiter().stats(),
+        'circuit': get_circuit_breaker().stats(),
+        'hedging': hedge_stats(),
+        'routing': get_router().stats(),
+        'admission': get_admission_controller().stats()
     })
\ No newline at end of file
@@ -0,0 +1,65 @@
+from flask import Blueprint, request, jsonify
+from api.routes.enhance import validate_enhance_request
+from api.routes.enhance_batch import parse_batch_items
+from jobs import get_job_store, public_job
+
+jobs_bp = Blueprint('jobs', __name__)
+
+
+@jobs_bp.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue an enhancement for the job worker.
+    
+    Accepts the /api/enhance body ('text') or the /api/enhance/batch body
+    ('items' or 'texts'), plus an optional 'webhookUrl' notified on completion.
+    """
+    try:
+        data = request.get_json()
+        
+        if data and 'text' in data:
+            text, error = validate_enhance_request(data)
+            items = [{'index': 0, 'id': None, 'text': text}]
+        else:
+            items, error = parse_batch_items(data)
+            if not error:
+                for item in items:
+                    if not isinstance(item['text'], str) or not item['text'].strip():
+                        error = f"Item {item['index']} has no text"
+                        break
+        if error:
+            return jsonify({'error': error}), 400
+        
+        payload = {
+            'items': items,
+            'single': 'text' in data,
+            'mode': data.get('mode'),
+            'bypassCache': bool(data.get('bypassCache', False)),
+            'compact': bool(data.get('compact', False))
+        }
+        job_id = get_job_store().submit(payload, webhook=data.get('webhookUrl'))
+        
+        return jsonify({
+            'jobId': job_id,
+            'status': 'queued',
+            'statusUrl': f'/api/jobs/{job_id}'
+        }), 202
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to submit job: {str(e)}'}), 500
+
+
+@jobs_bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_job_store().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(public_job(job))
+
+
+@jobs_bp.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued job, or ask the worker to stop a running one"""
+    job = get_job_store().cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(public_job(job)), 202
@@ -0,0 +1,10 @@
+from flask import Blueprint, Response
+import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text exposition, summed across workers when METRICS_DIR is set"""
+    return Response(metrics.get_registry().render(), mimetype='text/plain; version=0.0.4')
@@ -1,19 +1,32 @@
 from flask import Flask
 import os
 from config import Config, cors
+from logs import configure_logging
+from api import instrumentation, json_provider, compression
 from api.routes.health import health_bp
 from api.routes.enhance import enhance_bp
+from api.routes.enhance_batch import enhance_batch_bp
+from api.routes.jobs import jobs_bp
 from api.routes.export_narratives import export_narratives_bp
+from api.routes.metrics import metrics_bp
 
 def create_app():
+    configure_logging()
+    
     app = Flask(__name__)
     app.config.from_object(Config)
     
     cors.init_app(app, origins=Config.CORS_ORIGINS)
+    instrumentation.init_app(app)
+    json_provider.init_app(app)
+    compression.init_app(app)
     
     app.register_blueprint(health_bp)
     app.register_blueprint(enhance_bp)
+    app.register_blueprint(enhance_batch_bp)
+    app.register_blueprint(jobs_bp)
     app.register_blueprint(export_narratives_bp)
+    app.register_blueprint(metrics_bp)
     
     return app
 
@@ -0,0 +1,152 @@
+"""
+ASGI entry point for async serving.
+
+POST /api/enhance is handled natively on the event loop by AsyncAgentPipeline,
+so a single worker can hold many enhancements while they wait on Azure. Every
+other route is delegated to the regular Flask app.
+
+Run with:
+    SERVER_PROFILE=uvicorn gunicorn -c gunicorn_config.py
+"""
+
+import asyncio
+import json
+import logging
+from asgiref.wsgi import WsgiToAsgi
+from agents import get_async_pipeline, get_async_client, close_async_clients
+from agents.deadline import deadline
+from agents.warmup import warm_up
+from admission import client_id, get_admission_controller
+from api.routes.enhance import (validate_enhance_request, load_previous, is_incremental, format_enhance_response,
+                                request_deadline, error_status)
+from api.instrumentation import request_started, request_finished
+from api.json_provider import dumps
+from api.compression import compress_payload
+from app import app as flask_app
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class TimeComposerASGI:
+    """Route enhancement to the async pipeline and everything else to Flask"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi = WsgiToAsgi(wsgi_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif (scope['type'] == 'http' and scope['method'] == 'POST'
+                and scope['path'] == '/api/enhance'):
+            await self.enhance(scope, receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if Config.WARMUP_ON_START:
+                    await self.warm_up()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await close_async_clients()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def warm_up(self):
+        """Prime the process (off the loop) and this loop's async client before serving"""
+        await asyncio.to_thread(warm_up)
+        try:
+            get_async_client()
+        except ValueError as e:
+            logger.warning("Warm-up step async_client failed: %s", e)
+
+    async def enhance(self, scope, receive, send):
+        headers = dict(scope['headers'])
+        state = request_started(headers.get(b'x-request-id', b'').decode('latin-1'))
+        status = await self.run_enhance(scope, receive, send, headers, state['id'])
+        request_finished(state, 'POST', '/api/enhance', scope['path'], status)
+
+    async def run_enhance(self, scope, receive, send, headers, request_id):
+        """Handle one enhancement; returns the response status"""
+        extra = {'X-Request-ID': request_id}
+        try:
+            body = await self.read_body(receive)
+            try:
+                data = json.loads(body) if body else None
+            except ValueError:
+                data = None
+
+            text, error = validate_enhance_request(data)
+            if not error:
+                previous, error = load_previous(data)
+            if error:
+                await self.send_json(scope, send, {'error': error}, status=400, headers=extra)
+                return 400
+
+            pipeline = get_async_pipeline()
+            use_cache = not data.get('bypassCache', False)
+            timeout = headers.get(b'x-request-timeout', b'').decode('latin-1')
+            client = client_id({name.decode('latin-1'): value.decode('latin-1') for name, value in headers.items()},
+                               (scope.get('client') or (None,))[0])
+            with deadline(request_deadline({'X-Request-Timeout': timeout})):
+                with await get_admission_controller().acquire_async(client) as ticket:
+                    if is_incremental(data):
+                        result = await pipeline.process_incremental(text, previous, mode=data.get('mode'),
+                                                                    use_cache=use_cache)
+                    else:
+                        result = await pipeline.process(text, mode=data.get('mode'), use_cache=use_cache)
+            await self.send_json(scope, send, format_enhance_response(text, result, bool(data.get('compact'))),
+                                 headers=dict(ticket.headers(), **extra))
+            return 200
+
+        except Exception as e:
+            status, error_headers = error_status(e)
+            await self.send_json(scope, send, {'error': f'Enhancement failed: {str(e)}'},
+                                 status=status, headers=dict(error_headers, **extra))
+            return status
+
+    @staticmethod
+    async def read_body(receive) -> bytes:
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > Config.MAX_CONTENT_LENGTH:
+                raise ValueError('Request body too large')
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    @staticmethod
+    def cors_headers(scope):
+        """Mirror the Flask-CORS policy for natively handled routes"""
+        origin = dict(scope['headers']).get(b'origin', b'').decode('latin-1')
+        if origin in Config.CORS_ORIGINS:
+            return [(b'access-control-allow-origin', origin.encode('latin-1')),
+                    (b'vary', b'Origin')]
+        return []
+
+    async def send_json(self, scope, send, payload, status=200, headers=None):
+        accept_encoding = dict(scope['headers']).get(b'accept-encoding', b'').decode('latin-1')
+        body, encoding = compress_payload(dumps(payload).encode('utf-8'), 'application/json', accept_encoding)
+        headers = dict(headers or {}, Vary='Accept-Encoding')
+        if encoding is not None:
+            headers['Content-Encoding'] = encoding
+        extra = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                 for name, value in headers.items()]
+        headers = [(b'content-type', b'application/json'),
+                   (b'content-length', str(len(body)).encode())] + extra
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers + self.cors_headers(scope)
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+app = TimeComposerASGI(flask_app)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Benchmark every export writer on a generated narrative set
+
+Usage (from the backend directory):
+    python benchmarks/export_bench.py                      # 100k rows, every format
+    python benchmarks/export_bench.py --rows 500000 --formats csv xlsx
+
+Each format runs in its own subprocess so peak RSS is measured in isolation;
+the report gives rows/s, output bytes/s, output size and how much the peak
+RSS grew over the interpreter's baseline while writing.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from exporters import EXPORT_WRITERS
+
+ACTIVITIES = [
+    'Draft motion to compel and review opposing counsel\'s responses',
+    'Telephone conference with client re: settlement terms',
+    'Review and revise purchase agreement, "Schedule B" exhibits',
+    'Research case law on personal jurisdiction; memo to file',
+    'Prepare for and attend deposition of J. Müller',
+]
+
+
+def generate_narratives(rows, seed=7):
+    """Yield a reproducible stream of narratives shaped like the app's exports"""
+    rng = random.Random(seed)
+    for i in range(rows):
+        yield {
+            'narrative': rng.choice(ACTIVITIES),
+            'hours': rng.choice([0.1, 0.2, 0.25, 0.5, 1.0, 1.5, 2.3]),
+            'clientCode': f'C{rng.randint(1000, 9999)}',
+            'matterNumber': f'{rng.randint(1, 999):03d}-{rng.randint(1, 99):02d}',
+            # A handful of dictations per day, so createdAt repeats like real exports
+            'createdAt': f'2024-{i // 30000 % 12 + 1:02d}-{i // 1000 % 28 + 1:02d}T{i // 100 % 10 + 8:02d}:15:00.000Z'
+        }
+
+
+def peak_rss_bytes():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_format(export_format, rows):
+    """Write one export to a temporary file and return its measurements"""
+    writer = EXPORT_WRITERS[export_format]
+    # A one-row warm-up pulls in lazy imports (pyarrow) before the baseline
+    with tempfile.TemporaryFile() as out:
+        writer.write(generate_narratives(1), out)
+    baseline = peak_rss_bytes()
+    with tempfile.TemporaryFile() as out:
+        start = time.perf_counter()
+        count = writer.write(generate_narratives(rows), out)
+        elapsed = time.perf_counter() - start
+        size = out.tell()
+    return {
+        'format': export_format,
+        'rows': count,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(count / elapsed),
+        'output_bytes': size,
+        'output_bytes_per_second': round(size / elapsed),
+        'peak_rss_mb': round(peak_rss_bytes() / 1e6, 1),
+        'rss_growth_mb': round((peak_rss_bytes() - baseline) / 1e6, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--formats', nargs='+', choices=list(EXPORT_WRITERS), default=list(EXPORT_WRITERS))
+    parser.add_argument('--output', help='write the report as JSON to this path')
+    parser.add_argument('--run-format', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_format:
+        print(json.dumps(run_format(args.run_format, args.rows)))
+        return 0
+
+    results = []
+    print(f"Exporting {args.rows} rows")
+    for export_format in args.formats:
+        completed = subprocess.run([sys.executable, __file__, '--run-format', export_format, '--rows', str(args.rows)],
+                                   capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"✗ {export_format}: {completed.stderr.strip().splitlines()[-1]}")
+            results.append({'format': export_format, 'error': completed.stderr.strip()})
+            continue
+        result = json.loads(completed.stdout)
+        results.append(result)
+        print(f"  {export_format:8s} {result['rows_per_second']:>9,d} rows/s "
+              f"{result['output_bytes_per_second'] / 1e6:7.1f} MB/s "
+              f"{result['output_bytes'] / 1e6:7.1f} MB out  "
+              f"peak RSS {result['peak_rss_mb']:.1f} MB (+{result['rss_growth_mb']:.1f} MB while writing)")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'rows': args.rows, 'results': results}, f, indent=2)
+
+    return 1 if any('error' in result for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""Load-test the enhance endpoints against the mock LLM server
+
+Usage (from the backend directory):
+    python benchmarks/load_test.py --concurrency 16 --requests 200
+    python benchmarks/load_test.py --url http://127.0.0.1:5001 --mock-url http://127.0.0.1:8765
+    python benchmarks/load_test.py --latency fixed:0.3 --rate-429 0.05 --output results/baseline.json
+    python benchmarks/load_test.py --bulk-clients 4 --bulk-batch-size 20 --max-in-flight 8
+
+Without --url the Flask app is served in-process on a threaded werkzeug
+server. Without --mock-url an in-process mock_llm_server is started and the
+app is pointed at it, so no Azure credentials are needed. Request texts come
+from the separator golden corpus and are sent round-robin with the cache
+bypassed, so every request reaches the (mock) model.
+
+Reports throughput, latency percentiles, errors by status and upstream
+calls per request (from the mock's /stats). With --server-pid it also
+samples the server's memory (PSS of the master and its workers) and reports
+it per concurrent request. --output saves the report as JSON; --baseline
+prints the change against an earlier report.
+
+With --bulk-clients, that many extra clients keep posting batches to
+/api/enhance/batch for the whole run, each as its own X-User-ID, while the
+measured requests are sent as interactive users. Comparing runs with
+ADMISSION_ENABLED=false and true shows how much bulk load the interactive
+tail latency absorbs.
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import mock_llm_server
+
+CORPUS_DIR = Path(__file__).resolve().parent / 'corpus'
+ENDPOINTS = {'enhance': '/api/enhance', 'stream': '/api/enhance/stream'}
+
+
+def load_texts(path):
+    with open(path) as f:
+        return [item['text'] for item in json.load(f)['items']]
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def start_mock(args):
+    """Serve mock_llm_server in a background thread; returns its base URL"""
+    mock_args = mock_llm_server.build_parser().parse_args([
+        '--port', '0', '--latency', args.latency, '--rate-429', str(args.rate_429),
+        '--max-in-flight', str(args.max_in_flight), '--tail-prob', str(args.tail_prob),
+        '--tail-latency', str(args.tail_latency), '--retry-after', str(args.retry_after)
+    ] + (['--seed', str(args.seed)] if args.seed is not None else []))
+    server, _ = mock_llm_server.serve(mock_args)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def start_app(mock_url):
+    """Serve the Flask app in-process against mock_url; returns its base URL"""
+    os.environ['AZURE_OPENAI_ENDPOINT'] = mock_url
+    os.environ.setdefault('AZURE_OPENAI_API_KEY', 'mock')
+    os.environ.setdefault('AZURE_OPENAI_API_VERSION', '2024-09-01-preview')
+    from werkzeug.serving import make_server
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def upstream_stats(client, mock_url):
+    try:
+        return client.get(f'{mock_url}/stats').json()
+    except httpx.HTTPError:
+        return None
+
+
+def send(client, url, text, stream, timeout, headers=None):
+    """Return (status, seconds) for one request; stream errors count as their SSE status"""
+    body = {'text': text, 'bypassCache': True}
+    start = time.perf_counter()
+    try:
+        if not stream:
+            response = client.post(url, json=body, timeout=timeout, headers=headers)
+            return response.status_code, time.perf_counter() - start
+        status = None
+        with client.stream('POST', url, json=body, timeout=timeout, headers=headers) as response:
+            status = response.status_code
+            event = None
+            for line in response.iter_lines():
+                if line.startswith('event: '):
+                    event = line[7:]
+                elif line.startswith('data: ') and event == 'error':
+                    status = json.loads(line[6:]).get('status', 500)
+        return status, time.perf_counter() - start
+    except httpx.HTTPError as e:
+        return type(e).__name__, time.perf_counter() - start
+
+
+def process_tree_memory(pid):
+    """Proportional set size of a process and its descendants in bytes (Linux).
+
+    PSS splits pages shared between forked workers among them, so preloaded
+    code is not counted once per worker the way RSS would count it.
+    """
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/smaps_rollup') as f:
+                for line in f:
+                    if line.startswith('Pss:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class BulkLoad:
+    """Clients posting batches back to back until stopped"""
+
+    def __init__(self, url, texts, clients, batch_size, timeout):
+        self.url = url
+        self.texts = texts
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.batches = self.items = self.rejected = self.failed = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.threads = [threading.Thread(target=self.run, args=(f'bulk-{i}',), daemon=True) for i in range(clients)]
+
+    def run(self, user):
+        with httpx.Client() as client:
+            offset = 0
+            while not self.stopped.is_set():
+                texts = [self.texts[(offset + i) % len(self.texts)] for i in range(self.batch_size)]
+                offset += self.batch_size
+                try:
+                    response = client.post(self.url, json={'texts': texts, 'bypassCache': True},
+                                           headers={'X-User-ID': user}, timeout=self.timeout)
+                    status = response.status_code
+                except httpx.HTTPError:
+                    status = None
+                with self.lock:
+                    if status == 200:
+                        self.batches += 1
+                        self.items += self.batch_size
+                    elif status == 503:
+                        self.rejected += 1
+                    else:
+                        self.failed += 1
+                if status == 503:
+                    self.stopped.wait(float(response.headers.get('Retry-After', '1')))
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+        return {'clients': len(self.threads), 'batchSize': self.batch_size, 'batches': self.batches,
+                'items': self.items, 'rejected': self.rejected, 'failed': self.failed}
+
+
+class MemorySampler(threading.Thread):
+    """Track the peak memory of a server's process tree while the test runs"""
+
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, process_tree_memory(self.pid))
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return self.peak
+
+
+def run(args, app_url, mock_url):
+    texts = load_texts(args.corpus)
+    url = app_url + ENDPOINTS[args.endpoint]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = []
+    lock = threading.Lock()
+
+    with httpx.Client(limits=limits) as client:
+        for i in range(args.warmup):
+            send(client, url, texts[i % len(texts)], args.endpoint == 'stream', args.timeout)
+        before = upstream_stats(client, mock_url) if mock_url else None
+
+        counter = iter(range(args.requests))
+
+        def worker(user):
+            for i in counter:
+                outcome = send(client, url, texts[i % len(texts)], args.endpoint == 'stream', args.timeout,
+                               headers={'X-User-ID': user})
+                with lock:
+                    results.append(outcome)
+
+        bulk = None
+        if args.bulk_clients:
+            bulk = BulkLoad(app_url + '/api/enhance/batch', texts, args.bulk_clients, args.bulk_batch_size,
+                            args.timeout)
+            bulk.start()
+            time.sleep(args.bulk_ramp)  # let the batches fill the queues first
+        sampler = MemorySampler(args.server_pid) if args.server_pid else None
+        if sampler:
+            sampler.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for n in range(args.concurrency):
+                executor.submit(worker, f'user-{n}')
+        elapsed = time.perf_counter() - start
+        peak_memory = sampler.stop() if sampler else None
+        bulk_report = bulk.stop() if bulk else None
+        after = upstream_stats(client, mock_url) if mock_url else None
+
+    latencies = [seconds * 1000 for status, seconds in results if status == 200]
+    errors = {}
+    for status, _ in results:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+    report = {
+        'endpoint': ENDPOINTS[args.endpoint],
+        'concurrency': args.concurrency,
+        'requests': len(results),
+        'elapsedSeconds': round(elapsed, 3),
+        'throughputRps': round(len(results) / elapsed, 2) if elapsed else None,
+        'latencyMs': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'mean': sum(latencies) / len(latencies) if latencies else None,
+            'max': max(latencies) if latencies else None
+        },
+        'errors': errors,
+        'mock': {'latency': args.latency, 'rate429': args.rate_429, 'maxInFlight': args.max_in_flight,
+                 'tailProb': args.tail_prob} if not args.mock_url else {'url': mock_url}
+    }
+    for key, value in report['latencyMs'].items():
+        if value is not None:
+            report['latencyMs'][key] = round(value, 1)
+
+    if before and after:
+        calls = after['calls'] - before['calls']
+        report['upstream'] = {
+            'calls': calls,
+            'throttled': after['throttled'] - before['throttled'],
+            'callsPerRequest': round(calls / len(results), 3) if results else None,
+            'maxInFlight': after['maxInFlight']
+        }
+    if bulk_report:
+        report['bulk'] = bulk_report
+    if peak_memory:
+        report['serverMemoryMb'] = {
+            'peak': round(peak_memory / 1e6, 1),
+            'perConcurrentRequest': round(peak_memory / 1e6 / args.concurrency, 2)
+        }
+    return report
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=Path(__file__).resolve().parent, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    latency = report['latencyMs']
+    print(f"{report['requests']} requests to {report['endpoint']} at concurrency {report['concurrency']}")
+    print(f"  throughput: {report['throughputRps']} req/s")
+    print(f"  latency ms: p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    print(f"  errors:     {report['errors'] or 'none'}")
+    if 'bulk' in report:
+        bulk = report['bulk']
+        print(f"  bulk:       {bulk['clients']} clients, {bulk['batches']} batches ({bulk['items']} items) done, "
+              f"{bulk['rejected']} rejected, {bulk['failed']} failed")
+    if 'upstream' in report:
+        upstream = report['upstream']
+        print(f"  upstream:   {upstream['calls']} calls ({upstream['callsPerRequest']}/request), "
+              f"{upstream['throttled']} throttled")
+    if 'serverMemoryMb' in report:
+        memory = report['serverMemoryMb']
+        print(f"  memory:     {memory['peak']} MB peak PSS, {memory['perConcurrentRequest']} MB per concurrent request")
+
+    if baseline:
+        print(f"Against baseline {baseline.get('revision') or ''}:")
+        for label, path in (('throughput', ('throughputRps',)), ('p50', ('latencyMs', 'p50')),
+                            ('p95', ('latencyMs', 'p95')), ('p99', ('latencyMs', 'p99')),
+                            ('calls/request', ('upstream', 'callsPerRequest')),
+                            ('MB/request', ('serverMemoryMb', 'perConcurrentRequest'))):
+            old, new = baseline, report
+            for key in path:
+                old = (old or {}).get(key)
+                new = (new or {}).get(key)
+            if old and new is not None:
+                print(f"  {label:14s} {old} -> {new} ({(new - old) / old:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='base URL of a running backend (default: serve the app in-process)')
+    parser.add_argument('--mock-url', help='base URL of a running mock_llm_server (default: start one)')
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='enhance')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=2, help='requests sent before measuring')
+    parser.add_argument('--timeout', type=float, default=60.0, help='client timeout per request (seconds)')
+    parser.add_argument('--corpus', default=str(CORPUS_DIR / 'separator_golden.json'))
+    parser.add_argument('--latency', default='lognormal:0.6,0.4', help='mock latency distribution')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='mock 429 probability')
+    parser.add_argument('--max-in-flight', type=int, default=0, help='mock concurrency cap (0 = off)')
+    parser.add_argument('--tail-prob', type=float, default=0.0)
+    parser.add_argument('--tail-latency', type=float, default=5.0)
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--bulk-clients', type=int, default=0,
+                        help='clients posting batches in the background while measuring (default: none)')
+    parser.add_argument('--bulk-batch-size', type=int, default=10, help='items per background batch')
+    parser.add_argument('--bulk-ramp', type=float, default=2.0,
+                        help='seconds of bulk load before measuring starts')
+    parser.add_argument('--server-pid', type=int,
+                        help='with --url: gunicorn master pid, to report peak memory of its process tree')
+    parser.add_argument('--output', help='write the report as JSON to this path')
+    parser.add_argument('--baseline', help='earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    if args.url and not args.mock_url:
+        parser.error('--url needs --mock-url: the backend must already be pointed at the mock')
+
+    mock_url = args.mock_url or start_mock(args)
+    app_url = args.url or start_app(mock_url)
+
+    report = run(args, app_url, mock_url)
+    report['revision'] = git_revision()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Azure OpenAI chat completions API
+
+Usage (from the backend directory):
+    python benchmarks/mock_llm_server.py --port 8765 --latency lognormal:0.6,0.5 --rate-429 0.02
+
+Then point the backend at it:
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8765 AZURE_OPENAI_API_KEY=mock
+
+Responses are canned but shaped like the real agents' output:
+- json_object requests (separator) split the text into activities with the
+  local pre-parser.
+- json_schema requests (fused) add a narrative to each activity.
+- Plain requests (refiner) echo the activity as a capitalized narrative.
+stream=true is answered as Server-Sent Events.
+
+GET /stats returns call counts, injected 429s and latency totals;
+POST /stats/reset clears them.
+
+Latency distributions (seconds):
+    fixed:0.5   uniform:0.2,1.0   normal:0.6,0.15   lognormal:MEDIAN,SIGMA   exp:MEAN
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents.preparser import preparse
+
+TEXT_RE = re.compile(r'Text:\s*(.*)', re.S)
+ACTIVITY_RE = re.compile(r'Activity:\s*(.*?)\s*(?:\nTime:|$)', re.S)
+
+
+def parse_distribution(spec: str):
+    """'lognormal:0.6,0.5' -> a function returning one latency sample"""
+    name, _, raw = spec.partition(':')
+    args = [float(value) for value in raw.split(',') if value]
+    if name == 'fixed':
+        return lambda: args[0]
+    if name == 'uniform':
+        return lambda: random.uniform(args[0], args[1])
+    if name == 'normal':
+        return lambda: max(0.0, random.gauss(args[0], args[1]))
+    if name == 'lognormal':
+        return lambda: random.lognormvariate(math.log(args[0]), args[1])
+    if name == 'exp':
+        return lambda: random.expovariate(1.0 / args[0])
+    raise ValueError(f"Unknown latency distribution '{spec}'")
+
+
+class MockState:
+    def __init__(self, args):
+        self.args = args
+        self.latency = parse_distribution(args.latency)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.calls = 0
+            self.throttled = 0
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.latency_total = 0.0
+            self.by_deployment = {}
+            self.by_kind = {}
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'throttled': self.throttled,
+                'inFlight': self.in_flight,
+                'maxInFlight': self.max_in_flight,
+                'meanLatency': round(self.latency_total / self.calls, 4) if self.calls else None,
+                'byDeployment': dict(self.by_deployment),
+                'byKind': dict(self.by_kind)
+            }
+
+
+def message_text(body):
+    """The last user message, where the agents put their variable input"""
+    for message in reversed(body.get('messages', [])):
+        if message.get('role') == 'user':
+            return message.get('content') or ''
+    return ''
+
+
+def canned_content(body):
+    """Return (kind, content) for a chat completion request"""
+    text = message_text(body)
+    response_format = (body.get('response_format') or {}).get('type')
+
+    if response_format in ('json_object', 'json_schema'):
+        match = TEXT_RE.search(text)
+        source = match.group(1).strip() if match else text
+        entries = [{'activity': entry['activity'], 'hours': entry['hours']}
+                   for entry in preparse(source)['entries']]
+        if response_format == 'json_schema':
+            for entry in entries:
+                entry['narrative'] = entry['activity'][:1].upper() + entry['activity'][1:]
+            return 'fused', json.dumps({'entries': entries})
+        return 'separator', json.dumps({'entries': entries})
+
+    match = ACTIVITY_RE.search(text)
+    activity = match.group(1).strip() if match else text.strip()
+    return 'refiner', activity[:1].upper() + activity[1:]
+
+
+def make_handler(state):
+    args = state.args
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *log_args):
+            pass
+
+        def send_json(self, payload, status=200, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.startswith('/stats'):
+                return self.send_json(state.snapshot())
+            self.send_json({'error': 'not found'}, status=404)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length)
+
+            if self.path.startswith('/stats/reset'):
+                state.reset()
+                return self.send_json({'reset': True})
+            if '/chat/completions' not in self.path:
+                return self.send_json({'error': 'not found'}, status=404)
+
+            body = json.loads(raw or b'{}')
+            deployment = body.get('model', 'unknown')
+            match = re.search(r'/deployments/([^/]+)/', self.path)
+            if match:
+                deployment = match.group(1)
+
+            with state.lock:
+                state.calls += 1
+                state.by_deployment[deployment] = state.by_deployment.get(deployment, 0) + 1
+                over_capacity = args.max_in_flight and state.in_flight >= args.max_in_flight
+                throttle = over_capacity or random.random() < args.rate_429
+                if throttle:
+                    state.throttled += 1
+                else:
+                    state.in_flight += 1
+                    state.max_in_flight = max(state.max_in_flight, state.in_flight)
+
+            if throttle:
+                retry_after = args.retry_after
+                return self.send_json(
+                    {'error': {'code': '429', 'message': 'Requests to the deployment have exceeded the rate limit.'}},
+                    status=429,
+                    headers={'Retry-After': str(math.ceil(retry_after)),
+                             'retry-after-ms': str(int(retry_after * 1000))}
+                )
+
+            try:
+                self.complete(body, deployment)
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+        def complete(self, body, deployment):
+            kind, content = canned_content(body)
+            latency = state.latency()
+            if random.random() < args.tail_prob:
+                latency += args.tail_latency
+            with state.lock:
+                state.by_kind[kind] = state.by_kind.get(kind, 0) + 1
+                state.latency_total += latency
+
+            prompt_tokens = sum(len(m.get('content') or '') for m in body.get('messages', [])) // 4
+            completion_tokens = max(1, len(content) // 4)
+            completion_id = f'chatcmpl-{uuid.uuid4().hex[:12]}'
+
+            usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                     'total_tokens': prompt_tokens + completion_tokens}
+
+            if body.get('stream'):
+                include_usage = (body.get('stream_options') or {}).get('include_usage')
+                return self.stream(completion_id, deployment, content, latency, usage if include_usage else None)
+
+            time.sleep(latency)
+            self.send_json({
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': deployment,
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': content}}],
+                'usage': usage
+            })
+
+        def stream(self, completion_id, deployment, content, latency, usage=None):
+            """Send the first token after ~30% of the latency and spread the rest
+
+            With usage, a final chunk with no choices carries it, as the API
+            does for stream_options={"include_usage": true}.
+            """
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+            def write(data):
+                payload = f'data: {data}\n\n'.encode('utf-8')
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(payload), payload))
+                self.wfile.flush()
+
+            pieces = [content[i:i + 8] for i in range(0, len(content), 8)] or ['']
+            time.sleep(latency * 0.3)
+            step = latency * 0.7 / len(pieces)
+            for piece in pieces:
+                write(json.dumps({
+                    'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': deployment,
+                    'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]
+                }))
+                time.sleep(step)
+            write(json.dumps({
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                'model': deployment, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]
+            }))
+            if usage is not None:
+                write(json.dumps({
+                    'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': deployment, 'choices': [], 'usage': usage
+                }))
+            write('[DONE]')
+            self.wfile.write(b'0\r\n\r\n')
+
+    return Handler
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='lognormal:0.6,0.4', help='latency distribution, see module docs')
+    parser.add_argument('--tail-prob', type=float, default=0.0, help='probability of an extra slow tail')
+    parser.add_argument('--tail-latency', type=float, default=5.0, help='seconds added to tail calls')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='probability of answering 429')
+    parser.add_argument('--max-in-flight', type=int, default=0, help='answer 429 above this concurrency (0 = off)')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--seed', type=int, help='random seed for reproducible runs')
+    return parser
+
+
+def serve(args):
+    if args.seed is not None:
+        random.seed(args.seed)
+    state = MockState(args)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    server.daemon_threads = True
+    return server, state
+
+
+def main():
+    args = build_parser().parse_args()
+    server, _ = serve(args)
+    print(f"✓ Mock LLM server on http://{args.host}:{server.server_port} (latency {args.latency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""Compare response size and delivery time across JSON encoders, compact mode and compression
+
+Usage (from the backend directory):
+    python benchmarks/payload_bench.py                       # default payloads, 2 Mbit/s link
+    python benchmarks/payload_bench.py --entries 60 --batch 100 --bandwidth-mbps 10 --output results/payload.json
+
+Payloads are shaped like the API's: an /api/enhance response for a long
+dictation, a JSON /api/enhance/batch response, the same batch streamed as
+NDJSON, and a CSV export. Each is encoded as the app would (stdlib or orjson
+provider, full or compact), then sent as is, gzipped or brotli-compressed.
+Delivery time = encode + compress + transfer at --bandwidth-mbps, so the
+before (stdlib, full, identity) and after rows can be compared directly.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from api.compression import ENCODERS
+from api.json_provider import OrjsonProvider, json_backend
+from exporters import EXPORT_WRITERS
+
+VERBS = ['Reviewed and revised', 'Drafted', 'Telephone conference with opposing counsel regarding',
+         'Met with the client to discuss', 'Researched case law for', 'Prepared', 'Analyzed', 'Finalized',
+         'Email correspondence with co-counsel about', 'Attended hearing on']
+DOCUMENTS = ['the asset purchase agreement', 'the motion to compel', 'the second set of interrogatories',
+             'settlement options', 'personal jurisdiction over foreign defendants', 'the exhibit binder',
+             'the privilege log', 'deposition outlines', 'the indemnification schedule', 'the expert report',
+             'the lease amendment', 'summary judgment briefing', 'the disclosure schedules', 'the NDA']
+PARTIES = ['Acme Corp.', 'Brightline LLC', 'the Hollis estate', 'Northwind Holdings', 'Dr. Okafor',
+           'the landlord', 'Meridian Bank', 'J. Müller', 'the board', 'Patel & Sons']
+DETAILS = ['including open comments from the partner', 'and circulated a redline', 'ahead of the March 14 deadline',
+           'and updated the case calendar', 'per the court\'s scheduling order', 'with follow-up items noted',
+           'and summarized key risks', 'for the 9:30 call']
+HOURS = [0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 2.3, 3.0]
+
+
+def activity(rng):
+    return f'{rng.choice(VERBS)} {rng.choice(DOCUMENTS)} for {rng.choice(PARTIES)}'
+
+
+def enhance_body(entries, rng, compact):
+    """An /api/enhance response body for a dictation with this many entries"""
+    picked = [(activity(rng), rng.choice(HOURS), rng.choice(DETAILS)) for _ in range(entries)]
+    text = ' '.join(f'{name} for {hours} hours.' for name, hours, _ in picked)
+    body = {
+        'groupId': '3f1c2a7e-58d4-4a43-9a1d-0c6b1f2e9d70',
+        'originalText': text,
+        'cleanedText': text,
+        'narratives': [{
+            'text': f'{name} {detail}.',
+            'hours': hours,
+            'clientCode': None,
+            'matterNumber': None,
+            'original': name
+        } for name, hours, detail in picked],
+        'totalHours': round(sum(hours for _, hours, _ in picked), 1)
+    }
+    if compact:
+        del body['originalText'], body['cleanedText']
+    return body
+
+
+def build_payloads(args):
+    """name -> {variant: (kind, object)}; kind is 'json', 'ndjson' or 'csv'"""
+    payloads = {}
+    for compact in (False, True):
+        variant = 'compact' if compact else 'full'
+        rng = random.Random(7)
+        single = enhance_body(args.entries, rng, compact)
+        items = [{'index': i, 'id': None, 'status': 'ok', 'result': enhance_body(args.entries // 4 or 1, rng, compact)}
+                 for i in range(args.batch)]
+        payloads.setdefault('enhance', {})[variant] = ('json', single)
+        payloads.setdefault('batch', {})[variant] = ('json', {'results': items, 'succeeded': len(items), 'failed': 0})
+        payloads.setdefault('batch_ndjson', {})[variant] = ('ndjson', items + [{'done': True, 'succeeded': len(items),
+                                                                                 'failed': 0}])
+    rng = random.Random(7)
+    rows = [{'narrative': f'{activity(rng)} {rng.choice(DETAILS)}.', 'hours': rng.choice(HOURS),
+             'clientCode': f'C{rng.randint(1000, 9999)}', 'matterNumber': f'{rng.randint(1, 999):03d}-{rng.randint(1, 99):02d}',
+             'createdAt': f'2024-03-{i // 200 % 28 + 1:02d}T09:30:00.000Z'}
+            for i in range(args.csv_rows)]
+    payloads['export_csv'] = {'full': ('csv', rows)}
+    return payloads
+
+
+def timed(function, repeat):
+    """(result, median seconds) over repeat calls"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples)
+
+
+def encode(kind, obj, provider):
+    if kind == 'json':
+        return provider.dumps(obj).encode('utf-8')
+    if kind == 'ndjson':
+        return ''.join(provider.dumps(line) + '\n' for line in obj).encode('utf-8')
+    out = io.BytesIO()
+    EXPORT_WRITERS['csv'].write(obj, out)
+    return out.getvalue()
+
+
+def compress(body, encoding):
+    if encoding == 'identity':
+        return body
+    encoder = ENCODERS[encoding]()
+    return encoder.compress(body) + encoder.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=40, help='entries in the single-dictation payload')
+    parser.add_argument('--batch', type=int, default=50, help='items in the batch payloads')
+    parser.add_argument('--csv-rows', type=int, default=10000)
+    parser.add_argument('--bandwidth-mbps', type=float, default=2.0, help='client link speed for delivery time')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write the report as JSON to this path')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    providers = {'stdlib': DefaultJSONProvider(app)}
+    if json_backend() == 'orjson':
+        providers['orjson'] = OrjsonProvider(app)
+    encodings = ['identity'] + [name for name in ('gzip', 'br') if name in ENCODERS]
+
+    results = []
+    for name, variants in build_payloads(args).items():
+        print(f"{name}:")
+        baseline = None
+        for variant, (kind, obj) in variants.items():
+            for provider_name, provider in providers.items():
+                if kind == 'csv' and provider_name != 'stdlib':
+                    continue  # CSV does not go through the JSON provider
+                body, encode_seconds = timed(lambda: encode(kind, obj, provider), args.repeat)
+                for encoding in encodings:
+                    sent, compress_seconds = timed(lambda: compress(body, encoding), args.repeat)
+                    transfer = len(sent) * 8 / (args.bandwidth_mbps * 1e6)
+                    row = {
+                        'payload': name, 'variant': variant, 'json': provider_name if kind != 'csv' else None,
+                        'encoding': encoding, 'bytes': len(body), 'sent_bytes': len(sent),
+                        'encode_ms': round(encode_seconds * 1000, 2),
+                        'compress_ms': round(compress_seconds * 1000, 2),
+                        'delivery_ms': round((encode_seconds + compress_seconds + transfer) * 1000, 1)
+                    }
+                    baseline = baseline or row
+                    row['vs_baseline'] = round(row['delivery_ms'] / baseline['delivery_ms'], 3)
+                    results.append(row)
+                    print(f"  {variant:8s} {provider_name if kind != 'csv' else '-':7s} {encoding:9s} "
+                          f"{row['sent_bytes']:>10,d} B  encode {row['encode_ms']:7.2f} ms  "
+                          f"compress {row['compress_ms']:7.2f} ms  delivery {row['delivery_ms']:8.1f} ms "
+                          f"({row['vs_baseline']:.2f}x)")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'bandwidth_mbps': args.bandwidth_mbps, 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
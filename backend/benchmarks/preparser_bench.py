@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Benchmark the duration pre-parser and check it against the golden separator corpus
+
+Usage (from the backend directory):
+    python benchmarks/preparser_bench.py             # timing + agreement report
+    python benchmarks/preparser_bench.py --record    # refresh expectations from the live SeparatorAgent
+
+Exits non-zero if any item confident enough to skip the separator call
+disagrees with the corpus on entry count or hours. Agreement only means
+something once the expectations are recorded from the model: the report
+names the corpus source, and --require-recorded fails on a hand-written one.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import Config
+from agents.preparser import preparse
+
+CORPUS_PATH = Path(__file__).resolve().parent / 'corpus' / 'separator_golden.json'
+HOURS_TOLERANCE = 0.01
+
+
+def load_corpus(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def record(path):
+    """Replace expected entries with the live separator's output"""
+    from agents import SeparatorAgent
+
+    corpus = load_corpus(path)
+    agent = SeparatorAgent()
+    for item in corpus['items']:
+        result = agent.process(item['text'], use_cache=False)
+        item['entries'] = [{'activity': e['activity'], 'hours': float(e.get('hours', 0.0))}
+                           for e in result.get('entries', [])]
+        print(f"recorded {len(item['entries'])} entries: {item['text'][:60]}")
+    corpus['source'] = 'model'
+    corpus['recorded'] = {'deployment': Config.AZURE_OPENAI_GPT_DEPLOYMENT,
+                          'at': datetime.now(timezone.utc).isoformat(timespec='seconds')}
+    with open(path, 'w') as f:
+        json.dump(corpus, f, indent=2)
+        f.write('\n')
+
+
+def agrees(parsed_entries, expected_entries):
+    """Entry counts match and hours match pairwise"""
+    if len(parsed_entries) != len(expected_entries):
+        return False
+    return all(abs(float(p['hours']) - float(e['hours'])) <= HOURS_TOLERANCE
+               for p, e in zip(parsed_entries, expected_entries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', default=str(CORPUS_PATH))
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--record', action='store_true', help='refresh expectations from the live model')
+    parser.add_argument('--require-recorded', action='store_true',
+                        help='fail unless the expectations were recorded from the model')
+    parser.add_argument('--output', help='write the report as JSON to this path')
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.corpus)
+        return 0
+
+    corpus = load_corpus(args.corpus)
+    items = corpus['items']
+    source = corpus.get('source', 'hand-written')
+
+    # Timing
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for item in items:
+            preparse(item['text'])
+    elapsed = time.perf_counter() - start
+    per_call_us = elapsed / (args.iterations * len(items)) * 1e6
+
+    # Agreement
+    buckets = {'skip': [0, 0], 'compact': [0, 0], 'full': [0, 0]}
+    failures = []
+    for item in items:
+        parsed = preparse(item['text'])
+        if parsed['confidence'] >= Config.PREPARSER_SKIP_CONFIDENCE:
+            bucket = 'skip'
+        elif parsed['confidence'] >= Config.PREPARSER_COMPACT_CONFIDENCE:
+            bucket = 'compact'
+        else:
+            bucket = 'full'
+        ok = agrees(parsed['entries'], item['entries'])
+        buckets[bucket][0] += ok
+        buckets[bucket][1] += 1
+        if bucket == 'skip' and not ok:
+            failures.append({'text': item['text'], 'parsed': parsed['entries'], 'expected': item['entries']})
+
+    report = {
+        'items': len(items),
+        'corpus_source': source,
+        'mean_preparse_us': round(per_call_us, 1),
+        'skip_confidence': Config.PREPARSER_SKIP_CONFIDENCE,
+        'compact_confidence': Config.PREPARSER_COMPACT_CONFIDENCE,
+        'buckets': {name: {'count': total, 'agree': agree} for name, (agree, total) in buckets.items()},
+        'separator_calls_skipped': buckets['skip'][1],
+        'skip_disagreements': failures
+    }
+
+    print(f"Pre-parser: {per_call_us:.1f} us/dictation over {len(items)} items")
+    if source != 'model':
+        print(f"⚠ Expectations are {source}, not recorded from the separator: agreement below is "
+              f"against them, not the model. Refresh with --record.")
+    for name, (agree, total) in buckets.items():
+        print(f"  {name:8s} {total:3d} items, {agree:3d} agree with corpus")
+    for failure in failures:
+        print(f"✗ confident but wrong: {failure['text']}")
+        print(f"    parsed:   {failure['parsed']}")
+        print(f"    expected: {failure['expected']}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.require_recorded and source != 'model':
+        return 1
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Check that prompt changes keep model outputs within the golden corpora's bounds
+
+Usage (from the backend directory, with Azure OpenAI configured):
+    python benchmarks/prompt_regression.py                      # check live outputs
+    python benchmarks/prompt_regression.py --record             # refresh refiner narratives
+    python benchmarks/prompt_regression.py --require-recorded   # also fail on a hand-written corpus
+
+Runs every refiner corpus item through RefinerAgent and every separator
+corpus item through SeparatorAgent with the cache bypassed. Outputs are
+sampled at a non-zero temperature, so they are checked on structure
+rather than exact text: a narrative must start with a present tense verb
+and must not introduce numbers or proper nouns that are not in the
+activity; separator output must match the corpus on entry count and hours
+and must not invent facts either. Exits non-zero on any failure.
+
+tests/test_prompt_regression.py runs the same checks offline against the
+recorded outputs, and live when PROMPT_REGRESSION_LIVE is set.
+"""
+
+import argparse
+import json
+import re
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import Config
+
+CORPUS_DIR = Path(__file__).resolve().parent / 'corpus'
+REFINER_CORPUS = CORPUS_DIR / 'refiner_golden.json'
+SEPARATOR_CORPUS = CORPUS_DIR / 'separator_golden.json'
+HOURS_TOLERANCE = 0.01
+
+WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]*|\d+(?:\.\d+)?")
+SENTENCE_START_RE = re.compile(r'(?:^|[.!?]\s+)([A-Za-z]+)')
+# Endings of a past tense or gerund opening word; the refiner must lead with a present tense verb
+NOT_PRESENT_TENSE_RE = re.compile(r'(?:ed|ing)$', re.IGNORECASE)
+
+
+def load_corpus(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def invented_terms(source: str, text: str) -> list:
+    """Numbers and capitalised words in text that do not appear in source
+
+    A capitalised word is only suspicious mid-sentence; words opening a
+    sentence are capitalised anyway.
+    """
+    known = {word.lower() for word in WORD_RE.findall(source)}
+    openers = {match.start(1) for match in SENTENCE_START_RE.finditer(text)}
+    invented = []
+    for match in WORD_RE.finditer(text):
+        word = match.group(0)
+        if word.lower() in known:
+            continue
+        if word[0].isdigit() or (word[0].isupper() and match.start() not in openers):
+            invented.append(word)
+    return invented
+
+
+def narrative_problems(activity: str, narrative: str) -> list:
+    """Reasons a refined narrative breaks the refiner's rules, empty if none"""
+    words = narrative.split()
+    if not words:
+        return ['empty narrative']
+    problems = []
+    first = words[0].strip('"\'')
+    if not first[:1].isupper() or NOT_PRESENT_TENSE_RE.search(first):
+        problems.append(f"does not start with a present tense verb: '{first}'")
+    if '\n' in narrative.strip():
+        problems.append('spans several lines')
+    invented = invented_terms(activity, narrative)
+    if invented:
+        problems.append(f"adds terms not in the activity: {', '.join(invented)}")
+    return problems
+
+
+def entries_problems(text: str, entries: list, expected: list) -> list:
+    """Reasons separator entries disagree with the expected ones, empty if none"""
+    if len(entries) != len(expected):
+        return [f'{len(entries)} entries, expected {len(expected)}']
+    problems = []
+    for index, (entry, want) in enumerate(zip(entries, expected)):
+        hours = float(entry.get('hours', 0.0))
+        if abs(hours - float(want['hours'])) > HOURS_TOLERANCE:
+            problems.append(f"entry {index}: {hours} hours, expected {want['hours']}")
+        invented = invented_terms(text, str(entry.get('activity', '')))
+        if invented:
+            problems.append(f"entry {index}: adds terms not in the text: {', '.join(invented)}")
+    return problems
+
+
+def refine(agent, item):
+    result = agent.process({'activity': item['activity'], 'hours': item['hours']}, use_cache=False)
+    return result['refined_narrative'].strip()
+
+
+def record(path):
+    """Replace expected narratives with the live refiner's output"""
+    from agents import RefinerAgent
+
+    corpus = load_corpus(path)
+    agent = RefinerAgent()
+    for item in corpus['items']:
+        item['narrative'] = refine(agent, item)
+        print(f"recorded: {item['activity'][:40]} -> {item['narrative']}")
+    corpus['source'] = 'model'
+    corpus['recorded'] = {'deployment': Config.AZURE_OPENAI_GPT_DEPLOYMENT,
+                          'at': datetime.now(timezone.utc).isoformat(timespec='seconds')}
+    with open(path, 'w') as f:
+        json.dump(corpus, f, indent=2)
+        f.write('\n')
+
+
+def check_refiner(path):
+    from agents import RefinerAgent
+
+    agent = RefinerAgent()
+    failures = []
+    for item in load_corpus(path)['items']:
+        narrative = refine(agent, item)
+        problems = narrative_problems(item['activity'], narrative)
+        if problems:
+            failures.append(f"refiner: '{item['activity']}'\n    got:      {narrative}\n"
+                            f"    recorded: {item['narrative']}\n    " + '; '.join(problems))
+    return failures
+
+
+def check_separator(path):
+    from agents import SeparatorAgent
+
+    agent = SeparatorAgent()
+    failures = []
+    for item in load_corpus(path)['items']:
+        entries = agent.process(item['text'], use_cache=False).get('entries', [])
+        problems = entries_problems(item['text'], entries, item['entries'])
+        if problems:
+            failures.append(f"separator: '{item['text']}'\n    got:      {entries}\n"
+                            f"    expected: {item['entries']}\n    " + '; '.join(problems))
+    return failures
+
+
+def unrecorded(*paths) -> list:
+    """Corpora whose expectations were not recorded from the model"""
+    return [str(path) for path in paths if load_corpus(path).get('source', 'hand-written') != 'model']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--refiner-corpus', default=str(REFINER_CORPUS))
+    parser.add_argument('--separator-corpus', default=str(SEPARATOR_CORPUS))
+    parser.add_argument('--record', action='store_true', help='refresh refiner narratives from the live model')
+    parser.add_argument('--require-recorded', action='store_true',
+                        help='fail unless both corpora were recorded from the model')
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.refiner_corpus)
+        return 0
+
+    hand_written = unrecorded(args.refiner_corpus, args.separator_corpus)
+    for path in hand_written:
+        print(f"⚠ {path} is hand-written; record it from the model before relying on it")
+
+    failures = check_refiner(args.refiner_corpus) + check_separator(args.separator_corpus)
+    for failure in failures:
+        print(f"✗ {failure}")
+    if not failures:
+        print("✓ Outputs stay within the golden corpora")
+    return 1 if failures or (args.require_recorded and hand_written) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Report prompt token counts per template
+
+Usage (from the backend directory):
+    python benchmarks/prompt_tokens.py
+    python benchmarks/prompt_tokens.py --output reports/prompt_tokens.json
+
+For each template in PROMPT_TEMPLATES, counts the static system message
+(the prefix shared by every call) and the variable user tail over the
+golden corpora. Uses tiktoken when it is installed, otherwise estimates
+one token per four characters.
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from prompts import PROMPT_TEMPLATES, PROMPT_VERSION
+
+CORPUS_DIR = Path(__file__).resolve().parent / 'corpus'
+
+# Azure OpenAI only caches prompts of at least this many tokens
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+
+def token_counter():
+    """Return (name, count_fn)"""
+    try:
+        import tiktoken
+    except ImportError:
+        return 'estimate (4 chars/token)', lambda text: max(1, len(text) // 4)
+    encoding = tiktoken.get_encoding('o200k_base')
+    return 'tiktoken o200k_base', lambda text: len(encoding.encode(text))
+
+
+def sample_inputs():
+    """Template name -> list of format() kwargs from the golden corpora"""
+    with open(CORPUS_DIR / 'separator_golden.json') as f:
+        texts = [item['text'] for item in json.load(f)['items']]
+    with open(CORPUS_DIR / 'refiner_golden.json') as f:
+        entries = [{'activity': item['activity'], 'hours': item['hours']} for item in json.load(f)['items']]
+    text_inputs = [{'input_text': text} for text in texts]
+    return {
+        'separator': text_inputs,
+        'compact_separator': text_inputs,
+        'fused': text_inputs,
+        'refiner': entries
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help='write the report as JSON to this path')
+    args = parser.parse_args()
+
+    counter_name, count = token_counter()
+    inputs = sample_inputs()
+
+    templates = {}
+    for name, template in PROMPT_TEMPLATES.items():
+        system_tokens = count(template['system'])
+        tails = [count(template['user'].format(**kwargs)) for kwargs in inputs.get(name, [])]
+        mean_tail = sum(tails) / len(tails) if tails else 0.0
+        templates[name] = {
+            'version': template['version'],
+            'system_tokens': system_tokens,
+            'mean_user_tokens': round(mean_tail, 1),
+            'max_user_tokens': max(tails) if tails else 0,
+            'static_share': round(system_tokens / (system_tokens + mean_tail), 3),
+            'prefix_cacheable': system_tokens >= PROMPT_CACHE_MIN_TOKENS
+        }
+
+    report = {'prompt_version': PROMPT_VERSION, 'counter': counter_name, 'templates': templates}
+
+    print(f"Prompt version {PROMPT_VERSION}, token counts by {counter_name}")
+    print(f"  {'template':18s} {'ver':>4s} {'system':>7s} {'user':>7s} {'static':>7s}  cacheable")
+    for name, row in templates.items():
+        print(f"  {name:18s} {row['version']:>4s} {row['system_tokens']:7d} {row['mean_user_tokens']:7.1f} "
+              f"{row['static_share']:7.1%}  {'yes' if row['prefix_cacheable'] else 'no'}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
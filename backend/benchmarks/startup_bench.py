@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Measure cold import time of the app against a startup budget
+
+Usage (from the backend directory):
+    python benchmarks/startup_bench.py                     # import app, 5 runs, 500 ms budget
+    python benchmarks/startup_bench.py --module asgi --budget-ms 600 --runs 9
+
+Each run imports the module in a fresh interpreter under `python -X importtime`.
+The budget applies to the median cumulative import time of the module itself
+(interpreter and site startup excluded). The run also fails if a module that
+must stay deferred (openai, httpx by default) was imported eagerly. The time
+those deferred imports take is reported separately, as the cost that
+agents.warmup moves out of the first request.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+PROBE = '''
+import sys, json, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter() - start
+eager = sorted(name for name in {forbid!r} if name in sys.modules)
+deferred = None
+if {measure_deferred}:
+    from agents.warmup import import_dependencies
+    deferred = import_dependencies()
+print(json.dumps({{'imported': imported, 'eager': eager, 'deferred': deferred}}))
+'''
+
+
+def parse_importtime(stderr):
+    """[(self_us, cumulative_us, depth, name)] from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+
+def run_once(module, forbid, measure_deferred=False):
+    code = PROBE.format(module=module, forbid=tuple(forbid), measure_deferred=measure_deferred)
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                               cwd=BACKEND_DIR, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    rows = parse_importtime(completed.stderr)
+    cumulative = next((c for s, c, depth, name in rows if name == module and depth == 0), None)
+    return {'rows': rows, 'cumulative_ms': (cumulative or 0) / 1000, **json.loads(completed.stdout.splitlines()[-1])}
+
+
+def top_packages(rows, module, count):
+    """Self time per top-level package imported on behalf of the module"""
+    # importtime lists children before their parent: the subtree is the run of
+    # rows after the previous top-level import, up to the module's own line
+    end = next((i for i, row in enumerate(rows) if row[2] == 0 and row[3] == module), None)
+    if end is None:
+        return []
+    start = max((i for i in range(end) if rows[i][2] == 0), default=-1) + 1
+    totals = defaultdict(int)
+    for self_us, cumulative_us, depth, name in rows[start:end]:
+        totals[name.split('.')[0]] += self_us
+    return sorted(((name, us / 1000) for name, us in totals.items()), key=lambda item: -item[1])[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='app', help='module to import (app or asgi)')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=500.0)
+    parser.add_argument('--forbid', nargs='*', default=['openai', 'httpx'],
+                        help='modules that must not be imported by the module itself')
+    parser.add_argument('--top', type=int, default=10, help='packages to list by import time')
+    parser.add_argument('--output', help='write the report as JSON to this path')
+    args = parser.parse_args()
+
+    runs = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        result = run_once(args.module, args.forbid)
+        result['wall_ms'] = (time.perf_counter() - start) * 1000
+        runs.append(result)
+    runs.sort(key=lambda run: run['cumulative_ms'])
+    median = runs[len(runs) // 2]
+    deferred = run_once(args.module, args.forbid, measure_deferred=True)
+
+    eager = sorted({name for run in runs for name in run['eager']})
+    report = {
+        'module': args.module,
+        'runs': args.runs,
+        'budget_ms': args.budget_ms,
+        'median_ms': round(median['cumulative_ms'], 1),
+        'min_ms': round(runs[0]['cumulative_ms'], 1),
+        'max_ms': round(runs[-1]['cumulative_ms'], 1),
+        'median_process_ms': round(statistics.median(run['wall_ms'] for run in runs), 1),
+        'deferred_ms': round(deferred['deferred'] * 1000, 1),
+        'eager_imports': eager,
+        'top_packages': [{'package': name, 'ms': round(ms, 1)}
+                         for name, ms in top_packages(median['rows'], args.module, args.top)],
+    }
+
+    print(f"import {args.module}: median {report['median_ms']:.0f} ms "
+          f"(min {report['min_ms']:.0f}, max {report['max_ms']:.0f}; "
+          f"whole process {report['median_process_ms']:.0f} ms) over {args.runs} runs")
+    print(f"deferred to warm-up / first use: {report['deferred_ms']:.0f} ms")
+    for item in report['top_packages']:
+        print(f"  {item['package']:24s} {item['ms']:7.1f} ms")
+
+    failures = []
+    if report['median_ms'] > args.budget_ms:
+        failures.append(f"median {report['median_ms']:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager)}")
+    for failure in failures:
+        print(f"✗ {failure}")
+    if not failures:
+        print(f"✓ within the {args.budget_ms:.0f} ms budget")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(dict(report, passed=not failures), f, indent=2)
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
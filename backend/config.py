@@ -10,6 +10,119 @@ class Config:
     AZURE_OPENAI_API_VERSION = os.getenv('AZURE_OPENAI_API_VERSION')
     AZURE_OPENAI_GPT_DEPLOYMENT = os.getenv('AZURE_OPENAI_GPT_DEPLOYMENT')
     
+    # Azure OpenAI HTTP connection pool (shared per worker process)
+    AZURE_OPENAI_MAX_CONNECTIONS = int(os.getenv('AZURE_OPENAI_MAX_CONNECTIONS', '20'))
+    AZURE_OPENAI_MAX_KEEPALIVE = int(os.getenv('AZURE_OPENAI_MAX_KEEPALIVE', '10'))
+    AZURE_OPENAI_KEEPALIVE_EXPIRY = float(os.getenv('AZURE_OPENAI_KEEPALIVE_EXPIRY', '60'))
+    AZURE_OPENAI_CONNECT_TIMEOUT = float(os.getenv('AZURE_OPENAI_CONNECT_TIMEOUT', '5'))
+    AZURE_OPENAI_READ_TIMEOUT = float(os.getenv('AZURE_OPENAI_READ_TIMEOUT', '60'))
+    
+    # Azure OpenAI quota pacing and retries. RPM/TPM limits (0 = off) apply per
+    # worker process unless RATE_LIMIT_STATE_DIR gives the workers a shared bucket
+    AZURE_OPENAI_RPM_LIMIT = float(os.getenv('AZURE_OPENAI_RPM_LIMIT', '0'))
+    AZURE_OPENAI_TPM_LIMIT = float(os.getenv('AZURE_OPENAI_TPM_LIMIT', '0'))
+    AZURE_OPENAI_COMPLETION_TOKENS = int(os.getenv('AZURE_OPENAI_COMPLETION_TOKENS', '400'))  # TPM estimate per call
+    AZURE_OPENAI_MAX_CONCURRENCY = int(os.getenv('AZURE_OPENAI_MAX_CONCURRENCY', '16'))  # AIMD ceiling per worker
+    AZURE_OPENAI_MAX_RETRIES = int(os.getenv('AZURE_OPENAI_MAX_RETRIES', '6'))
+    AZURE_OPENAI_RETRY_BASE_DELAY = float(os.getenv('AZURE_OPENAI_RETRY_BASE_DELAY', '0.5'))
+    AZURE_OPENAI_RETRY_MAX_DELAY = float(os.getenv('AZURE_OPENAI_RETRY_MAX_DELAY', '30'))
+    RATE_LIMIT_STATE_DIR = os.getenv('RATE_LIMIT_STATE_DIR', '')
+    
+    # Tail latency: per-request deadline (keep below the gunicorn timeout),
+    # optional hedging of slow calls and a circuit breaker for Azure outages
+    ENHANCE_DEADLINE_SECONDS = float(os.getenv('ENHANCE_DEADLINE_SECONDS', '25'))
+    HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'false').lower() == 'true'
+    HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '95'))  # hedge calls slower than this
+    HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', '0.5'))
+    HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))
+    HEDGE_POOL_SIZE = int(os.getenv('HEDGE_POOL_SIZE', '32'))  # threads for primary and hedge attempts per worker
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))  # consecutive failures, 0 = off
+    CIRCUIT_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', '30'))
+    
+    # Model routing: a small deployment for simple calls (empty = always use the
+    # main deployment). MODEL_ROUTING maps agents to small, large or auto.
+    AZURE_OPENAI_SMALL_DEPLOYMENT = os.getenv('AZURE_OPENAI_SMALL_DEPLOYMENT', '')
+    MODEL_ROUTING = os.getenv('MODEL_ROUTING', 'refiner=auto,compact_separator=small,separator=large,fused=large')
+    ROUTER_SMALL_MAX_WORDS = int(os.getenv('ROUTER_SMALL_MAX_WORDS', '12'))  # 'auto' limit for the small model
+    ROUTER_ESCALATE = os.getenv('ROUTER_ESCALATE', 'true').lower() == 'true'  # retry invalid small results on large
+    
+    # Agent pipeline
+    PIPELINE_MODE = os.getenv('PIPELINE_MODE', 'two_stage')  # 'two_stage' or 'fused'
+    REFINER_CONCURRENCY = int(os.getenv('REFINER_CONCURRENCY', '8'))
+    # Dictations longer than this are separated in parallel chunks (0 = never split)
+    SEPARATOR_CHUNK_WORDS = int(os.getenv('SEPARATOR_CHUNK_WORDS', '250'))
+    SEPARATOR_CHUNK_OVERLAP = int(os.getenv('SEPARATOR_CHUNK_OVERLAP', '1'))  # sentences repeated across a boundary
+    # Stream the separator response and start refining each entry as soon as it is generated
+    SEPARATOR_STREAMING = os.getenv('SEPARATOR_STREAMING', 'false').lower() == 'true'
+    
+    # Incremental re-enhancement (previousGroupId / previous on /api/enhance): results are
+    # remembered by groupId in their own store (memory by default; sqlite is shared by workers
+    # but keeps dictations on disk); edits are re-run with this many sentence units of
+    # context, or in full when they touch more than INCREMENTAL_MAX_CHANGE of the text
+    INCREMENTAL_GROUP_HISTORY = os.getenv('INCREMENTAL_GROUP_HISTORY', 'true').lower() == 'true'
+    INCREMENTAL_HISTORY_BACKEND = os.getenv('INCREMENTAL_HISTORY_BACKEND', 'memory')
+    INCREMENTAL_HISTORY_PATH = os.getenv('INCREMENTAL_HISTORY_PATH',
+                                         os.path.join(os.path.dirname(__file__), 'data', 'group_history.sqlite3'))
+    INCREMENTAL_HISTORY_MAX_ENTRIES = int(os.getenv('INCREMENTAL_HISTORY_MAX_ENTRIES', '10000'))
+    INCREMENTAL_HISTORY_TTL = float(os.getenv('INCREMENTAL_HISTORY_TTL', '86400'))  # seconds, 0 = no expiry
+    INCREMENTAL_CONTEXT_UNITS = int(os.getenv('INCREMENTAL_CONTEXT_UNITS', '1'))
+    INCREMENTAL_MAX_CHANGE = float(os.getenv('INCREMENTAL_MAX_CHANGE', '0.6'))
+    
+    # Batch enhancement (/api/enhance/batch)
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '500'))
+    BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))  # dictations in flight per worker
+    BATCH_RATE_LIMIT = float(os.getenv('BATCH_RATE_LIMIT', '2'))  # dictations started per second per worker, 0 = unlimited
+    
+    # Job queue (/api/jobs, run by worker.py)
+    JOBS_DB_PATH = os.getenv('JOBS_DB_PATH', os.path.join(os.path.dirname(__file__), 'data', 'jobs.sqlite3'))
+    JOBS_RETENTION_SECONDS = float(os.getenv('JOBS_RETENTION_SECONDS', '86400'))
+    JOBS_STALE_SECONDS = float(os.getenv('JOBS_STALE_SECONDS', '600'))  # requeue running jobs without a heartbeat
+    JOBS_HEARTBEAT_SECONDS = float(os.getenv('JOBS_HEARTBEAT_SECONDS', '30'))  # well under JOBS_STALE_SECONDS
+    JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', '1'))
+    JOBS_CONCURRENCY = int(os.getenv('JOBS_CONCURRENCY', '4'))  # batch items run at once per job
+    JOBS_WEBHOOKS_ENABLED = os.getenv('JOBS_WEBHOOKS_ENABLED', 'false').lower() == 'true'
+    
+    # Local duration pre-parser: 'auto' lets confident parses skip or shrink the
+    # separator call, 'off' always uses the full separator prompt
+    PREPARSER_MODE = os.getenv('PREPARSER_MODE', 'off')
+    PREPARSER_SKIP_CONFIDENCE = float(os.getenv('PREPARSER_SKIP_CONFIDENCE', '0.95'))
+    PREPARSER_COMPACT_CONFIDENCE = float(os.getenv('PREPARSER_COMPACT_CONFIDENCE', '0.6'))
+    
+    # Agent response cache: 'memory' (per worker), 'sqlite' (shared by workers) or 'none'
+    AGENT_CACHE_BACKEND = os.getenv('AGENT_CACHE_BACKEND', 'memory')
+    AGENT_CACHE_PATH = os.getenv('AGENT_CACHE_PATH', os.path.join(os.path.dirname(__file__), 'data', 'agent_cache.sqlite3'))
+    AGENT_CACHE_MAX_ENTRIES = int(os.getenv('AGENT_CACHE_MAX_ENTRIES', '10000'))
+    AGENT_CACHE_TTL = float(os.getenv('AGENT_CACHE_TTL', '86400'))  # seconds, 0 = no expiry
+    
+    # Directory for per-key lock files that coalesce identical enhancements
+    # across worker processes (empty = coalesce within a worker only)
+    SINGLEFLIGHT_LOCK_DIR = os.getenv('SINGLEFLIGHT_LOCK_DIR', '')
+    
+    # Observability: Prometheus metrics at /api/metrics and structured logs.
+    # With METRICS_DIR set, workers share their metrics through per-pid files there
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_DIR = os.getenv('METRICS_DIR', '')
+    METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # 'text' or 'json'
+    
+    # Serving (gunicorn_config.py). SERVER_PROFILE picks the worker model; worker
+    # and thread counts follow Little's law: requests in flight = arrival rate x
+    # time in the system, which is almost all upstream latency
+    SERVER_PROFILE = os.getenv('SERVER_PROFILE', 'gthread')  # sync, gthread, gevent or uvicorn
+    SERVER_BIND = os.getenv('SERVER_BIND', '0.0.0.0:5001')
+    SERVER_TARGET_RPS = float(os.getenv('SERVER_TARGET_RPS', '10'))
+    SERVER_UPSTREAM_LATENCY = float(os.getenv('SERVER_UPSTREAM_LATENCY', '4'))  # seconds per request, see request_seconds
+    SERVER_HEADROOM = float(os.getenv('SERVER_HEADROOM', '1.5'))  # spare capacity for bursts
+    SERVER_TARGET_CONCURRENCY = int(os.getenv('SERVER_TARGET_CONCURRENCY', '0'))  # 0 = derive from RPS x latency
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '0'))  # 0 = derive
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', '0'))  # gthread threads per worker, 0 = derive
+    SERVER_PRELOAD = os.getenv('SERVER_PRELOAD', 'true').lower() == 'true'
+    SERVER_MAX_REQUESTS = int(os.getenv('SERVER_MAX_REQUESTS', '2000'))  # recycle workers, 0 = never
+    SERVER_MAX_REQUESTS_JITTER = int(os.getenv('SERVER_MAX_REQUESTS_JITTER', '200'))
+    # Prime clients, cache and pipelines in each worker before it accepts traffic (agents.warmup)
+    WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'true').lower() == 'true'
+    
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
     
     # CORS settings
@@ -17,6 +130,32 @@ class Config:
     
     # File upload settings
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    
+    # NDJSON exports bypass MAX_CONTENT_LENGTH; rows are spooled to disk past EXPORT_SPOOL_BYTES
+    EXPORT_MAX_CONTENT_LENGTH = int(os.getenv('EXPORT_MAX_CONTENT_LENGTH', str(512 * 1024 * 1024)))  # 0 = unlimited
+    EXPORT_SPOOL_BYTES = int(os.getenv('EXPORT_SPOOL_BYTES', str(1024 * 1024)))
+    
+    # Response encoding: orjson when installed (auto, orjson or stdlib), and negotiated
+    # compression of buffered bodies from COMPRESSION_MIN_BYTES and of every streamed body
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'auto')
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_ALGORITHMS = [a.strip() for a in os.getenv('COMPRESSION_ALGORITHMS', 'br,gzip').split(',') if a.strip()]  # preference order; br needs brotli
+    COMPRESSION_MIMETYPES = [m.strip() for m in os.getenv('COMPRESSION_MIMETYPES', 'application/json,application/x-ndjson,text/csv').split(',') if m.strip()]
+    COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))  # 0-11; higher is slower
+    
+    # Admission control (admission.py): pipelines run at once per worker, the share bulk
+    # (batch) work may hold, and bounded per-client queues served by weighted fair queueing
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_SLOTS = int(os.getenv('ADMISSION_SLOTS', '16'))
+    ADMISSION_BULK_SLOTS = int(os.getenv('ADMISSION_BULK_SLOTS', '0'))  # 0 = BATCH_CONCURRENCY
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '32'))  # interactive requests waiting per worker
+    ADMISSION_MAX_QUEUE_PER_CLIENT = int(os.getenv('ADMISSION_MAX_QUEUE_PER_CLIENT', '8'))
+    ADMISSION_MAX_BULK_QUEUE = int(os.getenv('ADMISSION_MAX_BULK_QUEUE', '1000'))  # batch items from all clients
+    ADMISSION_MAX_WAIT = float(os.getenv('ADMISSION_MAX_WAIT', '10'))  # seconds, or less if the deadline is sooner
+    ADMISSION_CLIENT_WEIGHTS = os.getenv('ADMISSION_CLIENT_WEIGHTS', '')  # e.g. user:alice=2,ip:10.0.0.9=0.5
+    ADMISSION_TRUST_FORWARDED = os.getenv('ADMISSION_TRUST_FORWARDED', 'false').lower() == 'true'  # behind a proxy
 
 
 # Flask extension objects
@@ -0,0 +1,307 @@
+"""
+Export writers for narrative sets.
+
+Every writer turns an iterable of narrative dicts into a binary file-like
+object one row at a time, so memory stays bounded by the writer's own
+buffers however many entries are exported. EXPORT_WRITERS maps the request's
+'format' to a writer; add a format by subclassing ExportWriter and
+registering an instance there.
+
+    csv      InTapp Import CSV (the layout the billing team re-imports)
+    csv.gz   the same CSV, gzip-compressed
+    zip      the same CSV in a zip archive
+    xlsx     the InTapp rows as a single-sheet workbook
+    ndjson   one compact JSON object per entry, for batch tools
+    parquet  columnar, when pyarrow is installed
+"""
+
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import re
+import zipfile
+from datetime import datetime
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+# InTapp Import layout: a title row, an empty row, then the column headers
+INTAPP_PREAMBLE = [
+    ['Activity for: '],   # Row 1: Activity for: (leave name blank)
+    [],                   # Row 2: Empty row
+    [
+        'Activity Type',    # A3 - leave entries blank
+        'Narrative',        # B3 - use narrative field
+        'Client ID',        # C3 - use clientCode field
+        'Client Name',      # D3 - leave entries blank
+        'Matter ID',        # E3 - use matterNumber field
+        'Matter Name',      # F3 - leave entries blank
+        'Duration',         # G3 - convert hours to minutes
+        'Time',             # H3 - format as "M/D/YY h:mm AM/PM"
+        'Comments',         # I3 - leave entries blank
+        'Notes'             # J3 - leave entries blank
+    ]
+]
+
+
+def format_intapp_time(date_obj: datetime) -> str:
+    """Format as "M/D/YY h:mm AM/PM" with internal quotes (strftime's %-m/%-d/%y %-I:%M %p)"""
+    hour = date_obj.hour % 12 or 12
+    meridiem = 'AM' if date_obj.hour < 12 else 'PM'
+    return f'"{date_obj.month}/{date_obj.day}/{date_obj.year % 100:02d} {hour}:{date_obj.minute:02d} {meridiem}"'
+
+
+@lru_cache(maxsize=4096)
+def format_created_at(created_at: str):
+    """Formatted time for an ISO createdAt, or None if it does not parse.
+
+    Entries from one dictation share a createdAt, so large exports mostly hit the cache.
+    """
+    try:
+        return format_intapp_time(datetime.fromisoformat(created_at.replace('Z', '+00:00')))
+    except ValueError:
+        return None
+
+
+def entry_fields(narrative):
+    """(narrative, client id, matter id, minutes, time) for one narrative"""
+    # Extract date from createdAt or use current date
+    created_at = narrative.get('createdAt')
+    time_str = format_created_at(created_at) if isinstance(created_at, str) else None
+    if time_str is None:
+        time_str = format_intapp_time(datetime.utcnow())
+
+    # Convert decimal hours to minutes using lower bound
+    # 0.1 = 6 min, 0.2 = 12 min, 0.3 = 18 min, etc.
+    hours = float(narrative.get('hours', 0.0))
+    minutes = int(hours * 60)
+
+    return (narrative.get('narrative', ''), narrative.get('clientCode', ''),
+            narrative.get('matterNumber', ''), minutes, time_str)
+
+
+def intapp_row(narrative):
+    """One InTapp CSV row for a narrative"""
+    text, client_id, matter_id, minutes, time_str = entry_fields(narrative)
+    return [
+        '',                 # Activity Type - blank
+        text,               # Narrative
+        client_id,          # Client ID
+        '',                 # Client Name - blank
+        matter_id,          # Matter ID
+        '',                 # Matter Name - blank
+        f"{minutes} min",   # Duration
+        time_str,           # Time with quotes
+        '',                 # Comments - blank
+        ''                  # Notes - blank
+    ]
+
+
+class ExportWriter:
+    """Write narratives to a binary file object; returns the number of entries written"""
+
+    mimetype = 'application/octet-stream'
+    extension = ''
+
+    def write(self, narratives, out) -> int:
+        raise NotImplementedError
+
+
+class CsvWriter(ExportWriter):
+    mimetype = 'text/csv'
+    extension = 'csv'
+
+    def write(self, narratives, out) -> int:
+        text = io.TextIOWrapper(out, encoding='utf-8', newline='')
+        try:
+            return self.write_text(narratives, text)
+        finally:
+            text.flush()
+            text.detach()
+
+    @staticmethod
+    def write_text(narratives, text) -> int:
+        writer = csv.writer(text)
+        writer.writerows(INTAPP_PREAMBLE)
+        count = 0
+        for narrative in narratives:
+            writer.writerow(intapp_row(narrative))
+            count += 1
+        return count
+
+
+class GzipCsvWriter(CsvWriter):
+    mimetype = 'application/gzip'
+    extension = 'csv.gz'
+
+    def write(self, narratives, out) -> int:
+        # mtime=0 keeps the output reproducible for identical input
+        with gzip.GzipFile(fileobj=out, mode='wb', compresslevel=6, mtime=0) as compressed:
+            return super().write(narratives, compressed)
+
+
+class ZipCsvWriter(CsvWriter):
+    mimetype = 'application/zip'
+    extension = 'zip'
+
+    def write(self, narratives, out) -> int:
+        with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+            with archive.open('time_entries.csv', 'w', force_zip64=True) as member:
+                return super().write(narratives, member)
+
+
+# Characters XML 1.0 does not allow, even escaped
+_XML_ILLEGAL_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Time Entries" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+class XlsxWriter(ExportWriter):
+    """Minimal SpreadsheetML workbook written row by row.
+
+    Cells are inline strings, so there is no shared-strings table to hold in
+    memory; the sheet XML is deflated straight into the archive. Rows match
+    the InTapp CSV, preamble included.
+    """
+
+    mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    extension = 'xlsx'
+
+    @staticmethod
+    def row_xml(number, values) -> str:
+        if not values:
+            return f'<row r="{number}"/>'
+        cells = ''.join(
+            f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_XML_ILLEGAL_RE.sub("", str(value)))}</t></is></c>'
+            if value not in ('', None) else '<c/>'
+            for value in values
+        )
+        return f'<row r="{number}">{cells}</row>'
+
+    def write(self, narratives, out) -> int:
+        count = 0
+        with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, content in _XLSX_PARTS.items():
+                archive.writestr(name, content)
+            with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as member:
+                sheet = io.TextIOWrapper(member, encoding='utf-8')
+                sheet.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                            '<sheetData>')
+                for number, values in enumerate(INTAPP_PREAMBLE, 1):
+                    sheet.write(self.row_xml(number, values))
+                number = len(INTAPP_PREAMBLE)
+                for narrative in narratives:
+                    number += 1
+                    sheet.write(self.row_xml(number, intapp_row(narrative)))
+                    count += 1
+                sheet.write('</sheetData></worksheet>')
+                sheet.flush()
+                sheet.detach()
+        return count
+
+
+class NdjsonWriter(ExportWriter):
+    """One compact JSON object per entry with the fields InTapp uses"""
+
+    mimetype = 'application/x-ndjson'
+    extension = 'ndjson'
+
+    def write(self, narratives, out) -> int:
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        count = 0
+        for narrative in narratives:
+            text, client_id, matter_id, minutes, time_str = entry_fields(narrative)
+            out.write(encoder.encode({
+                'narrative': text,
+                'clientId': client_id,
+                'matterId': matter_id,
+                'minutes': minutes,
+                'time': time_str.strip('"')
+            }).encode('utf-8'))
+            out.write(b'\n')
+            count += 1
+        return count
+
+
+class ParquetWriter(ExportWriter):
+    """Columnar export in row groups of ROW_GROUP_SIZE entries (needs pyarrow)"""
+
+    mimetype = 'application/vnd.apache.parquet'
+    extension = 'parquet'
+    ROW_GROUP_SIZE = 10000
+
+    def write(self, narratives, out) -> int:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([('narrative', pa.string()), ('clientId', pa.string()), ('matterId', pa.string()),
+                            ('minutes', pa.int32()), ('time', pa.string())])
+        columns = [[] for _ in schema]
+        count = 0
+        with pq.ParquetWriter(out, schema, compression='zstd') as writer:
+            for narrative in narratives:
+                text, client_id, matter_id, minutes, time_str = entry_fields(narrative)
+                for column, value in zip(columns, (text, client_id, matter_id, minutes, time_str.strip('"'))):
+                    column.append(value)
+                count += 1
+                if len(columns[0]) >= self.ROW_GROUP_SIZE:
+                    writer.write_table(pa.Table.from_pydict(dict(zip(schema.names, columns)), schema=schema))
+                    columns = [[] for _ in schema]
+            if columns[0] or count == 0:
+                writer.write_table(pa.Table.from_pydict(dict(zip(schema.names, columns)), schema=schema))
+        return count
+
+
+EXPORT_WRITERS = {
+    'csv': CsvWriter(),
+    'csv.gz': GzipCsvWriter(),
+    'zip': ZipCsvWriter(),
+    'xlsx': XlsxWriter(),
+    'ndjson': NdjsonWriter(),
+}
+
+# Optional: pyarrow is large, so it is only imported when a parquet export runs
+if importlib.util.find_spec('pyarrow') is not None:
+    EXPORT_WRITERS['parquet'] = ParquetWriter()
+
+
+def get_writer(export_format: str):
+    """The writer for a format name, or None if it is not supported"""
+    return EXPORT_WRITERS.get(export_format)
@@ -1,17 +1,91 @@
 # Gunicorn configuration file
+#
+# The service spends almost all of its time waiting on Azure OpenAI, so
+# processes are sized for concurrency rather than CPU. SERVER_PROFILE picks
+# the worker model (see SERVER_PROFILES); worker and thread counts follow
+# Little's law from the target request rate and upstream latency in Config.
+#
+#     gunicorn -c gunicorn_config.py                # app module comes from the profile
+#     python gunicorn_config.py                     # print the sizing for this environment
+import gc
+import math
 import multiprocessing
 import os
+from config import Config
+
+# profile -> worker class, app module and how many requests one worker holds
+SERVER_PROFILES = {
+    'sync': {'worker_class': 'sync', 'app': 'app:app', 'per_worker': 1},
+    'gthread': {'worker_class': 'gthread', 'app': 'app:app', 'per_worker': 16},
+    'gevent': {'worker_class': 'gevent', 'app': 'app:app', 'per_worker': 250},
+    'uvicorn': {'worker_class': 'uvicorn.workers.UvicornWorker', 'app': 'asgi:app', 'per_worker': 250},
+}
+
+
+def target_concurrency() -> int:
+    """Requests in flight at the target load (L = lambda x W), with headroom"""
+    if Config.SERVER_TARGET_CONCURRENCY > 0:
+        return Config.SERVER_TARGET_CONCURRENCY
+    return max(1, math.ceil(Config.SERVER_TARGET_RPS * Config.SERVER_UPSTREAM_LATENCY * Config.SERVER_HEADROOM))
+
+
+def serving_plan(profile: str, concurrency: int, cpus: int) -> dict:
+    """Workers, threads and connections that hold `concurrency` requests"""
+    if profile not in SERVER_PROFILES:
+        raise ValueError(f"Unknown SERVER_PROFILE '{profile}' (expected one of: {', '.join(SERVER_PROFILES)})")
+    settings = SERVER_PROFILES[profile]
+
+    if profile == 'sync':
+        # One request per process: the only way to add concurrency is more processes
+        workers = Config.SERVER_WORKERS or concurrency
+        return dict(settings, workers=workers, threads=1, worker_connections=1, concurrency=workers)
+
+    per_worker = (Config.SERVER_THREADS if profile == 'gthread' else 0) or settings['per_worker']
+    # At least two workers so a recycling worker never leaves the server empty;
+    # beyond that, threads and greenlets are far cheaper than processes
+    cap = cpus * 2 + 1 if profile == 'gthread' else max(2, cpus)
+    workers = Config.SERVER_WORKERS or min(cap, max(2, math.ceil(concurrency / per_worker)))
+    per_worker = max(1, math.ceil(concurrency / workers))
+    return dict(settings, workers=workers,
+                threads=per_worker if profile == 'gthread' else 1,
+                worker_connections=max(per_worker, 100),
+                concurrency=workers * per_worker)
+
+
+profile = Config.SERVER_PROFILE
+plan = serving_plan(profile, target_concurrency(), multiprocessing.cpu_count())
+
+if profile == 'gevent':
+    # Patch before the app (and its locks and sockets) is imported by preload_app
+    try:
+        from gevent import monkey
+    except ImportError:
+        raise RuntimeError("SERVER_PROFILE=gevent needs the gevent package (pip install gevent)")
+    monkey.patch_all()
 
 # Server socket
-bind = "0.0.0.0:5001"
+bind = Config.SERVER_BIND
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = 'sync'
-worker_connections = 1000
-timeout = 30
+wsgi_app = plan['app']
+workers = plan['workers']
+worker_class = plan['worker_class']
+threads = plan['threads']
+worker_connections = plan['worker_connections']
+# Heartbeat timeout; requests themselves are bounded by ENHANCE_DEADLINE_SECONDS
+timeout = max(30, int(Config.ENHANCE_DEADLINE_SECONDS) + 5)
+graceful_timeout = timeout
 keepalive = 2
+# Heartbeat files on tmpfs so a slow disk cannot make workers look hung
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Recycle workers gradually to bound slow leaks; jitter keeps them from restarting together
+max_requests = Config.SERVER_MAX_REQUESTS
+max_requests_jitter = Config.SERVER_MAX_REQUESTS_JITTER if max_requests else 0
+
+# Import the app once in the master and fork it, so workers share its pages
+preload_app = Config.SERVER_PRELOAD
 
 # Logging
 accesslog = '-'
@@ -29,6 +103,58 @@ user = None
 group = None
 tmp_upload_dir = None
 
+# Server hooks
+def on_starting(server):
+    server.log.info("Serving profile %s: %s workers x %s (%s), ~%s requests in flight",
+                    profile, workers, threads if profile == 'gthread' else worker_connections,
+                    worker_class, plan['concurrency'])
+    per_worker = plan['concurrency'] // workers
+    if profile != 'sync' and per_worker > Config.AZURE_OPENAI_MAX_CONNECTIONS:
+        server.log.warning("%s requests per worker share %s pooled upstream connections; "
+                           "raise AZURE_OPENAI_MAX_CONNECTIONS", per_worker, Config.AZURE_OPENAI_MAX_CONNECTIONS)
+    # Counters restart with the server; drop the previous run's worker files
+    import metrics
+    metrics.get_registry().clear_directory()
+    if preload_app and Config.WARMUP_ON_START:
+        # The app module is already loaded; import what the agents defer too,
+        # once, so every forked worker shares it instead of importing its own
+        from agents.warmup import import_dependencies
+        server.log.info("Imported deferred agent dependencies in %.0f ms", import_dependencies() * 1000)
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # Keep the preloaded objects out of the collector so it does not touch
+        # (and copy) the pages the workers share with the master
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # Pooled HTTP connections must not be shared across processes. Rate limiter,
+    # breaker, metrics and pool state reset themselves via os.register_at_fork
+    from agents.client import reset_clients
+    reset_clients(close=False)
+
+
+def post_worker_init(worker):
+    # Runs in the worker after the app is loaded and before it accepts connections
+    if Config.WARMUP_ON_START:
+        from agents.warmup import warm_up
+        warm_up()
+
+
+def child_exit(server, worker):
+    # Runs in the master: keep a recycled worker's counts without keeping its file
+    import metrics
+    metrics.get_registry().retire(worker.pid)
+
 # SSL (uncomment for HTTPS)
 # keyfile = 'path/to/keyfile'
-# certfile = 'path/to/certfile'
\ No newline at end of file
+# certfile = 'path/to/certfile'
+
+
+if __name__ == '__main__':
+    for name in ('profile', 'wsgi_app', 'worker_class', 'workers', 'threads', 'worker_connections',
+                 'timeout', 'max_requests', 'max_requests_jitter', 'preload_app'):
+        print(f'{name:20s} {globals()[name]}')
+    print(f"{'concurrency':20s} {plan['concurrency']} (target {target_concurrency()})")
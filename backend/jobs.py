@@ -0,0 +1,215 @@
+"""
+Persistent job queue for long enhancement workloads.
+
+Jobs are stored in SQLite so the web workers that accept them and the
+worker process that runs them (worker.py) can live in separate processes.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from config import Config
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+OWNED = "status = 'running' AND worker_pid = ?"
+
+
+class JobStore:
+    """SQLite-backed job table shared by web workers and job workers"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL, '
+            'progress TEXT, result TEXT, error TEXT, webhook TEXT, '
+            'cancel_requested INTEGER NOT NULL DEFAULT 0, worker_pid INTEGER, '
+            'created REAL NOT NULL, started REAL, finished REAL, heartbeat REAL, expires REAL)'
+        )
+        self._connect().execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def submit(self, payload: dict, webhook: str = None) -> str:
+        job_id = str(uuid.uuid4())
+        self._connect().execute(
+            'INSERT INTO jobs (id, status, payload, progress, webhook, created) VALUES (?, ?, ?, ?, ?, ?)',
+            (job_id, 'queued', json.dumps(payload), json.dumps(initial_progress(payload)), webhook, time.time())
+        )
+        return job_id
+
+    def get(self, job_id: str):
+        row = self._connect().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None or (row['expires'] and row['expires'] < time.time()):
+            return None
+        return self._to_dict(row)
+
+    def claim(self):
+        """Atomically take the oldest queued job, or return None"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_pid = ?, started = ?, heartbeat = ? WHERE id = ?",
+                (os.getpid(), now, now, row['id'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return self.get(row['id'])
+
+    # Writes by the worker running a job only apply while it still owns the
+    # job; once requeue_stale hands it back, they return False instead
+    def heartbeat(self, job_id: str, worker_pid: int) -> bool:
+        cursor = self._connect().execute(
+            f'UPDATE jobs SET heartbeat = ? WHERE id = ? AND {OWNED}',
+            (time.time(), job_id, worker_pid)
+        )
+        return cursor.rowcount == 1
+
+    def update_progress(self, job_id: str, worker_pid: int, progress: dict) -> bool:
+        cursor = self._connect().execute(
+            f'UPDATE jobs SET progress = ?, heartbeat = ? WHERE id = ? AND {OWNED}',
+            (json.dumps(progress), time.time(), job_id, worker_pid)
+        )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id: str, worker_pid: int, status: str, result=None, error: str = None,
+               progress: dict = None) -> bool:
+        now = time.time()
+        cursor = self._connect().execute(
+            'UPDATE jobs SET status = ?, result = ?, error = ?, progress = COALESCE(?, progress), '
+            f'finished = ?, expires = ? WHERE id = ? AND {OWNED}',
+            (status, json.dumps(result) if result is not None else None, error,
+             json.dumps(progress) if progress is not None else None,
+             now, now + Config.JOBS_RETENTION_SECONDS, job_id, worker_pid)
+        )
+        return cursor.rowcount == 1
+
+    def cancel(self, job_id: str):
+        """Cancel a queued job now, or flag a running one; returns the job"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished = ?, expires = ? WHERE id = ? AND status = 'queued'",
+            (now, now + Config.JOBS_RETENTION_SECONDS, job_id)
+        )
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def cancel_requested(self, job_id: str) -> bool:
+        row = self._connect().execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def requeue_stale(self, stale_after: float) -> int:
+        """Return running jobs whose worker stopped heart-beating to the queue.
+
+        They run again from the first item, so their progress starts over.
+        """
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                "SELECT id, payload FROM jobs WHERE status = 'running' AND heartbeat < ?",
+                (time.time() - stale_after,)
+            ).fetchall()
+            for row in rows:
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker_pid = NULL, progress = ? WHERE id = ?",
+                    (json.dumps(initial_progress(json.loads(row['payload']))), row['id'])
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return len(rows)
+
+    def purge_expired(self) -> int:
+        cursor = self._connect().execute(
+            'DELETE FROM jobs WHERE expires IS NOT NULL AND expires < ?', (time.time(),)
+        )
+        return cursor.rowcount
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        return {
+            'id': row['id'],
+            'status': row['status'],
+            'payload': json.loads(row['payload']),
+            'progress': json.loads(row['progress']) if row['progress'] else None,
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'webhook': row['webhook'],
+            'cancel_requested': bool(row['cancel_requested']),
+            'worker_pid': row['worker_pid'],
+            'created': row['created'],
+            'started': row['started'],
+            'finished': row['finished'],
+            'expires': row['expires']
+        }
+
+
+def public_job(job: dict) -> dict:
+    """Public view of a job, as returned by GET /api/jobs/<id> and webhooks"""
+    body = {
+        'jobId': job['id'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'createdAt': job['created'],
+        'startedAt': job['started'],
+        'finishedAt': job['finished'],
+        'expiresAt': job['expires']
+    }
+    if job['result'] is not None:
+        body['result'] = job['result']
+    if job['error']:
+        body['error'] = job['error']
+    return body
+
+
+def initial_progress(payload: dict) -> dict:
+    return {
+        'itemsTotal': len(payload['items']),
+        'itemsDone': 0,
+        'entriesTotal': 0,   # known once each item has been separated
+        'entriesDone': 0
+    }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """Return the process-wide job store"""
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = JobStore(Config.JOBS_DB_PATH)
+    return _store
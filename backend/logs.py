@@ -0,0 +1,97 @@
+"""
+Logging setup with a per-request correlation id.
+
+The id comes from the client's X-Request-ID header or is generated, lives in
+a context variable (so pipeline threads started with copy_context() and
+asyncio tasks inherit it) and is attached to every log record. LOG_FORMAT
+'json' writes one JSON object per line for log shippers; 'text' is for
+local development. Extra structured fields are passed as
+logger.info(..., extra={'fields': {...}}).
+"""
+
+import contextvars
+import json
+import logging
+import re
+import sys
+import uuid
+from datetime import datetime, timezone
+from config import Config
+
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+# Client-supplied ids are echoed into logs and headers; keep them short and printable
+REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+
+
+def new_request_id(supplied: str = None) -> str:
+    """The client's id if it is well-formed, otherwise a fresh one"""
+    if supplied and REQUEST_ID_RE.match(supplied):
+        return supplied
+    return uuid.uuid4().hex
+
+
+def set_request_id(request_id: str):
+    """Bind the correlation id to the current context; returns a reset token"""
+    return request_id_var.set(request_id)
+
+
+def get_request_id() -> str:
+    return request_id_var.get()
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get() or '-'
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'requestId': getattr(record, 'request_id', None),
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+
+_configured = False
+
+
+def configure_logging():
+    """Install the root handler once per process"""
+    global _configured
+
+    if _configured:
+        return
+    _configured = True
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(JsonFormatter() if Config.LOG_FORMAT == 'json' else TextFormatter())
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(Config.LOG_LEVEL.upper())
+    
+    # Every upstream call is already covered by metrics; keep the HTTP client quiet
+    for name in ('httpx', 'httpcore', 'openai'):
+        logging.getLogger(name).setLevel(logging.WARNING)
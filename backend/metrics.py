@@ -0,0 +1,352 @@
+"""
+Process metrics exported in Prometheus text format at /api/metrics.
+
+Counters, gauges and histograms live in a per-process registry. With
+METRICS_DIR set, each worker also writes its registry to
+METRICS_DIR/metrics_<pid>.json every METRICS_FLUSH_SECONDS, and a scrape of
+any worker sums the files of every worker. Counters and histograms of
+workers that have exited are kept so totals never go backwards; their
+gauges (in-flight counts) are dropped. Under gunicorn_config.py the master
+folds exited workers into metrics_retired.json and clears the directory on
+start; otherwise clear METRICS_DIR on deploy.
+"""
+
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Any
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'timecomposer_'
+
+# Summed counters and histograms of workers that have exited
+RETIRED_FILE = 'metrics_retired.json'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 60.0)
+
+# name -> (type, help, label names)
+METRICS = {
+    'requests_total': ('counter', 'HTTP requests handled', ('endpoint', 'method', 'status')),
+    'request_seconds': ('histogram', 'HTTP request latency, including streamed bodies', ('endpoint',)),
+    'in_flight': ('gauge', 'Requests and upstream calls currently in progress', ('kind',)),
+    'stage_seconds': ('histogram', 'Pipeline stage latency', ('stage',)),
+    'llm_calls_total': ('counter', 'Upstream chat completion calls', ('agent', 'model', 'outcome')),
+    'llm_call_seconds': ('histogram', 'Upstream call latency, including retries', ('agent', 'model')),
+    'llm_tokens_total': ('counter', 'Tokens reported by the API', ('agent', 'model', 'kind')),
+    'cache_lookups_total': ('counter', 'Agent response cache lookups', ('backend', 'result')),
+    'queue_wait_seconds': ('histogram', 'Time work waited for a pool thread', ('pool',)),
+    'speculative_refinements_total': ('counter', 'Refinements started from streamed separator entries',
+                                      ('outcome',)),
+    'response_bytes_total': ('counter', 'Compressed response bodies, before and after compression',
+                             ('encoding', 'kind')),
+    'admission_rejections_total': ('counter', 'Work turned away by admission control', ('priority', 'reason')),
+}
+
+
+def _label_key(name: str, labels: Dict[str, Any]):
+    return tuple(str(labels.get(label, '')) for label in METRICS[name][2])
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and fixed-bucket histograms for one process"""
+
+    def __init__(self, directory: str = None, flush_interval: float = 5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self.values = {}      # (name, labels) -> float, counters and gauges
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self._flusher_pid = None
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, _label_key(name, labels))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + value
+        self._ensure_flusher()
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _label_key(name, labels))
+        with self._lock:
+            series = self.histograms.get(key)
+            if series is None:
+                series = self.histograms[key] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+        self._ensure_flusher()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'values': [[name, list(labels), value] for (name, labels), value in self.values.items()],
+                'histograms': [[name, list(labels), list(series)]
+                               for (name, labels), series in self.histograms.items()]
+            }
+
+    # Cross-worker aggregation
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f'metrics_{pid}.json')
+
+    def _ensure_flusher(self):
+        """Start this process's flush thread (again after a fork)"""
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write this process's registry for other workers' scrapes"""
+        if not self.directory:
+            return
+        try:
+            self._write(f'metrics_{os.getpid()}.json', self.snapshot())
+        except OSError as e:
+            logger.warning("Metrics flush failed: %s", e)
+
+    def collect(self) -> Dict[str, Any]:
+        """This process's live registry summed with every other worker's last flush"""
+        values = {}
+        histograms = {}
+        _merge(self.snapshot(), values, histograms, gauges=True)
+        if not self.directory or not os.path.isdir(self.directory):
+            return {'values': values, 'histograms': histograms}
+
+        # List before reading the retired totals: retire() writes those before
+        # removing the worker's file, so each exited worker is counted once
+        pids = self._worker_pids()
+        retired = self._read(RETIRED_FILE) or {'values': [], 'histograms': [], 'pids': []}
+        _merge(retired, values, histograms, gauges=False)
+        skip = set(retired['pids'])
+        skip.add(os.getpid())
+        for pid in pids:
+            if pid in skip:
+                continue
+            snapshot = self._read(f'metrics_{pid}.json')
+            if snapshot is not None:
+                _merge(snapshot, values, histograms, gauges=_alive(pid))
+        return {'values': values, 'histograms': histograms}
+
+    def retire(self, pid: int):
+        """Fold an exited worker's counters and histograms into the retired totals.
+
+        Called by the gunicorn master when a worker exits, so recycled workers
+        (max_requests) do not leave one file each behind for every scrape to read.
+        """
+        if not self.directory:
+            return
+        snapshot = self._read(f'metrics_{pid}.json')
+        if snapshot is None:
+            return
+        retired = self._read(RETIRED_FILE) or {'values': [], 'histograms': [], 'pids': []}
+        values = {}
+        histograms = {}
+        _merge(retired, values, histograms, gauges=False)
+        _merge(snapshot, values, histograms, gauges=False)
+        # Only pids whose files may still be listed by a concurrent scrape
+        pids = [p for p in retired['pids'] if os.path.exists(self._path(p))] + [pid]
+        try:
+            self._write(RETIRED_FILE, {
+                'values': [[name, list(labels), value] for (name, labels), value in values.items()],
+                'histograms': [[name, list(labels), series] for (name, labels), series in histograms.items()],
+                'pids': pids
+            })
+            os.remove(self._path(pid))
+        except OSError as e:
+            logger.warning("Retiring metrics of worker %s failed: %s", pid, e)
+
+    def clear_directory(self):
+        """Remove every worker's metrics file, e.g. when the server starts"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.startswith('metrics_') and filename.endswith(('.json', '.json.tmp')):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+    def _worker_pids(self):
+        pids = []
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith('metrics_') and filename.endswith('.json')):
+                continue
+            try:
+                pids.append(int(filename[len('metrics_'):-len('.json')]))
+            except ValueError:
+                continue
+        return pids
+
+    def _read(self, filename: str):
+        try:
+            with open(os.path.join(self.directory, filename)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, filename: str, snapshot):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, filename)
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, path)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        collected = self.collect()
+        lines = []
+        for name, (kind, help_text, label_names) in METRICS.items():
+            lines.append(f'# HELP {PREFIX}{name} {help_text}')
+            lines.append(f'# TYPE {PREFIX}{name} {kind}')
+            if kind == 'histogram':
+                for (series_name, labels), series in sorted(collected['histograms'].items()):
+                    if series_name != name:
+                        continue
+                    for bound, count in zip(LATENCY_BUCKETS + (math.inf,), series[:-2] + [series[-1]]):
+                        le = '+Inf' if bound == math.inf else repr(bound)
+                        lines.append(f'{PREFIX}{name}_bucket{_labels(label_names, labels, le=le)} {_number(count)}')
+                    lines.append(f'{PREFIX}{name}_sum{_labels(label_names, labels)} {_number(series[-2])}')
+                    lines.append(f'{PREFIX}{name}_count{_labels(label_names, labels)} {_number(series[-1])}')
+            else:
+                for (series_name, labels), value in sorted(collected['values'].items()):
+                    if series_name == name:
+                        lines.append(f'{PREFIX}{name}{_labels(label_names, labels)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(snapshot, values, histograms, gauges: bool):
+    """Add a snapshot's series into values/histograms; gauges only if the process is live"""
+    for name, labels, value in snapshot['values']:
+        if name not in METRICS or (METRICS[name][0] == 'gauge' and not gauges):
+            continue
+        key = (name, tuple(labels))
+        values[key] = values.get(key, 0.0) + value
+    for name, labels, series in snapshot['histograms']:
+        if name not in METRICS:
+            continue
+        key = (name, tuple(labels))
+        total = histograms.setdefault(key, [0] * len(series))
+        for i, value in enumerate(series):
+            total[i] += value
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, **extra) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra.items()]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+_registry = MetricsRegistry(Config.METRICS_DIR or None, Config.METRICS_FLUSH_SECONDS)
+
+
+def get_registry() -> MetricsRegistry:
+    return _registry
+
+
+def inc(name: str, value: float = 1.0, **labels):
+    """Add to a counter (or a gauge, with a negative value to decrease it)"""
+    if Config.METRICS_ENABLED:
+        _registry.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    """Record one histogram sample"""
+    if Config.METRICS_ENABLED:
+        _registry.observe(name, value, **labels)
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Observe the duration of the block in a histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def in_flight(kind: str):
+    """Count the block in the in_flight gauge"""
+    inc('in_flight', 1, kind=kind)
+    try:
+        yield
+    finally:
+        inc('in_flight', -1, kind=kind)
+
+
+def queued(pool: str, fn):
+    """Wrap fn for submission to a pool, recording how long it waited for a thread"""
+    submitted = time.perf_counter()
+
+    @wraps(fn)
+    def run(*args, **kwargs):
+        observe('queue_wait_seconds', time.perf_counter() - submitted, pool=pool)
+        return fn(*args, **kwargs)
+    return run
+
+
+def record_llm_call(agent: str, model: str, seconds: float, usage=None, error: Exception = None):
+    """Account one upstream call: outcome, latency and token usage"""
+    inc('llm_calls_total', agent=agent, model=model, outcome='error' if error is not None else 'ok')
+    observe('llm_call_seconds', seconds, agent=agent, model=model)
+    if usage is not None:
+        inc('llm_tokens_total', getattr(usage, 'prompt_tokens', 0) or 0, agent=agent, model=model, kind='prompt')
+        inc('llm_tokens_total', getattr(usage, 'completion_tokens', 0) or 0,
+            agent=agent, model=model, kind='completion')
+
+
+# Keep the last counts of a worker that exits between flushes
+atexit.register(_registry.flush)
+
+
+def _after_fork_in_child():
+    # The parent's counts are its own; the child starts empty with its own flush thread
+    _registry.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
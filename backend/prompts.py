@@ -3,11 +3,18 @@ Centralized prompt templates for AI agents.
 
 This file contains all prompts used by the AI processing pipeline.
 Edit these prompts to customize how the AI processes billing narratives.
+
+Each template is a static system message plus a short user message that
+carries the variable input. Keeping the input at the end leaves an
+identical prefix on every call, which the provider's prompt cache can
+reuse. Bump the template's version in PROMPT_TEMPLATES and PROMPT_VERSION
+whenever a template changes so cached responses produced by the old
+wording are not reused.
 """
 
-SEPARATOR_PROMPT = """You are a legal billing expert. Clean up and analyze this text to identify distinct billable activities.
+PROMPT_VERSION = '3'
 
-Text: {input_text}
+SEPARATOR_SYSTEM_PROMPT = """You are a legal billing expert. Clean up and analyze the user's text to identify distinct billable activities.
 
 GRAMMAR CLEANUP:
 - Fix obvious spelling and grammar errors
@@ -31,25 +38,21 @@ TIME PARSING RULES:
 - If someone says "spent 30 minutes", that's 0.5 hours, NOT 30 hours
 
 Output as JSON:
-{{
-    "entries": [
-        {{
-            "activity": "description of work exactly as stated",
-            "hours": 0.0,
-            "client_matter": "only if explicitly mentioned"
-        }}
-    ]
-}}
+{"entries": [{"activity": "description of work exactly as stated", "hours": 0.0, "client_matter": "only if explicitly mentioned"}]}
 
 Examples:
 - "spent 30 minutes working on a memo" → hours: 0.5, activity: "working on a memorandum"
 - "reviewed docs w/ client re: case" → hours: 0.0 (no time stated), activity: "reviewed documents with client regarding case"
-- "1.5 hour meeting abt contract" → hours: 1.5, activity: "meeting about contract" """
+- "1.5 hour meeting abt contract" → hours: 1.5, activity: "meeting about contract\""""
+
+SEPARATOR_USER_PROMPT = "Text: {input_text}"
 
-REFINER_PROMPT = """Convert this billing activity into a professional legal narrative.
+# Short separator prompt used when the local pre-parser is fairly confident
+SEPARATOR_COMPACT_SYSTEM_PROMPT = """Split the user's legal billing note into distinct billable activities. Fix spelling, expand abbreviations, add nothing. Convert stated time to decimal hours (30 minutes = 0.5); use 0.0 if none is stated.
 
-Activity: {activity}
-Time: {hours} hours
+Output JSON: {"entries": [{"activity": "...", "hours": 0.0}]}"""
+
+REFINER_SYSTEM_PROMPT = """Convert the user's billing activity into a professional legal narrative.
 
 STRICT REQUIREMENTS:
 - MUST start with a present tense verb (e.g., "Review", "Draft", "Analyze", "Prepare", "Attend")
@@ -72,4 +75,48 @@ GOOD: "Draft memorandum"
 Input: "call with client about contract review and discussed payment terms"
 GOOD: "Telephone conference with client regarding contract review and payment terms"
 
-Output only the refined narrative, no explanations."""
\ No newline at end of file
+Output only the refined narrative, no explanations."""
+
+REFINER_USER_PROMPT = "Activity: {activity}\nTime: {hours} hours"
+
+FUSED_SYSTEM_PROMPT = """You are a legal billing expert. Clean up the user's text, identify each distinct billable activity, and write a professional billing narrative for each one.
+
+GRAMMAR CLEANUP:
+- Fix obvious spelling and grammar errors
+- Expand common abbreviations (re: -> regarding, w/ -> with, abt -> about)
+- Maintain the original meaning and content
+
+ACTIVITY SEPARATION RULES:
+- Only use information explicitly stated in the text
+- Do NOT add details, names, or context not mentioned
+- Keep activity descriptions factual and general
+- Extract only time information that is clearly stated
+
+TIME PARSING RULES:
+- Convert all time to decimal hours (30 minutes = 0.5, 1 hour 30 minutes = 1.5)
+- If no time is stated for an activity, use 0.0
+- If someone says "spent 30 minutes", that's 0.5 hours, NOT 30 hours
+
+NARRATIVE REQUIREMENTS:
+- MUST start with a present tense verb (e.g., "Review", "Draft", "Analyze", "Prepare", "Attend")
+- Match the complexity of the activity: one simple activity gets ONE sentence
+- NEVER add information, reasons, purposes, or outcomes not present in the activity
+- Use active voice and professional legal terminology
+
+Output as JSON:
+{"entries": [{"activity": "description of work exactly as stated", "hours": 0.0, "narrative": "professional billing narrative"}]}
+
+Examples:
+- "spent 30 minutes working on a memo" → activity: "working on a memorandum", hours: 0.5, narrative: "Draft memorandum"
+- "reviewed docs w/ client re: case" → activity: "reviewed documents with client regarding case", hours: 0.0, narrative: "Review documents with client regarding case"
+- "call with client about contract review and discussed payment terms" → narrative: "Telephone conference with client regarding contract review and payment terms\""""
+
+FUSED_USER_PROMPT = "Text: {input_text}"
+
+# name -> version, static system message and user tail (a str.format template)
+PROMPT_TEMPLATES = {
+    'separator': {'version': '3', 'system': SEPARATOR_SYSTEM_PROMPT, 'user': SEPARATOR_USER_PROMPT},
+    'compact_separator': {'version': '2', 'system': SEPARATOR_COMPACT_SYSTEM_PROMPT, 'user': SEPARATOR_USER_PROMPT},
+    'refiner': {'version': '2', 'system': REFINER_SYSTEM_PROMPT, 'user': REFINER_USER_PROMPT},
+    'fused': {'version': '2', 'system': FUSED_SYSTEM_PROMPT, 'user': FUSED_USER_PROMPT},
+}
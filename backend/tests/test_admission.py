@@ -0,0 +1,217 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+from agents.deadline import DeadlineExceeded, check_deadline, deadline, remaining
+from agents.ratelimit import TokenBucket
+from api.routes import enhance as enhance_routes
+from api.routes import enhance_batch as batch_routes
+
+
+class InlineExecutor:
+    """Runs submitted work at once, so grant order is run order"""
+
+    def submit(self, fn):
+        fn()
+
+
+def make_controller(slots=1, bulk_slots=1, max_queue=4, per_client=2, max_bulk_queue=10, max_wait=5.0):
+    return AdmissionController(slots, bulk_slots, max_queue, per_client, max_bulk_queue, max_wait)
+
+
+def record(order):
+    def run(ticket, label):
+        order.append(label)
+        return label
+    return run
+
+
+def test_clients_take_turns_by_fair_queueing():
+    controller = make_controller()
+    order = []
+    held = controller.acquire('holder')
+    controller.submit_all('a', 'bulk', InlineExecutor(), record(order), [('a1',), ('a2',), ('a3',)])
+    controller.submit_all('b', 'bulk', InlineExecutor(), record(order), [('b1',), ('b2',)])
+    held.release()
+    assert order == ['a1', 'b1', 'a2', 'b2', 'a3']
+
+
+def test_weights_give_a_client_more_turns():
+    controller = AdmissionController(1, 1, 4, 2, 10, 5.0, weights={'a': 2})
+    order = []
+    held = controller.acquire('holder')
+    controller.submit_all('a', 'bulk', InlineExecutor(), record(order), [(f'a{i}',) for i in range(4)])
+    controller.submit_all('b', 'bulk', InlineExecutor(), record(order), [('b0',), ('b1',)])
+    held.release()
+    assert order == ['a0', 'b0', 'a1', 'a2', 'b1', 'a3']
+
+
+def test_interactive_work_is_served_before_queued_bulk_work():
+    controller = make_controller()
+    order = []
+    held = controller.acquire('holder')
+    controller.submit_all('a', 'bulk', InlineExecutor(), record(order), [('bulk',)])
+
+    def interactive():
+        with controller.acquire('b'):
+            order.append('interactive')
+
+    waiter = threading.Thread(target=interactive)
+    waiter.start()
+    while controller.stats()['queued']['interactive'] == 0:
+        time.sleep(0.01)
+    held.release()
+    waiter.join(1)
+    assert order == ['interactive', 'bulk']
+
+
+def test_a_clients_second_batch_queues_behind_its_first():
+    controller = make_controller(max_bulk_queue=10)
+    order = []
+    held = controller.acquire('holder')
+    controller.submit_all('a', 'bulk', InlineExecutor(), record(order), [('first',)] * 6)
+    futures = controller.submit_all('a', 'bulk', InlineExecutor(), record(order), [('second',)] * 4)
+    assert controller.stats()['queued']['bulk'] == 10
+
+    # Only the bound on all queued batch items rejects
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.submit_all('b', 'bulk', InlineExecutor(), record(order), [('third',)])
+    assert rejected.value.reason == 'queue_full'
+
+    held.release()
+    assert order == ['first'] * 6 + ['second'] * 4
+    assert [future.result() for future in futures] == ['second'] * 4
+
+
+def test_interactive_queue_is_bounded_per_client():
+    controller = make_controller(per_client=1, max_wait=1.0)
+    held = controller.acquire('holder')
+    waiter = threading.Thread(target=lambda: controller.acquire('a').release())
+    waiter.start()
+    while controller.stats()['queued']['interactive'] == 0:
+        time.sleep(0.01)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire('a')
+    assert rejected.value.reason == 'client_queue_full'
+    assert rejected.value.retry_after >= 1
+    held.release()
+    waiter.join(1)
+
+
+def test_wait_is_bounded_by_max_wait_then_by_the_deadline():
+    controller = make_controller(max_wait=0.1)
+    held = controller.acquire('holder')
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire('a')
+    assert rejected.value.reason == 'wait_timeout'
+
+    start = time.monotonic()
+    with deadline(0.05), pytest.raises(DeadlineExceeded):
+        controller.acquire('a')
+    assert time.monotonic() - start < 0.1
+    assert controller.stats()['queued']['interactive'] == 0
+    held.release()
+
+
+def test_async_acquire_waits_for_a_release():
+    controller = make_controller()
+
+    async def scenario():
+        held = await controller.acquire_async('holder')
+        waiter = asyncio.ensure_future(controller.acquire_async('a'))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        held.release()
+        ticket = await asyncio.wait_for(waiter, 1)
+        assert ticket.wait >= 0.05
+        ticket.release()
+
+    asyncio.run(scenario())
+    assert controller.stats()['running'] == {'interactive': 0, 'bulk': 0}
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+def test_rejected_request_is_503_with_retry_after(client, monkeypatch):
+    controller = make_controller(max_queue=0)
+    monkeypatch.setattr(enhance_routes, 'get_admission_controller', lambda: controller)
+    monkeypatch.setattr(enhance_routes, 'get_pipeline', lambda: SlowPipeline(0))
+    held = controller.acquire('holder')
+    response = client.post('/api/enhance', json={'text': 'Drafted motion'})
+    held.release()
+
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+    assert controller.stats()['rejected'] == 1
+
+
+class SlowPipeline:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.remaining = []
+
+    def process(self, text, mode=None, use_cache=True):
+        self.remaining.append(remaining())
+        time.sleep(self.seconds)
+        return {'cleaned': text, 'narratives': [], 'total_hours': 0.0}
+
+
+class DeadlinePipeline(SlowPipeline):
+    def process(self, text, mode=None, use_cache=True):
+        time.sleep(self.seconds)
+        check_deadline()
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    """Batch route with its own controller, an unpaced bucket and a stub pipeline"""
+    controller = make_controller(slots=4, bulk_slots=4, max_bulk_queue=100)
+    monkeypatch.setattr(batch_routes, 'get_admission_controller', lambda: controller)
+    monkeypatch.setattr(batch_routes, '_rate_limiter', TokenBucket(0))
+
+    def use(pipeline):
+        monkeypatch.setattr(batch_routes, 'get_pipeline', lambda: pipeline)
+        return pipeline
+    return use
+
+
+def test_each_batch_item_gets_the_request_deadline_when_it_starts(client, batch, monkeypatch):
+    monkeypatch.setattr(batch_routes, 'get_batch_executor', lambda: ThreadPoolExecutor(max_workers=1))
+    pipeline = batch(SlowPipeline(0.25))
+
+    response = client.post('/api/enhance/batch', json={'texts': ['one', 'two', 'three']},
+                           headers={'X-Request-Timeout': '0.4'})
+
+    assert [outcome['status'] for outcome in response.get_json()['results']] == ['ok', 'ok', 'ok']
+    # The third item started ~0.5 s in, after the first two, and still had its whole budget
+    assert all(left is not None and 0.3 < left <= 0.4 for left in pipeline.remaining)
+
+
+def test_batch_longer_than_rate_times_deadline_succeeds(client, batch, monkeypatch):
+    pipeline = batch(SlowPipeline(0))
+    monkeypatch.setattr(batch_routes, '_rate_limiter', TokenBucket(20))
+
+    start = time.monotonic()
+    response = client.post('/api/enhance/batch', json={'texts': [f'item {i}' for i in range(40)]},
+                           headers={'X-Request-Timeout': '0.5'})
+    body = response.get_json()
+
+    assert time.monotonic() - start > 0.5
+    assert body['succeeded'] == 40 and body['failed'] == 0
+
+
+def test_batch_item_past_its_deadline_reports_an_error(client, batch):
+    batch(DeadlinePipeline(0.3))
+    response = client.post('/api/enhance/batch', json={'texts': ['slow']},
+                           headers={'X-Request-Timeout': '0.1'})
+    outcome = response.get_json()['results'][0]
+    assert outcome['status'] == 'error' and 'deadline' in outcome['error']
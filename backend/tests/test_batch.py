@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from admission import AdmissionController
+from agents.ratelimit import TokenBucket
+from api.routes import enhance_batch as batch_routes
+from config import Config
+
+
+class StubPipeline:
+    """Echoes each text as one narrative; texts containing 'boom' fail"""
+
+    def __init__(self):
+        self.modes = {}
+
+    def process(self, text, mode=None, use_cache=True):
+        self.modes[text] = mode
+        if 'boom' in text:
+            raise RuntimeError('upstream unavailable')
+        narrative = {'text': text.upper(), 'hours': 1.0, 'original': text}
+        return {'cleaned': text, 'narratives': [narrative], 'total_hours': 1.0}
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    controller = AdmissionController(4, 4, 4, 2, 100, 5.0)
+    pipeline = StubPipeline()
+    monkeypatch.setattr(batch_routes, 'get_admission_controller', lambda: controller)
+    monkeypatch.setattr(batch_routes, '_rate_limiter', TokenBucket(0))
+    monkeypatch.setattr(batch_routes, 'get_pipeline', lambda: pipeline)
+    return pipeline
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+def test_each_item_reports_its_own_outcome(client, pipeline):
+    response = client.post('/api/enhance/batch', json={'items': [
+        {'id': 'rec-1', 'text': 'Drafted motion'},
+        {'id': 'rec-2', 'text': '   '},
+        {'id': 'rec-3', 'text': 'boom'},
+        {'id': 'rec-4', 'text': 42},
+        {'id': 'rec-5', 'text': 'Called client', 'mode': 'bogus'},
+        {'id': 'rec-6', 'text': 'Reviewed lease'},
+    ]})
+    assert response.status_code == 200
+    body = response.get_json()
+
+    assert [(outcome['index'], outcome['id'], outcome['status']) for outcome in body['results']] == [
+        (0, 'rec-1', 'ok'), (1, 'rec-2', 'error'), (2, 'rec-3', 'error'),
+        (3, 'rec-4', 'error'), (4, 'rec-5', 'error'), (5, 'rec-6', 'ok'),
+    ]
+    errors = [outcome.get('error') for outcome in body['results']]
+    assert errors[1] == 'Empty text provided'
+    assert errors[2] == 'Enhancement failed: upstream unavailable'
+    assert errors[3] == 'No text provided'
+    assert errors[4] == "Unsupported mode 'bogus'"
+    assert body['results'][0]['result']['narratives'][0]['text'] == 'DRAFTED MOTION'
+    assert all('queueWaitMs' in outcome for outcome in body['results'])
+    assert (body['succeeded'], body['failed']) == (2, 4)
+
+
+def test_texts_share_the_batch_mode_unless_an_item_sets_its_own(client, pipeline):
+    client.post('/api/enhance/batch', json={'mode': 'fused', 'items': [
+        {'text': 'Drafted motion'}, {'text': 'Called client', 'mode': 'two_stage'}]})
+    assert pipeline.modes == {'Drafted motion': 'fused', 'Called client': 'two_stage'}
+
+
+@pytest.mark.parametrize('body', [{}, {'items': []}, {'texts': 'Drafted motion'}, {'other': 1}])
+def test_a_batch_without_items_is_rejected(client, pipeline, body):
+    response = client.post('/api/enhance/batch', json=body)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'No items provided'}
+
+
+def test_a_batch_over_the_item_limit_is_rejected(client, pipeline, monkeypatch):
+    monkeypatch.setattr(Config, 'BATCH_MAX_ITEMS', 2)
+    response = client.post('/api/enhance/batch', json={'texts': ['a', 'b', 'c']})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Too many items: 3 (limit 2)'}
+
+
+def test_ndjson_streams_one_line_per_item_then_a_summary(client, pipeline):
+    response = client.post('/api/enhance/batch?stream=1', json={'texts': ['Drafted motion', 'boom']})
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert sorted((line['index'], line['status']) for line in lines[:-1]) == [(0, 'ok'), (1, 'error')]
+    assert lines[-1] == {'done': True, 'succeeded': 1, 'failed': 1}
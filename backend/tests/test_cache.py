@@ -0,0 +1,130 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from agents import cache
+from agents.cache import MemoryCache, SQLiteCache, make_cache_key
+from agents.fused import FusedAgent
+from agents.refiner import RefinerAgent
+from config import Config
+
+PARAMS = {
+    'model': 'gpt-4.1',
+    'messages': [{'role': 'system', 'content': 'Rules'}, {'role': 'user', 'content': 'Drafted motion'}],
+    'temperature': 0.3,
+}
+
+
+def test_key_depends_only_on_what_shapes_the_response(monkeypatch):
+    key = make_cache_key(PARAMS)
+    assert make_cache_key(dict(reversed(list(PARAMS.items())))) == key
+    assert make_cache_key(dict(PARAMS, timeout=5, stream=False)) == key
+
+    for changed in ({'model': 'gpt-4.1-mini'}, {'temperature': 0.0}, {'response_format': {'type': 'json_object'}},
+                    {'messages': PARAMS['messages'][:1] + [{'role': 'user', 'content': 'Drafted brief'}]}):
+        assert make_cache_key(dict(PARAMS, **changed)) != key, changed
+
+    monkeypatch.setattr(cache, 'PROMPT_VERSION', 'next')
+    assert make_cache_key(PARAMS) != key
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_cache(request, tmp_path):
+    def make(max_entries, ttl):
+        if request.param == 'sqlite':
+            return SQLiteCache(str(tmp_path / 'cache.sqlite3'), max_entries, ttl)
+        return MemoryCache(max_entries, ttl)
+    return make
+
+
+def evict(response_cache):
+    # The SQLite cache enforces its bounds every PURGE_INTERVAL writes
+    if isinstance(response_cache, SQLiteCache):
+        response_cache.purge()
+
+
+def test_least_recently_used_entry_is_evicted(make_cache, monkeypatch):
+    response_cache = make_cache(max_entries=2, ttl=0)
+    clock = iter(range(1000))
+    monkeypatch.setattr(time, 'time', lambda: float(next(clock)))
+    response_cache.set('a', 'A')
+    response_cache.set('b', 'B')
+    assert response_cache.get('a') == 'A'
+    response_cache.set('c', 'C')
+    evict(response_cache)
+
+    assert response_cache.get('b') is None
+    assert response_cache.get('a') == 'A' and response_cache.get('c') == 'C'
+    assert response_cache.size() == 2
+    assert response_cache.evictions == 1
+
+
+def test_entries_expire_after_the_ttl(make_cache, monkeypatch):
+    response_cache = make_cache(max_entries=10, ttl=60)
+    response_cache.set('a', 'A')
+    assert response_cache.get('a') == 'A'
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert response_cache.get('a') is None
+    assert response_cache.evictions == 1
+
+
+def test_stats_count_hits_and_misses():
+    response_cache = MemoryCache(10, 0)
+    response_cache.set('a', 'A')
+    response_cache.get('a')
+    response_cache.get('a')
+    response_cache.get('b')
+    assert response_cache.stats() == {'backend': 'memory', 'hits': 2, 'misses': 1, 'evictions': 0,
+                                      'hit_rate': 0.6667, 'size': 1}
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    SQLiteCache(path, 10, 0).set('a', 'A')
+    assert SQLiteCache(path, 10, 0).get('a') == 'A'
+
+
+@pytest.fixture
+def agent_cache(monkeypatch):
+    monkeypatch.setenv('AZURE_OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('AZURE_OPENAI_ENDPOINT', 'http://localhost')
+    monkeypatch.setattr(Config, 'AGENT_CACHE_BACKEND', 'memory')
+    response_cache = MemoryCache(10, 0)
+    monkeypatch.setattr(cache, '_cache', response_cache)
+    return response_cache
+
+
+def reply(agent, content):
+    calls = []
+
+    def call_model(params):
+        calls.append(params)
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    agent.call_model = call_model
+    return calls
+
+
+def test_repeated_input_is_served_from_the_cache(agent_cache):
+    agent = RefinerAgent(model='gpt')
+    calls = reply(agent, 'Draft motion to compel.')
+    entry = {'activity': 'Drafted motion', 'hours': 2.0}
+
+    assert agent.process(entry) == agent.process(entry) == {'refined_narrative': 'Draft motion to compel.'}
+    assert len(calls) == 1
+    assert agent_cache.hits == 1
+
+    agent.process(entry, use_cache=False)
+    assert len(calls) == 2
+
+
+def test_invalid_responses_are_not_cached(agent_cache):
+    agent = FusedAgent(model='gpt')
+    calls = reply(agent, 'not json')
+
+    assert not agent.process('Drafted motion')['valid']
+    assert not agent.process('Drafted motion')['valid']
+    assert len(calls) == 2
+    assert agent_cache.size() == 0
@@ -0,0 +1,67 @@
+from agents.chunking import chunk_text, merge_chunk_entries, sentence_units, word_count
+
+
+def test_short_text_is_one_chunk():
+    assert chunk_text('Drafted the motion for 2 hours.', max_words=50) == ['Drafted the motion for 2 hours.']
+
+
+def test_chunks_respect_the_size_and_repeat_the_overlap():
+    sentences = [f'Reviewed exhibit {n} with the client for one hour.' for n in range(1, 9)]
+    chunks = chunk_text(' '.join(sentences), max_words=20, overlap=1)
+    assert len(chunks) > 1
+    assert all(word_count(chunk) <= 20 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        # The last sentence of a chunk opens the next one
+        assert chunk.startswith(previous.split('. ')[-1].rstrip('.'))
+
+
+def test_continuations_stay_with_their_sentence():
+    text = 'Drafted the motion to compel. It took two hours. Called the client about scheduling for 0.2.'
+    assert sentence_units(text)[0] == ['Drafted the motion to compel.', 'It took two hours.']
+    chunks = chunk_text(text, max_words=8, overlap=0)
+    assert chunks[0] == 'Drafted the motion to compel. It took two hours.'
+
+
+def test_seam_duplicate_is_merged():
+    chunks = ['Drafted the brief for 2 hours. Called opposing counsel for 0.5 hours.',
+              'Called opposing counsel for 0.5 hours. Reviewed the exhibits for 1 hour.']
+    entries = [
+        [{'activity': 'drafted the brief', 'hours': 2.0},
+         {'activity': 'called opposing counsel', 'hours': 0.5}],
+        [{'activity': 'called opposing counsel', 'hours': 0.5},
+         {'activity': 'reviewed the exhibits', 'hours': 1.0}],
+    ]
+    merged = merge_chunk_entries(chunks, entries)
+    assert [entry['hours'] for entry in merged] == [2.0, 0.5, 1.0]
+
+
+def test_seam_merge_keeps_the_copy_that_recorded_the_time():
+    chunks = ['Drafted the brief for 2 hours. Reviewed the deposition transcript.',
+              'Reviewed the deposition transcript. That took 1.5 hours.']
+    entries = [
+        [{'activity': 'drafted the brief', 'hours': 2.0},
+         {'activity': 'reviewed the deposition transcript', 'hours': 0.0}],
+        [{'activity': 'reviewed the deposition transcript', 'hours': 1.5}],
+    ]
+    merged = merge_chunk_entries(chunks, entries)
+    assert merged == [{'activity': 'drafted the brief', 'hours': 2.0},
+                      {'activity': 'reviewed the deposition transcript', 'hours': 1.5}]
+
+
+def test_similar_work_outside_the_overlap_is_kept():
+    chunks = ['Called opposing counsel for 0.5 hours.', 'Drafted the reply. Called opposing counsel for 0.5 hours.']
+    entries = [
+        [{'activity': 'called opposing counsel', 'hours': 0.5}],
+        [{'activity': 'drafted the reply', 'hours': 0.0},
+         {'activity': 'called opposing counsel', 'hours': 0.5}],
+    ]
+    assert len(merge_chunk_entries(chunks, entries)) == 3
+
+
+def test_different_numbers_are_different_work():
+    chunks = ['Reviewed exhibit 9 for 1 hour.', 'Reviewed exhibit 9 for 1 hour. Reviewed exhibit 10 for 1 hour.']
+    entries = [
+        [{'activity': 'reviewed exhibit 9', 'hours': 1.0}],
+        [{'activity': 'reviewed exhibit 10', 'hours': 1.0}],
+    ]
+    assert len(merge_chunk_entries(chunks, entries)) == 2
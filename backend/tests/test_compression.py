@@ -0,0 +1,122 @@
+import datetime
+import gzip
+import json
+import zlib
+
+import pytest
+
+from api import compression
+from api import json_provider
+from api.compression import compress_stream, negotiate
+from api.routes import enhance as enhance_routes
+from config import Config
+
+
+@pytest.mark.parametrize('accept_encoding, encoding', [
+    ('gzip', 'gzip'),
+    ('gzip, br', 'br'),
+    ('gzip;q=1.0, br;q=0.5', 'gzip'),
+    ('*', 'br'),
+    ('br;q=0, gzip;q=0', None),
+    ('identity', None),
+    ('', None),
+])
+def test_encoding_follows_client_quality_then_server_order(accept_encoding, encoding):
+    assert negotiate(accept_encoding) == encoding
+
+
+def test_brotli_is_skipped_when_it_is_unavailable(monkeypatch):
+    monkeypatch.setattr(compression, 'ENCODERS', {'gzip': compression.GzipEncoder})
+    assert negotiate('br, gzip') == 'gzip'
+    assert negotiate('br') is None
+
+
+def test_nothing_is_negotiated_when_compression_is_off(monkeypatch):
+    monkeypatch.setattr(Config, 'COMPRESSION_ENABLED', False)
+    assert negotiate('gzip, br') is None
+
+
+def test_streams_are_flushed_chunk_by_chunk_and_closed():
+    closed = []
+
+    def lines():
+        try:
+            yield '{"index": 0}\n'
+            yield b''
+            yield b'{"index": 1}\n'
+        finally:
+            closed.append(True)
+
+    decoder = zlib.decompressobj(31)
+    chunks = compress_stream(lines(), 'gzip')
+    # Each line can be decoded as soon as it arrives
+    assert decoder.decompress(next(chunks)) == b'{"index": 0}\n'
+    assert decoder.decompress(next(chunks)) == b'{"index": 1}\n'
+    decoder.decompress(b''.join(chunks))
+    assert decoder.eof and closed == [True]
+
+
+class StubPipeline:
+    def process(self, text, mode=None, use_cache=True):
+        narratives = [{'text': f'Narrative {i} for {text}', 'hours': 0.5, 'original': text} for i in range(40)]
+        return {'cleaned': text, 'narratives': narratives, 'total_hours': 20.0}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from app import app
+    monkeypatch.setattr(enhance_routes, 'get_pipeline', lambda: StubPipeline())
+    return app.test_client()
+
+
+def enhance(client, accept_encoding, **body):
+    return client.post('/api/enhance', json=dict(text='Drafted motion', **body),
+                       headers={'Accept-Encoding': accept_encoding})
+
+
+def test_json_responses_are_compressed_as_negotiated(client):
+    brotli = pytest.importorskip('brotli')
+    plain = enhance(client, 'identity')
+    assert 'Content-Encoding' not in plain.headers
+    expected = json.loads(plain.get_data())
+    expected.pop('groupId')
+
+    for accept_encoding, decode in (('gzip', gzip.decompress), ('br, gzip', brotli.decompress)):
+        response = enhance(client, accept_encoding)
+        assert response.headers['Content-Encoding'] == accept_encoding.split(',')[0]
+        assert 'Accept-Encoding' in response.headers['Vary']
+        body = json.loads(decode(response.get_data()))
+        body.pop('groupId')
+        assert body == expected
+
+
+def test_small_bodies_are_sent_as_they_are(client, monkeypatch):
+    monkeypatch.setattr(Config, 'COMPRESSION_MIN_BYTES', 1 << 20)
+    response = enhance(client, 'gzip')
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_streamed_csv_exports_are_compressed(client):
+    narratives = [{'narrative': f'Entry {i}', 'hours': 1, 'createdAt': '2026-03-04T09:05:00Z'} for i in range(500)]
+    plain = client.post('/api/export/narratives', json={'narratives': narratives})
+    response = client.post('/api/export/narratives', json={'narratives': narratives},
+                           headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+
+
+def test_compact_responses_leave_out_the_echoed_text(client):
+    full = enhance(client, 'identity').get_json()
+    compact = enhance(client, 'identity', compact=True).get_json()
+    assert full['originalText'] == full['cleanedText'] == 'Drafted motion'
+    assert 'originalText' not in compact and 'cleanedText' not in compact
+    assert compact['narratives'] == full['narratives']
+
+
+def test_streamed_json_matches_the_flask_encoding():
+    value = {'b': [1, 2.5, None], 'a': 'é', 'when': datetime.datetime(2026, 3, 4, 9, 5)}
+    assert json.loads(json_provider.dumps(value)) == {'b': [1, 2.5, None], 'a': 'é',
+                                                       'when': 'Wed, 04 Mar 2026 09:05:00 GMT'}
+    assert ': ' not in json_provider.dumps(value)
@@ -0,0 +1,71 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agents.deadline import (call_timeout, check_deadline, current_deadline, deadline, deadline_at,
+                             DeadlineExceeded, remaining)
+
+
+def test_no_deadline_by_default():
+    assert remaining() is None
+    assert call_timeout(7) == 7
+    check_deadline()
+
+
+def test_deadline_expires():
+    with deadline(0.05):
+        assert 0 < remaining() <= 0.05
+        time.sleep(0.06)
+        with pytest.raises(DeadlineExceeded):
+            check_deadline()
+    assert remaining() is None
+
+
+def test_nested_deadline_only_shortens():
+    with deadline(0.5):
+        with deadline(10):
+            assert remaining() <= 0.5
+        with deadline(0.1):
+            assert remaining() <= 0.1
+        assert remaining() > 0.1
+
+
+def test_falsy_seconds_keep_the_current_deadline():
+    with deadline(0):
+        assert remaining() is None
+    with deadline(1):
+        with deadline(0):
+            assert remaining() <= 1
+
+
+def test_deadline_at_reenters_an_earlier_deadline():
+    with deadline(0.5):
+        expires = current_deadline()
+    time.sleep(0.1)
+    with deadline_at(expires):
+        assert remaining() <= 0.4
+    with deadline_at(None):
+        assert remaining() is None
+
+
+def test_call_timeout_is_capped_by_the_deadline():
+    with deadline(2):
+        assert call_timeout(60) <= 2
+        assert call_timeout(1) == 1
+
+
+def test_threads_see_the_deadline_through_copy_context():
+    with deadline(5), ThreadPoolExecutor(1) as executor:
+        assert executor.submit(remaining).result() is None
+        assert executor.submit(contextvars.copy_context().run, remaining).result() <= 5
+
+
+def test_tasks_inherit_the_deadline():
+    async def main():
+        with deadline(5):
+            return await asyncio.ensure_future(asyncio.sleep(0, result=remaining()))
+
+    assert 0 < asyncio.run(main()) <= 5
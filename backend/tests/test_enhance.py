@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+import admission
+from agents.circuit import CircuitOpenError
+from agents.deadline import check_deadline, remaining
+from api.routes import enhance as enhance_routes
+
+
+class StubPipeline:
+    """Records the deadline left when the pipeline starts work"""
+
+    def __init__(self):
+        self.remaining = None
+
+    def iter_run(self, text, mode=None, use_cache=True):
+        self.remaining = remaining()
+        yield 'separated', {'entries': [{'activity': text, 'hours': 1.0}]}
+        narrative = {'text': text, 'hours': 1.0, 'original': text}
+        yield 'narrative', {'index': 0, 'narrative': narrative}
+        yield 'result', {'cleaned': text, 'narratives': [narrative], 'total_hours': 1.0}
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    controller = admission.AdmissionController(1, 1, 4, 2, 10, 5.0)
+    monkeypatch.setattr(enhance_routes, 'get_admission_controller', lambda: controller)
+    return controller
+
+
+def test_stream_deadline_includes_queue_wait(client, controller, monkeypatch):
+    pipeline = StubPipeline()
+    monkeypatch.setattr(enhance_routes, 'get_pipeline', lambda: pipeline)
+    held = controller.acquire('someone-else')
+
+    threading.Timer(0.3, held.release).start()
+    response = client.post('/api/enhance/stream', json={'text': 'Drafted motion'},
+                           headers={'X-Request-Timeout': '2'})
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert 'event: done' in body
+    assert int(response.headers['X-Queue-Wait-Ms']) >= 250
+    # The 2 s budget started before queueing, so about 1.7 s were left
+    assert pipeline.remaining is not None and pipeline.remaining < 1.8
+
+
+def test_stream_times_out_while_queued(client, controller, monkeypatch):
+    monkeypatch.setattr(enhance_routes, 'get_pipeline', lambda: StubPipeline())
+    held = controller.acquire('someone-else')
+    start = time.monotonic()
+    response = client.post('/api/enhance/stream', json={'text': 'Drafted motion'},
+                           headers={'X-Request-Timeout': '0.2'})
+    held.release()
+
+    assert response.status_code == 504
+    assert time.monotonic() - start < 1
+
+
+class FailingPipeline:
+    def __init__(self, error=None, seconds=0.0):
+        self.error = error
+        self.seconds = seconds
+
+    def process(self, text, mode=None, use_cache=True):
+        time.sleep(self.seconds)
+        check_deadline()
+        raise self.error
+
+
+def test_deadline_expiry_is_504(client, monkeypatch):
+    monkeypatch.setattr(enhance_routes, 'get_pipeline', lambda: FailingPipeline(seconds=0.2))
+    response = client.post('/api/enhance', json={'text': 'Drafted motion'}, headers={'X-Request-Timeout': '0.1'})
+    assert response.status_code == 504
+
+
+def test_open_circuit_is_503_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(enhance_routes, 'get_pipeline', lambda: FailingPipeline(CircuitOpenError(12.2)))
+    response = client.post('/api/enhance', json={'text': 'Drafted motion'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '13'
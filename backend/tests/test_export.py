@@ -0,0 +1,171 @@
+import csv
+import gzip
+import io
+import json
+import zipfile
+from xml.etree import ElementTree
+from datetime import datetime
+
+import pytest
+
+import exporters
+from config import Config
+from exporters import EXPORT_WRITERS, XlsxWriter
+
+
+def legacy_csv(narratives):
+    """The CSV the in-memory exporter produced before exports were streamed"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Activity for: '])
+    writer.writerow([])
+    writer.writerow(['Activity Type', 'Narrative', 'Client ID', 'Client Name', 'Matter ID', 'Matter Name',
+                     'Duration', 'Time', 'Comments', 'Notes'])
+    for narrative in narratives:
+        date_obj = datetime.fromisoformat(narrative['createdAt'].replace('Z', '+00:00'))
+        time_str = f'"{date_obj.strftime("%-m/%-d/%y %-I:%M %p")}"'
+        writer.writerow(['', narrative.get('narrative', ''), narrative.get('clientCode', ''), '',
+                         narrative.get('matterNumber', ''), '', f"{int(float(narrative.get('hours', 0.0)) * 60)} min",
+                         time_str, '', ''])
+    return output.getvalue().encode('utf-8')
+
+
+def make_narratives(count):
+    texts = ['Draft motion to compel.', 'Call with client re: "settlement", terms', 'Review lease\nand amendments',
+             'Préparer la déposition', '']
+    stamps = ['2026-03-04T09:05:00Z', '2026-12-31T23:59:00+00:00', '2026-07-01T12:00:00', '2026-01-09T00:30:00Z']
+    return [{
+        'narrative': texts[i % len(texts)],
+        'clientCode': f'C{i % 7:03d}',
+        'matterNumber': f'M-{i}',
+        'hours': ['0.1', 1.25, 2, 0.05][i % 4],
+        'createdAt': stamps[i % len(stamps)],
+    } for i in range(count)]
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+def to_ndjson(narratives):
+    return ''.join(json.dumps(narrative) + '\n' for narrative in narratives)
+
+
+def test_json_export_matches_the_in_memory_csv(client):
+    narratives = make_narratives(50)
+    response = client.post('/api/export/narratives', json={'narratives': narratives})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'].endswith('.csv')
+    assert response.get_data() == legacy_csv(narratives)
+
+
+def test_ndjson_export_spooled_to_disk_matches_the_in_memory_csv(client, monkeypatch):
+    monkeypatch.setattr(Config, 'EXPORT_SPOOL_BYTES', 1024)
+    narratives = make_narratives(2000)
+    response = client.post('/api/export/narratives', data=to_ndjson(narratives) + '\n\n',
+                           content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert response.get_data() == legacy_csv(narratives)
+
+
+@pytest.mark.parametrize('body, error', [
+    ('{"narrative": "ok"}\nnot json\n', 'Invalid JSON on line 2'),
+    ('["not", "an", "object"]\n', 'Line 1 is not a narrative object'),
+    ('\n\n', 'No narratives provided'),
+])
+def test_bad_ndjson_is_rejected_before_streaming(client, body, error):
+    response = client.post('/api/export/narratives', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert error in response.get_json()['error']
+
+
+def test_ndjson_uploads_are_capped_by_their_own_limit(client, monkeypatch):
+    monkeypatch.setattr(Config, 'EXPORT_MAX_CONTENT_LENGTH', 100)
+    response = client.post('/api/export/narratives', data=to_ndjson(make_narratives(10)),
+                           content_type='application/x-ndjson')
+    assert response.status_code == 413
+
+
+def export(client, narratives, export_format):
+    response = client.post('/api/export/narratives', json={'narratives': narratives, 'format': export_format})
+    assert response.status_code == 200
+    assert response.mimetype == EXPORT_WRITERS[export_format].mimetype
+    assert response.headers['Content-Disposition'].endswith('.' + EXPORT_WRITERS[export_format].extension)
+    return response.get_data()
+
+
+def test_compressed_csv_formats_hold_the_same_csv(client):
+    narratives = make_narratives(20)
+    body = export(client, narratives, 'csv.gz')
+    assert gzip.decompress(body) == legacy_csv(narratives)
+    assert export(client, narratives, 'csv.gz') == body
+
+    with zipfile.ZipFile(io.BytesIO(export(client, narratives, 'zip'))) as archive:
+        assert archive.namelist() == ['time_entries.csv']
+        assert archive.read('time_entries.csv') == legacy_csv(narratives)
+
+
+def sheet_rows(body):
+    """Cell text of each row of the first worksheet, '' for empty cells"""
+    namespace = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        assert '[Content_Types].xml' in archive.namelist()
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+    return [[''.join(cell.itertext()) for cell in row.findall('s:c', namespace)]
+            for row in sheet.iterfind('.//s:row', namespace)]
+
+
+def test_xlsx_rows_match_the_csv_rows(client):
+    narratives = make_narratives(20)
+    csv_rows = list(csv.reader(io.StringIO(legacy_csv(narratives).decode('utf-8'))))
+    assert sheet_rows(export(client, narratives, 'xlsx')) == csv_rows
+
+
+def test_xlsx_drops_characters_xml_cannot_hold():
+    assert XlsxWriter.row_xml(4, ['a\x00b\x0bc <&>']) == (
+        '<row r="4"><c t="inlineStr"><is><t xml:space="preserve">abc &lt;&amp;&gt;</t></is></c></row>')
+
+
+def test_ndjson_has_one_compact_object_per_entry(client):
+    narratives = make_narratives(4)
+    lines = export(client, narratives, 'ndjson').decode('utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {'narrative': 'Draft motion to compel.', 'clientId': 'C000', 'matterId': 'M-0', 'minutes': 6,
+         'time': '3/4/26 9:05 AM'},
+        {'narrative': 'Call with client re: "settlement", terms', 'clientId': 'C001', 'matterId': 'M-1',
+         'minutes': 75, 'time': '12/31/26 11:59 PM'},
+        {'narrative': 'Review lease\nand amendments', 'clientId': 'C002', 'matterId': 'M-2', 'minutes': 120,
+         'time': '7/1/26 12:00 PM'},
+        {'narrative': 'Préparer la déposition', 'clientId': 'C003', 'matterId': 'M-3', 'minutes': 3,
+         'time': '1/9/26 12:30 AM'},
+    ]
+    assert ', ' not in lines[0] and 'é' in lines[3]
+
+
+def test_ndjson_uploads_pick_the_format_from_the_query(client):
+    narratives = make_narratives(5)
+    response = client.post('/api/export/narratives?format=xlsx', data=to_ndjson(narratives),
+                           content_type='application/x-ndjson')
+    assert response.mimetype == EXPORT_WRITERS['xlsx'].mimetype
+    assert len(sheet_rows(response.get_data())) == 3 + 5
+
+
+def test_unknown_formats_list_the_supported_ones(client):
+    response = client.post('/api/export/narratives', json={'narratives': make_narratives(1), 'format': 'pdf'})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == f"Unsupported format 'pdf' (supported: {', '.join(EXPORT_WRITERS)})"
+
+
+def test_parquet_is_offered_only_with_pyarrow():
+    assert ('parquet' in exporters.EXPORT_WRITERS) == (exporters.importlib.util.find_spec('pyarrow') is not None)
+
+
+def test_parquet_round_trip(client):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    narratives = make_narratives(3)
+    table = parquet.read_table(io.BytesIO(export(client, narratives, 'parquet')))
+    assert table.column('minutes').to_pylist() == [6, 75, 120]
+    assert table.column('time').to_pylist() == ['3/4/26 9:05 AM', '12/31/26 11:59 PM', '7/1/26 12:00 PM']
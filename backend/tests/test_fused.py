@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from agents.fused import FUSED_SCHEMA, FusedAgent
+from agents.pipeline import AgentPipeline
+
+ENTRIES = [
+    {'activity': 'Drafted motion to compel', 'hours': 2, 'narrative': ' Draft motion to compel discovery. '},
+    {'activity': 'Called client', 'hours': 0.5, 'narrative': 'Telephone conference with client.'},
+]
+
+
+@pytest.fixture(autouse=True)
+def azure_settings(monkeypatch):
+    monkeypatch.setenv('AZURE_OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('AZURE_OPENAI_ENDPOINT', 'http://localhost')
+
+
+def test_valid_output_is_parsed_and_trimmed():
+    result = FusedAgent().parse_response('```json\n' + json.dumps({'entries': ENTRIES}) + '\n```')
+    assert result['valid'] is True
+    assert [entry['narrative'] for entry in result['entries']] == ['Draft motion to compel discovery.',
+                                                                   'Telephone conference with client.']
+
+
+@pytest.mark.parametrize('response', [
+    'not json',
+    json.dumps(['not', 'an', 'object']),
+    json.dumps({'items': ENTRIES}),
+    json.dumps({'entries': ['Drafted motion']}),
+    json.dumps({'entries': [dict(ENTRIES[0], activity=' ')]}),
+    json.dumps({'entries': [dict(ENTRIES[0], narrative='')]}),
+    json.dumps({'entries': [dict(ENTRIES[0], hours='2')]}),
+    json.dumps({'entries': [dict(ENTRIES[0], hours=True)]}),
+], ids=['not-json', 'not-object', 'no-entries', 'entry-not-object', 'blank-activity', 'blank-narrative',
+        'string-hours', 'bool-hours'])
+def test_malformed_output_is_invalid(response):
+    agent = FusedAgent()
+    result = agent.parse_response(response)
+    assert result == {'entries': [], 'valid': False}
+    assert not agent.is_valid(result)
+
+
+def test_requests_the_strict_schema():
+    params = FusedAgent(model='gpt').build_params('Drafted motion for 2 hours')
+    assert params['response_format'] == {'type': 'json_schema', 'json_schema': FUSED_SCHEMA}
+    entry = FUSED_SCHEMA['schema']['properties']['entries']['items']
+    assert set(entry['required']) == {'activity', 'hours', 'narrative'}
+
+
+class StubFused:
+    def __init__(self, result):
+        self.result = result
+
+    def process(self, text, use_cache=True):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class StubRefiner:
+    def process(self, entry, use_cache=True):
+        return {'refined_narrative': f"Refined {entry['activity']}"}
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = AgentPipeline(max_workers=1)
+    pipeline.refiner_agent = StubRefiner()
+    pipeline.separations = []
+
+    def separate(text, use_cache=True):
+        pipeline.separations.append(text)
+        return {'entries': [{'activity': 'Drafted motion', 'hours': 2.0}]}, {}
+    pipeline.separate_speculatively = separate
+    yield pipeline
+    pipeline.shutdown()
+
+
+def test_valid_fused_output_skips_the_two_stage_path(pipeline):
+    pipeline.fused_agent = StubFused(FusedAgent().parse_response(json.dumps({'entries': ENTRIES})))
+    result = pipeline.run('Drafted motion to compel, called client', 'fused')
+    assert pipeline.separations == []
+    assert [(n['original'], n['hours'], n['text']) for n in result['narratives']] == [
+        ('Drafted motion to compel', 2.0, 'Draft motion to compel discovery.'),
+        ('Called client', 0.5, 'Telephone conference with client.'),
+    ]
+    assert result['total_hours'] == 2.5
+
+
+@pytest.mark.parametrize('fused', [{'entries': [], 'valid': False}, RuntimeError('upstream error')],
+                         ids=['invalid', 'error'])
+def test_fused_mode_falls_back_to_two_stage(pipeline, fused):
+    pipeline.fused_agent = StubFused(fused)
+    result = pipeline.run('Drafted motion for 2 hours', 'fused')
+    assert pipeline.separations == ['Drafted motion for 2 hours']
+    assert result['narratives'] == [{'text': 'Refined Drafted motion', 'hours': 2.0, 'original': 'Drafted motion'}]
@@ -0,0 +1,126 @@
+import sqlite3
+import time
+
+import pytest
+
+from agents import cache, group_history
+from agents.group_history import MemoryGroupHistory, SQLiteGroupHistory
+from agents.incremental import recall_result, remember_result
+from config import Config
+
+NARRATIVES = [{'original': 'drafted motion', 'hours': 2.0, 'text': 'Draft motion', 'reused': True}]
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def history(request, monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, 'INCREMENTAL_GROUP_HISTORY', True)
+    monkeypatch.setattr(Config, 'INCREMENTAL_HISTORY_BACKEND', request.param)
+    monkeypatch.setattr(Config, 'INCREMENTAL_HISTORY_PATH', str(tmp_path / 'history.sqlite3'))
+    monkeypatch.setattr(Config, 'INCREMENTAL_HISTORY_MAX_ENTRIES', 100)
+    monkeypatch.setattr(Config, 'INCREMENTAL_HISTORY_TTL', 60)
+    monkeypatch.setattr(group_history, '_history', None)
+    return group_history.get_group_history()
+
+
+def test_results_round_trip_without_the_agent_cache(history, monkeypatch):
+    monkeypatch.setattr(Config, 'AGENT_CACHE_BACKEND', 'none')
+    remember_result('g1', 'drafted motion for 2 hours', NARRATIVES)
+    assert recall_result('g1') == {
+        'text': 'drafted motion for 2 hours',
+        'narratives': [{'original': 'drafted motion', 'hours': 2.0, 'text': 'Draft motion'}]
+    }
+    assert recall_result('unknown') is None
+    assert history.size() == 1
+
+
+def test_group_results_stay_out_of_the_response_cache(history, monkeypatch):
+    monkeypatch.setattr(Config, 'AGENT_CACHE_BACKEND', 'memory')
+    response_cache = cache.MemoryCache(10, 60)
+    monkeypatch.setattr(cache, '_cache', response_cache)
+    remember_result('g1', 'text', NARRATIVES)
+    recall_result('g1')
+    assert response_cache.size() == 0
+    assert response_cache.hits == response_cache.misses == 0
+
+
+def test_disabled_history_remembers_nothing(monkeypatch):
+    monkeypatch.setattr(Config, 'INCREMENTAL_GROUP_HISTORY', False)
+    monkeypatch.setattr(group_history, '_history', None)
+    remember_result('g1', 'text', NARRATIVES)
+    assert group_history.get_group_history() is None
+    assert recall_result('g1') is None
+
+
+def test_memory_history_is_bounded_and_expires(monkeypatch):
+    history = MemoryGroupHistory(max_entries=2, ttl=10)
+    for group_id in ('a', 'b', 'c'):
+        history.set(group_id, group_id)
+    assert history.get('a') is None
+    assert history.get('c') == 'c'
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 11)
+    assert history.get('c') is None
+
+
+def test_sqlite_history_is_shared_bounded_and_expires(tmp_path, monkeypatch):
+    path = str(tmp_path / 'history.sqlite3')
+    writer = SQLiteGroupHistory(path, max_entries=2, ttl=10)
+    reader = SQLiteGroupHistory(path, max_entries=2, ttl=10)
+    for group_id in ('a', 'b', 'c'):
+        writer.set(group_id, group_id)
+    assert reader.get('a') == 'a'
+
+    writer.purge()
+    assert reader.get('a') is None
+    assert reader.size() == 2
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 11)
+    assert reader.get('c') is None
+
+
+def test_memory_is_the_default_backend(monkeypatch):
+    monkeypatch.setattr(Config, 'INCREMENTAL_GROUP_HISTORY', True)
+    monkeypatch.delenv('INCREMENTAL_HISTORY_BACKEND', raising=False)
+    assert Config.INCREMENTAL_HISTORY_BACKEND == 'memory'
+    monkeypatch.setattr(group_history, '_history', None)
+    assert isinstance(group_history.get_group_history(), MemoryGroupHistory)
+
+
+class BrokenHistory:
+    def get(self, group_id):
+        raise sqlite3.OperationalError('disk I/O error')
+
+    def set(self, group_id, value):
+        raise sqlite3.OperationalError('database is locked')
+
+
+class StubPipeline:
+    def process(self, text, mode=None, use_cache=True):
+        narrative = {'text': 'Draft motion', 'hours': 2.0, 'original': text}
+        return {'cleaned': text, 'narratives': [narrative], 'total_hours': 2.0}
+
+    def process_incremental(self, text, previous=None, mode=None, use_cache=True):
+        self.previous = previous
+        return self.process(text, mode, use_cache)
+
+
+def test_a_failing_store_does_not_fail_the_enhancement(monkeypatch):
+    from app import app
+    from api.routes import enhance as enhance_routes
+
+    monkeypatch.setattr(Config, 'INCREMENTAL_GROUP_HISTORY', True)
+    monkeypatch.setattr(group_history, '_history', BrokenHistory())
+    pipeline = StubPipeline()
+    monkeypatch.setattr(enhance_routes, 'get_pipeline', lambda: pipeline)
+    client = app.test_client()
+
+    response = client.post('/api/enhance', json={'text': 'drafted motion for 2 hours'})
+    assert response.status_code == 200
+    # An unreadable history means a full run, not an error
+    response = client.post('/api/enhance', json={'text': 'drafted motion for 2 hours',
+                                                 'previousGroupId': response.get_json()['groupId']})
+    assert response.status_code == 200
+    assert pipeline.previous is None
+    assert recall_result('g1') is None
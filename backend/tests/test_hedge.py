@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agents.deadline import deadline, DeadlineExceeded
+from agents.hedge import Hedger
+from config import Config
+
+
+@pytest.fixture
+def hedger(monkeypatch):
+    monkeypatch.setattr(Config, 'HEDGE_ENABLED', True)
+    monkeypatch.setattr(Config, 'HEDGE_MIN_SAMPLES', 5)
+    monkeypatch.setattr(Config, 'HEDGE_PERCENTILE', 95)
+    monkeypatch.setattr(Config, 'HEDGE_MIN_DELAY', 0.05)
+    hedger = Hedger('test')
+    for _ in range(5):
+        hedger.latency.record(0.05)
+    return hedger
+
+
+def test_no_hedging_without_history(monkeypatch):
+    monkeypatch.setattr(Config, 'HEDGE_ENABLED', True)
+    assert Hedger('fresh').hedge_delay() is None
+
+
+def test_no_hedge_that_could_not_finish_in_time(hedger):
+    with deadline(0.04):
+        assert hedger.hedge_delay() is None
+
+
+def test_slow_call_is_hedged_and_the_duplicate_wins(hedger):
+    attempts = []
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            attempts.append(1)
+            first = len(attempts) == 1
+        time.sleep(1.0 if first else 0.01)
+        return 'slow' if first else 'fast'
+
+    start = time.monotonic()
+    assert hedger.call(call) == 'fast'
+    assert time.monotonic() - start < 0.5
+    assert hedger.hedged == 1 and hedger.hedge_wins == 1
+
+
+def test_fast_call_is_not_hedged(hedger):
+    assert hedger.call(lambda: 'ok') == 'ok'
+    assert hedger.hedged == 0
+
+
+def test_hedged_call_stops_waiting_at_the_deadline(hedger):
+    with pytest.raises(DeadlineExceeded):
+        with deadline(0.2):
+            hedger.call(time.sleep, 1)
+
+
+def test_error_is_raised_when_every_attempt_fails(hedger):
+    def fail():
+        time.sleep(0.1)
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        hedger.call(fail)
+
+
+def test_async_hedge_cancels_the_loser(hedger):
+    cancelled = []
+
+    async def call(delay):
+        try:
+            await asyncio.sleep(delay.pop(0))
+            return 'done'
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    delays = [1.0, 0.01]
+    assert asyncio.run(hedger.acall(call, delays)) == 'done'
+    assert hedger.hedge_wins == 1 and cancelled == [1]
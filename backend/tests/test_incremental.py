@@ -0,0 +1,76 @@
+import pytest
+
+from agents.incremental import attribute_entries, plan_incremental, previous_entries
+from agents.chunking import sentence_units
+from config import Config
+
+SENTENCES = [
+    ('Drafted the motion to compel for two hours.', 'Drafted the motion to compel', 2.0),
+    ('Called the client about the settlement for 30 minutes.', 'Called the client about the settlement', 0.5),
+    ('Reviewed the lease agreement for an hour.', 'Reviewed the lease agreement', 1.0),
+    ('Filed the complaint for 15 minutes.', 'Filed the complaint', 0.25),
+    ('Researched the statute of limitations for an hour.', 'Researched the statute of limitations', 1.0),
+    ('Prepared deposition outline for three hours.', 'Prepared deposition outline', 3.0),
+]
+TEXT = ' '.join(sentence for sentence, _, _ in SENTENCES)
+ENTRIES = [{'activity': activity, 'hours': hours} for _, activity, hours in SENTENCES]
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setattr(Config, 'INCREMENTAL_CONTEXT_UNITS', 1)
+    monkeypatch.setattr(Config, 'INCREMENTAL_MAX_CHANGE', 0.6)
+
+
+def test_entries_are_attributed_to_the_unit_they_came_from():
+    units = sentence_units(TEXT)
+    assert attribute_entries(ENTRIES, units) == [0, 1, 2, 3, 4, 5]
+    # An entry matching no unit follows the one before it
+    assert attribute_entries(ENTRIES[:2] + [{'activity': 'misc'}], units) == [0, 1, 1]
+
+
+def test_unchanged_text_keeps_every_entry():
+    assert plan_incremental(TEXT, ENTRIES, TEXT) == [('keep', [0, 1, 2, 3, 4, 5])]
+
+
+def test_an_edit_is_separated_with_its_context():
+    edited = TEXT.replace('Filed the complaint for 15 minutes.', 'Filed the amended complaint for 20 minutes.')
+    assert plan_incremental(TEXT, ENTRIES, edited) == [
+        ('keep', [0, 1]),
+        ('separate', 'Reviewed the lease agreement for an hour. Filed the amended complaint for 20 minutes. '
+                     'Researched the statute of limitations for an hour.'),
+        ('keep', [5]),
+    ]
+
+
+def test_without_context_only_the_edited_sentence_is_separated(monkeypatch):
+    monkeypatch.setattr(Config, 'INCREMENTAL_CONTEXT_UNITS', 0)
+    edited = TEXT + ' Emailed opposing counsel about scheduling.'
+    assert plan_incremental(TEXT, ENTRIES, edited) == [
+        ('keep', [0, 1, 2, 3, 4, 5]),
+        ('separate', 'Emailed opposing counsel about scheduling.'),
+    ]
+
+
+def test_a_deletion_drops_its_entries_and_reruns_the_neighbours():
+    edited = TEXT.replace(' Filed the complaint for 15 minutes.', '')
+    assert plan_incremental(TEXT, ENTRIES, edited) == [
+        ('keep', [0, 1]),
+        ('separate', 'Reviewed the lease agreement for an hour. Researched the statute of limitations for an hour.'),
+        ('keep', [5]),
+    ]
+
+
+def test_large_edits_run_in_full():
+    assert plan_incremental(TEXT, ENTRIES, 'Something else entirely. Another thing. Yet more.') is None
+    assert plan_incremental('', ENTRIES, TEXT) is None
+
+
+def test_previous_entries_reads_an_enhance_response():
+    narratives = [
+        {'original': 'Drafted motion', 'hours': 2.0, 'text': 'Draft motion to compel'},
+        {'original': 'Called client', 'hours': 0.5, 'text': '', 'error': 'timed out'},
+    ]
+    entries, refined = previous_entries(narratives)
+    assert entries == [{'activity': 'Drafted motion', 'hours': 2.0}, {'activity': 'Called client', 'hours': 0.5}]
+    assert refined == [{'text': 'Draft motion to compel'}, {'text': 'Called client', 'error': 'timed out'}]
@@ -0,0 +1,148 @@
+import json
+import threading
+import time
+
+import pytest
+
+import worker
+from config import Config
+from jobs import JobStore, initial_progress
+
+
+class FakePipeline:
+    """iter_run() events for a two-entry dictation; optionally blocks until released"""
+
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def iter_run(self, text, mode=None, use_cache=True):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            if self.gate is not None:
+                self.gate.wait(5)
+            entries = [{'activity': f'{text} a', 'hours': 0.5}, {'activity': f'{text} b', 'hours': 1.0}]
+            yield 'separated', {'entries': entries}
+            narratives = []
+            for index, entry in enumerate(entries):
+                narrative = {'text': entry['activity'], 'hours': entry['hours'], 'original': entry['activity']}
+                narratives.append(narrative)
+                yield 'narrative', {'index': index, 'narrative': narrative}
+            yield 'result', {'cleaned': text, 'narratives': narratives, 'total_hours': 1.5}
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / 'jobs.sqlite3'))
+
+
+def batch_payload(count):
+    return {'items': [{'index': i, 'id': f'rec-{i}', 'text': f'item {i}'} for i in range(count)]}
+
+
+def test_requeue_stale_resets_progress(store):
+    payload = batch_payload(3)
+    job_id = store.submit(payload)
+    job = store.claim()
+    store.update_progress(job_id, job['worker_pid'], {**job['progress'], 'itemsDone': 2, 'entriesTotal': 4, 'entriesDone': 3})
+    store._connect().execute('UPDATE jobs SET heartbeat = ? WHERE id = ?', (time.time() - 60, job_id))
+
+    assert store.requeue_stale(30) == 1
+    requeued = store.get(job_id)
+    assert requeued['status'] == 'queued'
+    assert requeued['progress'] == initial_progress(payload)
+
+
+def test_requeue_stale_leaves_live_jobs(store):
+    job_id = store.submit(batch_payload(1))
+    store.claim()
+    assert store.requeue_stale(30) == 0
+    assert store.get(job_id)['status'] == 'running'
+
+
+def test_rerun_after_requeue_does_not_double_count(store):
+    payload = batch_payload(3)
+    job_id = store.submit(payload)
+    job = store.claim()
+    store.update_progress(job_id, job['worker_pid'], {**job['progress'], 'itemsDone': 2, 'entriesTotal': 4, 'entriesDone': 4})
+    store._connect().execute('UPDATE jobs SET heartbeat = ? WHERE id = ?', (time.time() - 60, job_id))
+    store.requeue_stale(30)
+
+    worker.run_job(store, FakePipeline(), store.claim())
+    finished = store.get(job_id)
+    assert finished['status'] == 'succeeded'
+    assert finished['progress'] == {'itemsTotal': 3, 'itemsDone': 3, 'entriesTotal': 6, 'entriesDone': 6}
+    assert [outcome['index'] for outcome in finished['result']['results']] == [0, 1, 2]
+
+
+def test_run_job_runs_items_concurrently(store, monkeypatch):
+    monkeypatch.setattr(Config, 'JOBS_CONCURRENCY', 3)
+    gate = threading.Event()
+    pipeline = FakePipeline(gate)
+    job_id = store.submit(batch_payload(6))
+    job = store.claim()
+
+    runner = threading.Thread(target=worker.run_job, args=(store, pipeline, job))
+    runner.start()
+    deadline = time.time() + 5
+    while pipeline.running < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    gate.set()
+    runner.join(5)
+
+    assert pipeline.max_running == 3
+    result = store.get(job_id)['result']
+    assert result['succeeded'] == 6 and result['failed'] == 0
+
+
+def test_cancel_stops_running_job(store, monkeypatch):
+    monkeypatch.setattr(Config, 'JOBS_CONCURRENCY', 1)
+    job_id = store.submit(batch_payload(4))
+    job = store.claim()
+    store.cancel(job_id)
+
+    worker.run_job(store, FakePipeline(), job)
+    cancelled = store.get(job_id)
+    assert cancelled['status'] == 'cancelled'
+    assert cancelled['progress']['itemsDone'] < 4
+    assert 'partial' not in json.dumps(cancelled['progress'])
+
+
+def test_a_job_quiet_for_longer_than_the_stale_window_is_not_requeued(store, monkeypatch):
+    monkeypatch.setattr(Config, 'JOBS_HEARTBEAT_SECONDS', 0.05)
+    gate = threading.Event()
+    job_id = store.submit(batch_payload(1))
+    job = store.claim()
+
+    # The item reports no progress until the gate opens
+    runner = threading.Thread(target=worker.run_job, args=(store, FakePipeline(gate), job))
+    runner.start()
+    requeued = 0
+    for _ in range(10):
+        time.sleep(0.05)
+        requeued += store.requeue_stale(0.2)
+    gate.set()
+    runner.join(5)
+
+    assert requeued == 0
+    assert store.get(job_id)['status'] == 'succeeded'
+
+
+def test_a_job_requeued_while_running_keeps_the_new_workers_state(store):
+    job_id = store.submit(batch_payload(2))
+    job = store.claim()
+    # requeue_stale handed the job back and another worker claimed it
+    store._connect().execute('UPDATE jobs SET worker_pid = ? WHERE id = ?', (job['worker_pid'] + 1, job_id))
+
+    assert worker.run_job(store, FakePipeline(), job) is False
+    taken_over = store.get(job_id)
+    assert taken_over['status'] == 'running'
+    assert taken_over['result'] is None
+    assert taken_over['progress'] == initial_progress(job['payload'])
@@ -0,0 +1,113 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from agents import base
+from agents.jsonstream import ItemStreamParser
+from agents.separator import SeparatorAgent
+
+DOCUMENT = json.dumps({
+    'summary': {'entries': [{'activity': 'not an item'}]},
+    'entries': [
+        {'activity': 'reviewed "the {draft}" brief', 'hours': 1.5},
+        {'activity': 'call re: [settlement]\\n', 'hours': 0.25, 'tags': [{'k': 'v'}]},
+        {'activity': 'drafted motion', 'hours': 2.0},
+    ],
+    'notes': [{'activity': 'not an item either'}],
+})
+
+
+def feed_in_pieces(text, size):
+    parser = ItemStreamParser('entries')
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start:start + size]))
+    return parser, items
+
+
+@pytest.mark.parametrize('size', [1, 3, 7, 64, len(DOCUMENT)])
+def test_items_are_returned_however_the_stream_is_split(size):
+    parser, items = feed_in_pieces(DOCUMENT, size)
+    assert items == json.loads(DOCUMENT)['entries']
+    assert parser.text() == DOCUMENT
+    assert not parser.failed
+
+
+def test_an_item_is_returned_as_soon_as_it_closes():
+    parser = ItemStreamParser('entries')
+    assert parser.feed('{"entries": [{"activity": "a", "hours": 1.0}') == [{'activity': 'a', 'hours': 1.0}]
+    assert parser.feed(', {"activity": "b"') == []
+    assert parser.feed(', "hours": 0.5}]}') == [{'activity': 'b', 'hours': 0.5}]
+
+
+def test_a_key_inside_a_string_value_is_not_the_array():
+    parser, items = feed_in_pieces('{"note": "entries", "other": [{"a": 1}]}', 5)
+    assert items == []
+
+
+def test_mismatched_brackets_stop_the_parser():
+    parser = ItemStreamParser('entries')
+    parser.feed('{"entries": [{"activity": "a"]')
+    assert parser.failed
+    assert parser.feed('}, {"activity": "b"}]}') == []
+    assert parser.text().endswith('"b"}]}')
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+def content_chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+
+
+class RecordingRouter:
+    escalate = False
+
+    def __init__(self):
+        self.calls = []
+
+    def choose(self, route, text):
+        return 'large'
+
+    def record(self, route, model, seconds, usage=None):
+        self.calls.append((route, model, usage))
+
+
+@pytest.fixture
+def router(monkeypatch):
+    router = RecordingRouter()
+    monkeypatch.setattr(base, 'get_router', lambda: router)
+    return router
+
+
+def test_streamed_separation_yields_entries_then_accounts_usage(monkeypatch, router):
+    monkeypatch.setenv('AZURE_OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('AZURE_OPENAI_ENDPOINT', 'http://localhost')
+    agent = SeparatorAgent(model='gpt')
+    text = json.dumps({'entries': [{'activity': 'drafted motion', 'hours': 2.0},
+                                   {'activity': 'reviewed brief', 'hours': 0.5}]})
+    usage = SimpleNamespace(prompt_tokens=120, completion_tokens=30)
+    stream = FakeStream([content_chunk(text[i:i + 9]) for i in range(0, len(text), 9)]
+                        + [SimpleNamespace(choices=[], usage=usage)])
+    sent = []
+    monkeypatch.setattr(agent, 'call_model', lambda params: sent.append(params) or stream)
+
+    events = list(agent.iter_entries('drafted motion for 2 hours, reviewed brief for 30 minutes',
+                                     use_cache=False))
+
+    assert [event for event, _ in events] == ['entry', 'entry', 'result']
+    assert len(events[-1][1]['entries']) == 2
+    assert sent[0]['stream'] is True
+    assert sent[0]['stream_options'] == {'include_usage': True}
+    assert stream.closed
+    assert router.calls == [('separator', 'gpt', usage)]
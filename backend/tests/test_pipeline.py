@@ -0,0 +1,163 @@
+import threading
+import time
+
+import pytest
+
+from agents.deadline import DeadlineExceeded, deadline
+from agents.pipeline import AgentPipeline
+from config import Config
+
+
+class StubRefiner:
+    """Refines each activity after its own delay; 'fail' activities raise, 'hang' ones block"""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+
+    def process(self, entry, use_cache=True):
+        activity = entry['activity']
+        with self.lock:
+            self.calls.append(activity)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            if activity.startswith('hang'):
+                self.release.wait(5)
+            time.sleep(self.delays.get(activity, 0))
+            if activity.startswith('fail'):
+                raise RuntimeError('refiner unavailable')
+            return {'refined_narrative': activity.upper()}
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+@pytest.fixture
+def make_pipeline(monkeypatch):
+    monkeypatch.setenv('AZURE_OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('AZURE_OPENAI_ENDPOINT', 'http://localhost')
+    pipelines = []
+
+    def make(refiner, max_workers=4):
+        pipeline = AgentPipeline(max_workers=max_workers)
+        pipeline.refiner_agent = refiner
+        pipelines.append(pipeline)
+        return pipeline
+    yield make
+    for pipeline in pipelines:
+        pipeline.shutdown()
+
+
+def entries(*activities):
+    return [{'activity': activity, 'hours': 1.0} for activity in activities]
+
+
+def test_results_keep_input_order_whatever_order_they_finish_in(make_pipeline):
+    refiner = StubRefiner({'slow': 0.2, 'fast': 0.0, 'medium': 0.1, 'quick': 0.05})
+    pipeline = make_pipeline(refiner)
+    batch = entries('slow', 'fast', 'medium', 'quick')
+
+    assert [index for index, _ in pipeline.iter_refine(batch)] == [1, 3, 2, 0]
+
+    start = time.monotonic()
+    refined = pipeline.refine_entries(batch, use_cache=False)
+    assert [result['text'] for result in refined] == ['SLOW', 'FAST', 'MEDIUM', 'QUICK']
+    # Run side by side, not one after another (0.35 s)
+    assert time.monotonic() - start < 0.3
+
+
+def test_a_failed_refinement_does_not_hold_up_the_others(make_pipeline):
+    refiner = StubRefiner({'fail': 0.0, 'drafted': 0.1, 'called': 0.05})
+    pipeline = make_pipeline(refiner)
+
+    refined = pipeline.refine_entries(entries('drafted', 'fail', 'called'))
+    assert refined[0] == {'text': 'DRAFTED'}
+    assert refined[1] == {'text': 'fail', 'error': 'refiner unavailable'}
+    assert refined[2] == {'text': 'CALLED'}
+
+
+def test_stragglers_fall_back_when_the_deadline_passes(make_pipeline):
+    refiner = StubRefiner()
+    pipeline = make_pipeline(refiner)
+
+    start = time.monotonic()
+    with deadline(0.1):
+        refined = pipeline.refine_entries(entries('drafted', 'hang', 'called'))
+    refiner.release.set()
+
+    assert time.monotonic() - start < 1
+    assert refined[0] == {'text': 'DRAFTED'} and refined[2] == {'text': 'CALLED'}
+    assert refined[1]['text'] == 'hang' and 'deadline' in refined[1]['error']
+
+
+def test_refinements_are_bounded_by_the_pool_size(make_pipeline):
+    refiner = StubRefiner({f'entry {i}': 0.05 for i in range(6)})
+    pipeline = make_pipeline(refiner, max_workers=2)
+
+    refined = pipeline.refine_entries(entries(*[f'entry {i}' for i in range(6)]))
+    assert refiner.max_running == 2
+    assert [result['text'] for result in refined] == [f'ENTRY {i}' for i in range(6)]
+
+
+def test_duplicate_activities_are_refined_once(make_pipeline):
+    refiner = StubRefiner()
+    pipeline = make_pipeline(refiner)
+
+    refined = pipeline.refine_entries(entries('Drafted  motion', 'called client', 'drafted motion'))
+    assert sorted(refiner.calls) == ['Drafted  motion', 'called client']
+    assert refined[0] == refined[2] == {'text': 'DRAFTED  MOTION'}
+
+
+def chunked(pipeline, monkeypatch, release):
+    """Split every sentence into its own chunk; chunks mentioning hang block, fail raise"""
+    monkeypatch.setattr(Config, 'SEPARATOR_CHUNK_WORDS', 4)
+    monkeypatch.setattr(Config, 'SEPARATOR_CHUNK_OVERLAP', 0)
+
+    def separate_chunk(text, use_cache=True):
+        if 'hang' in text:
+            release.wait(5)
+        if 'fail' in text:
+            raise RuntimeError('separator unavailable')
+        return {'entries': [{'activity': text.rstrip('.'), 'hours': 1.0}]}
+    pipeline.separate_chunk = separate_chunk
+
+
+DICTATION = 'Drafted the motion today. Then the separator will hang here. Called the client after lunch.'
+
+
+def test_chunks_are_separated_in_parallel_and_merged(make_pipeline, monkeypatch):
+    pipeline = make_pipeline(StubRefiner())
+    chunked(pipeline, monkeypatch, threading.Event())
+
+    result = pipeline.separate('Drafted the motion today. Called the client after lunch.')
+    assert [entry['activity'] for entry in result['entries']] == ['Drafted the motion today',
+                                                                  'Called the client after lunch']
+
+
+def test_a_stuck_chunk_stops_at_the_deadline(make_pipeline, monkeypatch):
+    release = threading.Event()
+    pipeline = make_pipeline(StubRefiner())
+    chunked(pipeline, monkeypatch, release)
+
+    start = time.monotonic()
+    with deadline(0.1), pytest.raises(DeadlineExceeded):
+        pipeline.separate(DICTATION)
+    release.set()
+    assert time.monotonic() - start < 1
+
+
+def test_a_failed_chunk_fails_without_waiting_for_the_rest(make_pipeline, monkeypatch):
+    release = threading.Event()
+    pipeline = make_pipeline(StubRefiner())
+    chunked(pipeline, monkeypatch, release)
+
+    start = time.monotonic()
+    with pytest.raises(RuntimeError, match='separator unavailable'):
+        pipeline.separate(DICTATION + ' Then this one will fail outright.')
+    release.set()
+    assert time.monotonic() - start < 1
@@ -0,0 +1,85 @@
+import pytest
+
+from agents.preparser import find_durations, misshapen_words, preparse, separation_strategy
+from config import Config
+
+
+@pytest.mark.parametrize('text, hours', [
+    ('Drafted motion to compel for 2 hours', 2.0),
+    ('spent 30 minutes working on a memo', 0.5),
+    ('an hour and a half reviewing the deposition transcript', 1.5),
+    ('call with opposing counsel, about 45 minutes', 0.75),
+    ('half an hour on the privilege log', 0.5),
+])
+def test_durations(text, hours):
+    entries = preparse(text)['entries']
+    assert len(entries) == 1
+    assert entries[0]['hours'] == hours
+
+
+@pytest.mark.parametrize('text, hours', [
+    ('an hour and a half on the brief', 1.5),
+    ('a minute on the phone', 1 / 60),
+    ('1h 15m on the call', 1.25),
+    ('drafted the motion, 2.5hrs', 2.5),
+])
+def test_units_and_articles(text, hours):
+    assert [round(h, 4) for _, h in find_durations(text)] == [round(hours, 4)]
+
+
+@pytest.mark.parametrize('text', [
+    'Call with client at 10 am.',
+    'Hearing at 3 pm.',
+    'I am reviewing the lease agreement.',
+    'Deposition prep from 9:30 am to noon.',
+])
+def test_clock_times_and_am_are_not_durations(text, monkeypatch):
+    monkeypatch.setattr(Config, 'PREPARSER_MODE', 'auto')
+    assert find_durations(text) == []
+    assert separation_strategy(text)[0] != 'skip'
+
+
+@pytest.mark.parametrize('text', [
+    'Reviewed 10 documents in 2 hours',
+    'Reviewed 10 documents for 2 hours in',
+    'Reviewed 10 documents to 2 hours',
+    'Reviewed 10 documents with 2 hours',
+])
+def test_no_dangling_preposition(text):
+    assert preparse(text)['entries'][0]['activity'] == 'Reviewed 10 documents'
+
+
+def test_sentences_split_into_entries():
+    parsed = preparse('Drafted motion to compel for 2 hours. Then had a call with opposing counsel, '
+                      'about 45 minutes. Reviewed emails.')
+    assert [entry['hours'] for entry in parsed['entries']] == [2.0, 0.75, 0.0]
+    assert parsed['confidence'] < 1.0  # the last entry states no time
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Drftd the motn', ['Drftd']),
+    ('Reviewwwed the brief', ['Reviewwwed']),
+    ('Reviewed contrct4', ['contrct4']),
+    ('Drafted the the motion', ['the the']),
+    ('Call regarding NDA with the LLC about the 10-K, 2nd draft', []),
+])
+def test_misshapen_words(text, expected):
+    assert misshapen_words(text) == expected
+
+
+def test_text_needing_cleanup_is_not_skipped(monkeypatch):
+    monkeypatch.setattr(Config, 'PREPARSER_MODE', 'auto')
+    assert separation_strategy('Drafted motion to compel for 2 hours')[0] == 'skip'
+    strategy, parsed = separation_strategy('Drftd motn to compel for 2 hours')
+    assert strategy == 'compact'
+    assert parsed['confidence'] < Config.PREPARSER_SKIP_CONFIDENCE
+
+
+def test_vague_time_goes_to_the_separator(monkeypatch):
+    monkeypatch.setattr(Config, 'PREPARSER_MODE', 'auto')
+    assert separation_strategy('Worked on the brief for a couple of hours')[0] == 'full'
+
+
+def test_off_unless_auto(monkeypatch):
+    monkeypatch.setattr(Config, 'PREPARSER_MODE', 'off')
+    assert separation_strategy('Drafted motion to compel for 2 hours') == ('full', None)
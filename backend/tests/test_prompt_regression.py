@@ -0,0 +1,96 @@
+import os
+import re
+from string import Formatter
+
+import pytest
+
+from benchmarks import prompt_regression as regression
+from agents.fused import FusedAgent
+from agents.refiner import RefinerAgent
+from agents.separator import CompactSeparatorAgent, SeparatorAgent
+from prompts import PROMPT_TEMPLATES
+
+PLACEHOLDER_RE = re.compile(r'\{[a-z_]+\}')
+REFINER_ITEMS = regression.load_corpus(regression.REFINER_CORPUS)['items']
+SEPARATOR_ITEMS = regression.load_corpus(regression.SEPARATOR_CORPUS)['items']
+
+live = pytest.mark.skipif(not os.getenv('PROMPT_REGRESSION_LIVE'),
+                          reason='set PROMPT_REGRESSION_LIVE to run against Azure OpenAI')
+
+
+@pytest.mark.parametrize('item', REFINER_ITEMS, ids=lambda item: item['activity'][:30])
+def test_recorded_narratives_follow_refiner_rules(item):
+    assert regression.narrative_problems(item['activity'], item['narrative']) == []
+
+
+@pytest.mark.parametrize('item', SEPARATOR_ITEMS, ids=lambda item: item['text'][:30])
+def test_recorded_entries_invent_nothing(item):
+    for entry in item['entries']:
+        assert regression.invented_terms(item['text'], entry['activity']) == []
+
+
+@pytest.mark.parametrize('narrative, problem', [
+    ('', 'empty'),
+    ('Reviewed documents', 'present tense'),
+    ('Drafting memorandum', 'present tense'),
+    ('Review 12 documents', '12'),
+    ('Review documents from Acme Corp', 'Acme, Corp'),
+    ('Review documents.\nAnalyze provisions', 'several lines'),
+])
+def test_narrative_problems(narrative, problem):
+    problems = regression.narrative_problems('reviewed documents', narrative)
+    assert any(problem in p for p in problems)
+
+
+def test_sentence_openers_are_not_proper_nouns():
+    assert regression.invented_terms('review and revise the lease',
+                                     'Review lease. Revise lease') == []
+
+
+def test_entries_problems():
+    expected = [{'activity': 'drafted motion', 'hours': 1.5}]
+    text = 'drafted motion for 90 minutes'
+    assert regression.entries_problems(text, [{'activity': 'drafted motion', 'hours': 1.5}], expected) == []
+    assert regression.entries_problems(text, [], expected) == ['0 entries, expected 1']
+    assert 'entry 0: 90.0 hours' in regression.entries_problems(
+        text, [{'activity': 'drafted motion', 'hours': 90}], expected)[0]
+    assert 'Smith' in regression.entries_problems(
+        text, [{'activity': 'drafted motion for Smith', 'hours': 1.5}], expected)[0]
+
+
+@pytest.mark.parametrize('name', PROMPT_TEMPLATES)
+def test_templates_keep_the_variable_input_in_the_user_message(name):
+    template = PROMPT_TEMPLATES[name]
+    fields = {field for _, field, _, _ in Formatter().parse(template['user']) if field}
+    assert template['version']
+    assert fields, name
+    # System prompts are sent unformatted (their JSON braces are literal), so
+    # a placeholder there would reach the model as-is
+    assert not any('{' + field + '}' in template['system'] for field in fields), name
+    assert not PLACEHOLDER_RE.search(template['system']), name
+
+
+@pytest.mark.parametrize('agent_class, first, second', [
+    (SeparatorAgent, 'Drafted motion for 2 hours', 'Called client for 30 minutes'),
+    (CompactSeparatorAgent, 'Drafted motion for 2 hours', 'Called client for 30 minutes'),
+    (FusedAgent, 'Drafted motion for 2 hours', 'Called client for 30 minutes'),
+    (RefinerAgent, {'activity': 'Drafted motion', 'hours': 2.0}, {'activity': 'Called client', 'hours': 0.5}),
+])
+def test_every_input_shares_the_system_prefix(agent_class, first, second, monkeypatch):
+    monkeypatch.setenv('AZURE_OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('AZURE_OPENAI_ENDPOINT', 'http://localhost')
+    agent = agent_class(model='gpt')
+    a, b = agent.build_params(first)['messages'], agent.build_params(second)['messages']
+    assert [message['role'] for message in a] == ['system', 'user']
+    assert a[0] == b[0]
+    assert a[1] != b[1]
+
+
+@live
+def test_live_refiner_outputs():
+    assert regression.check_refiner(regression.REFINER_CORPUS) == []
+
+
+@live
+def test_live_separator_outputs():
+    assert regression.check_separator(regression.SEPARATOR_CORPUS) == []
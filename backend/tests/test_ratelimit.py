@@ -0,0 +1,213 @@
+import asyncio
+import time
+from email.utils import formatdate
+
+import httpx
+import openai
+import pytest
+
+from agents import ratelimit
+from agents.circuit import CircuitBreaker
+from agents.deadline import deadline, DeadlineExceeded
+from agents.ratelimit import (AdaptiveConcurrency, AzureRateLimiter, SharedTokenBucket, TokenBucket,
+                              retry_after)
+
+REQUEST = httpx.Request('POST', 'https://example.openai.azure.com/openai/deployments/gpt/chat/completions')
+
+
+def throttled(headers=None):
+    return openai.RateLimitError('Too Many Requests', response=httpx.Response(429, headers=headers, request=REQUEST),
+                                 body=None)
+
+
+def server_error(status=500):
+    return openai.InternalServerError('Server Error', response=httpx.Response(status, request=REQUEST), body=None)
+
+
+def bad_request():
+    return openai.BadRequestError('Bad Request', response=httpx.Response(400, request=REQUEST), body=None)
+
+
+@pytest.fixture(autouse=True)
+def breaker(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    monkeypatch.setattr(ratelimit, 'get_circuit_breaker', lambda: breaker)
+    return breaker
+
+
+def test_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.1, abs=0.02)
+
+
+def test_zero_rate_is_unlimited():
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.try_acquire() == 0 for _ in range(100))
+
+
+def test_pause_holds_every_caller_back():
+    bucket = TokenBucket(rate=100, capacity=100)
+    bucket.pause(0.5)
+    assert bucket.try_acquire() == pytest.approx(0.5, abs=0.05)
+
+
+def test_acquire_fails_fast_past_the_deadline():
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.try_acquire()
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        with deadline(0.1):
+            bucket.acquire()
+    assert time.monotonic() - start < 0.1
+
+
+def test_shared_bucket_is_one_quota_across_instances(tmp_path):
+    # Two instances on one state file stand in for two worker processes
+    first = SharedTokenBucket(str(tmp_path / 'requests.bucket'), rate=1, capacity=2)
+    second = SharedTokenBucket(str(tmp_path / 'requests.bucket'), rate=1, capacity=2)
+    assert first.try_acquire() == 0
+    assert second.try_acquire() == 0
+    assert first.try_acquire() > 0
+    second.pause(5)
+    assert first.try_acquire() == pytest.approx(5, abs=0.1)
+
+
+def test_aimd_halves_once_per_burst_and_grows_additively():
+    limit = AdaptiveConcurrency(max_limit=16)
+    for _ in range(4):
+        limit.enter()
+    for _ in range(4):
+        limit.exit(throttled=True)
+    assert limit.limit == 8  # one decrease for the whole burst
+
+    limit.enter()
+    limit.exit()
+    assert limit.limit == pytest.approx(8 + 1 / 8)
+
+
+def test_aimd_enter_waits_for_a_slot_until_the_deadline():
+    limit = AdaptiveConcurrency(max_limit=1)
+    limit.enter()
+    with pytest.raises(DeadlineExceeded):
+        with deadline(0.05):
+            limit.enter()
+
+
+@pytest.mark.parametrize('headers, expected', [
+    ({'retry-after-ms': '1500'}, 1.5),
+    ({'retry-after': '3'}, 3.0),
+    ({}, None),
+])
+def test_retry_after_headers(headers, expected):
+    assert retry_after(throttled(headers)) == expected
+
+
+def test_retry_after_http_date():
+    value = retry_after(throttled({'retry-after': formatdate(time.time() + 10, usegmt=True)}))
+    assert 8 < value <= 10
+
+
+def test_throttled_call_waits_retry_after_then_succeeds(breaker):
+    limiter = AzureRateLimiter(rpm=600, base_delay=0.01)
+    outcomes = [throttled({'retry-after-ms': '200'}), 'ok']
+    calls = []
+
+    def create(**kwargs):
+        calls.append(time.monotonic())
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert limiter.call(create, {'messages': []}) == 'ok'
+    assert calls[1] - calls[0] >= 0.2
+    assert limiter.throttled == 1 and limiter.retries == 1
+    assert breaker.failures == 0  # 429s are pacing, not an outage
+
+
+def test_transient_errors_are_retried_and_counted_by_the_breaker(breaker):
+    limiter = AzureRateLimiter(base_delay=0.001)
+    outcomes = [server_error(503), server_error(502), 'ok']
+
+    def create(**kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert limiter.call(create, {'messages': []}) == 'ok'
+    assert limiter.retries == 2
+    assert breaker.state == 'closed' and breaker.failures == 0
+
+
+def test_client_errors_are_not_retried():
+    limiter = AzureRateLimiter(base_delay=0.001)
+    calls = []
+
+    def create(**kwargs):
+        calls.append(1)
+        raise bad_request()
+
+    with pytest.raises(openai.BadRequestError):
+        limiter.call(create, {'messages': []})
+    assert calls == [1]
+
+
+def test_retry_after_past_the_deadline_fails_now():
+    limiter = AzureRateLimiter()
+
+    def create(**kwargs):
+        raise throttled({'retry-after': '30'})
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        with deadline(1):
+            limiter.call(create, {'messages': []})
+    assert time.monotonic() - start < 0.5
+
+
+def test_attempts_carry_the_remaining_deadline_as_timeout():
+    limiter = AzureRateLimiter()
+    seen = {}
+
+    def create(**kwargs):
+        seen.update(kwargs)
+        return 'ok'
+
+    with deadline(5):
+        limiter.call(create, {'messages': []})
+    assert 0 < seen['timeout'] <= 5
+
+
+def test_deadline_while_waiting_for_a_slot_leaves_the_probe_free(breaker):
+    limiter = AzureRateLimiter(max_concurrency=1)
+    breaker.state, breaker.opened_at = 'open', time.monotonic() - 60  # due a half-open probe
+    limiter.concurrency.enter()
+    with pytest.raises(DeadlineExceeded):
+        with deadline(0.05):
+            limiter.call(lambda **kwargs: 'ok', {'messages': []})
+    limiter.concurrency.exit()
+
+    assert limiter.call(lambda **kwargs: 'ok', {'messages': []}) == 'ok'
+    assert breaker.state == 'closed'
+
+
+def test_async_deadline_while_waiting_for_a_slot_leaves_the_probe_free(breaker):
+    limiter = AzureRateLimiter(max_concurrency=1)
+    breaker.state, breaker.opened_at = 'open', time.monotonic() - 60
+
+    async def create(**kwargs):
+        return 'ok'
+
+    async def scenario():
+        limiter.concurrency.enter()
+        with pytest.raises(DeadlineExceeded):
+            with deadline(0.1):
+                await limiter.acall(create, {'messages': []})
+        limiter.concurrency.exit()
+        return await limiter.acall(create, {'messages': []})
+
+    assert asyncio.run(scenario()) == 'ok'
+    assert breaker.state == 'closed'
@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+
+import pytest
+
+from agents import router
+from agents.refiner import RefinerAgent
+from agents.router import ModelRouter, is_simple, parse_policies
+
+
+def test_policies_parse_and_unknown_ones_use_large():
+    assert parse_policies(' Refiner = AUTO , separator=small,fused=medium,junk,') == {
+        'refiner': 'auto', 'separator': 'small', 'fused': 'large'}
+    assert parse_policies('') == {}
+
+
+@pytest.mark.parametrize('text, simple', [
+    ('Called client for 30 minutes', True),
+    ('Reviewed the lease agreement', True),
+    ('', False),
+    ('Drafted motion for 2 hours and called client for 30 minutes', False),
+    ('Drafted the motion. Called the client.', False),
+    ('Reviewed the lengthy commercial lease agreement and the three amendments the landlord sent over', False),
+])
+def test_simple_inputs(text, simple):
+    assert is_simple(text, 12) is simple
+
+
+def make_router(**kwargs):
+    options = dict(large='gpt-large', small='gpt-small',
+                   policies={'refiner': 'auto', 'compact_separator': 'small', 'separator': 'large'})
+    options.update(kwargs)
+    return ModelRouter(**options)
+
+
+def test_routes_follow_their_policy():
+    model_router = make_router()
+    assert model_router.choose('refiner', 'Called client') == 'small'
+    assert model_router.choose('refiner', 'Drafted the motion. Called the client.') == 'large'
+    assert model_router.choose('compact_separator', 'Drafted the motion. Called the client.') == 'small'
+    assert model_router.choose('separator', 'Called client') == 'large'
+    assert model_router.choose('unlisted', 'Called client') == 'large'
+    assert model_router.choose(None, 'Called client') == 'large'
+    assert model_router.deployment('small') == 'gpt-small'
+
+
+@pytest.mark.parametrize('small', [None, '', 'gpt-large'])
+def test_without_a_distinct_small_deployment_everything_is_large(small):
+    model_router = make_router(small=small)
+    assert model_router.choose('compact_separator', 'Called client') == 'large'
+    assert model_router.deployment('small') == 'gpt-large'
+
+
+def test_stats_are_kept_per_route_and_tier():
+    model_router = make_router()
+    model_router.record('refiner', 'gpt-small', 0.2, SimpleNamespace(prompt_tokens=100, completion_tokens=20))
+    model_router.record('refiner', 'gpt-small', 0.4)
+    model_router.record('refiner', 'gpt-large', 1.0)
+    model_router.record_escalation('refiner')
+    stats = model_router.stats()
+    assert stats['refiner:small'] == {'calls': 2, 'meanLatencyMs': 300.0, 'promptTokens': 100,
+                                      'completionTokens': 20, 'escalations': 1}
+    assert stats['refiner:large']['calls'] == 1
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    """Unpinned refiner whose small deployment returns an empty narrative"""
+    monkeypatch.setenv('AZURE_OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('AZURE_OPENAI_ENDPOINT', 'http://localhost')
+    monkeypatch.setenv('AZURE_OPENAI_GPT_DEPLOYMENT', 'gpt-large')
+    monkeypatch.setattr(router, '_router', make_router())
+    agent = RefinerAgent()
+    agent.models = []
+
+    def call_model(params):
+        agent.models.append(params['model'])
+        content = '' if params['model'] == 'gpt-small' else 'Telephone conference with client.'
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    agent.call_model = call_model
+    return agent
+
+
+def test_invalid_small_results_escalate_to_large(agent):
+    result = agent.process({'activity': 'Called client', 'hours': 0.5}, use_cache=False)
+    assert result == {'refined_narrative': 'Telephone conference with client.'}
+    assert agent.models == ['gpt-small', 'gpt-large']
+    assert router.get_router().stats()['refiner:small']['escalations'] == 1
+
+
+def test_escalation_can_be_turned_off(agent):
+    router.get_router().escalate = False
+    result = agent.process({'activity': 'Called client', 'hours': 0.5}, use_cache=False)
+    assert result == {'refined_narrative': ''}
+    assert agent.models == ['gpt-small']
+
+
+def test_a_pinned_model_is_never_routed(agent):
+    pinned = RefinerAgent(model='gpt-pinned')
+    entry = {'activity': 'Called client', 'hours': 0.5}
+    assert pinned.choose_tier(entry) == 'large'
+    assert pinned.build_params(entry)['model'] == 'gpt-pinned'
@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+
+import pytest
+
+from agents.deadline import deadline, DeadlineExceeded
+from agents.singleflight import SingleFlight, cross_worker_lock_dir
+from config import Config
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'done'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('key', work)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('key', work))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ['done'] * 4
+
+
+def test_followers_share_the_error():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError('boom')
+
+    errors = []
+
+    def call():
+        try:
+            flight.do('key', fail)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert len(errors) == 2 and errors[0] is errors[1]
+
+
+def test_follower_gives_up_at_its_deadline():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+
+    leader = threading.Thread(target=flight.do, args=('key', slow))
+    leader.start()
+    started.wait(5)
+    with pytest.raises(DeadlineExceeded):
+        with deadline(0.05):
+            flight.do('key', slow)
+    release.set()
+    leader.join(5)
+
+
+def test_file_lock_is_per_key_and_bounded_by_deadline(tmp_path):
+    # Two instances on one directory stand in for two worker processes
+    first, second = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    started = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+        return 'first'
+
+    holder = threading.Thread(target=first.do, args=('key', hold))
+    holder.start()
+    started.wait(5)
+
+    # An unrelated key is not held up
+    assert second.do('other', lambda: 'other') == 'other'
+    # The same key waits, but only until the deadline
+    begin = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        with deadline(0.2):
+            second.do('key', lambda: 'second')
+    assert time.monotonic() - begin < 1
+
+    release.set()
+    holder.join(5)
+    assert second.do('key', lambda: 'second') == 'second'
+    assert os.listdir(tmp_path) == []
+
+
+def test_file_lock_waits_for_the_holder(tmp_path):
+    first, second = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    started = threading.Event()
+    order = []
+
+    def hold():
+        started.set()
+        time.sleep(0.2)
+        order.append('first')
+
+    holder = threading.Thread(target=first.do, args=('key', hold))
+    holder.start()
+    started.wait(5)
+    second.do('key', lambda: order.append('second'))
+    holder.join(5)
+    assert order == ['first', 'second']
+
+
+def test_lock_dir_needs_the_sqlite_cache(monkeypatch, caplog):
+    monkeypatch.setattr(Config, 'SINGLEFLIGHT_LOCK_DIR', '/tmp/locks')
+    monkeypatch.setattr(Config, 'AGENT_CACHE_BACKEND', 'memory')
+    assert cross_worker_lock_dir() is None
+    assert 'AGENT_CACHE_BACKEND=sqlite' in caplog.text
+
+    monkeypatch.setattr(Config, 'AGENT_CACHE_BACKEND', 'sqlite')
+    assert cross_worker_lock_dir() == '/tmp/locks'
+
+
+def test_async_calls_share_one_execution():
+    import asyncio
+    from agents.singleflight import AsyncSingleFlight
+
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'done'
+
+    async def main():
+        return await asyncio.gather(*(flight.do('key', work) for _ in range(4)))
+
+    assert asyncio.run(main()) == ['done'] * 4
+    assert calls == [1]
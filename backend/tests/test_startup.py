@@ -0,0 +1,81 @@
+import logging
+import sys
+
+import pytest
+
+import agents
+from agents import cache, client, pipeline, async_pipeline, ratelimit, router, warmup
+from benchmarks import startup_bench
+
+DEFERRED = ('openai', 'httpx')
+
+
+@pytest.mark.parametrize('module', ['app', 'asgi'])
+def test_importing_the_app_defers_the_sdk(module):
+    result = startup_bench.run_once(module, DEFERRED)
+    assert result['eager'] == []
+    assert result['cumulative_ms'] > 0
+
+
+def test_warm_up_imports_what_the_app_deferred():
+    result = startup_bench.run_once('app', DEFERRED, measure_deferred=True)
+    assert result['deferred'] > 0
+
+
+def test_package_exports_resolve_on_first_use():
+    assert agents.RefinerAgent.__module__ == 'agents.refiner'
+    assert 'RefinerAgent' in vars(agents)
+    assert set(agents.__all__) <= set(dir(agents))
+    with pytest.raises(AttributeError):
+        agents.NotAnAgent
+
+
+IMPORTTIME = '''import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     json.decoder
+import time:       300 |        400 |   json
+import time:      2000 |       2000 |     flask.app
+import time:      1000 |       3000 |   flask
+import time:       500 |       3900 | app
+import time:        50 |         50 | unrelated
+'''
+
+
+def test_import_report_is_parsed_per_package():
+    rows = startup_bench.parse_importtime(IMPORTTIME)
+    assert rows[0] == (100, 100, 2, 'json.decoder')
+    assert rows[4] == (500, 3900, 0, 'app')
+    assert startup_bench.top_packages(rows, 'app', 2) == [('flask', 3.0), ('json', 0.4)]
+
+
+@pytest.mark.parametrize('cumulative_ms, eager, code', [
+    (300, [], 0),
+    (700, [], 1),
+    (300, ['openai'], 1),
+])
+def test_budget_and_eager_imports_fail_the_run(cumulative_ms, eager, code, monkeypatch, capsys):
+    def run_once(module, forbid, measure_deferred=False):
+        return {'rows': startup_bench.parse_importtime(IMPORTTIME), 'cumulative_ms': cumulative_ms,
+                'imported': 0.0, 'eager': eager, 'deferred': 0.5 if measure_deferred else None}
+    monkeypatch.setattr(startup_bench, 'run_once', run_once)
+    monkeypatch.setattr(sys, 'argv', ['startup_bench.py', '--runs', '3', '--budget-ms', '500'])
+    assert startup_bench.main() == code
+    assert ('✓ within' in capsys.readouterr().out) == (code == 0)
+
+
+def test_a_failing_warm_up_step_is_skipped(monkeypatch, caplog):
+    built = []
+    monkeypatch.setattr(warmup, 'HEAVY_MODULES', ('json',))
+
+    def missing_settings():
+        raise ValueError('AZURE_OPENAI_API_KEY environment variable is required')
+    monkeypatch.setattr(client, 'get_client', missing_settings)
+    for module, name in ((cache, 'get_cache'), (ratelimit, 'get_rate_limiter'), (router, 'get_router'),
+                         (pipeline, 'get_pipeline'), (async_pipeline, 'get_async_pipeline')):
+        monkeypatch.setattr(module, name, lambda name=name: built.append(name))
+
+    with caplog.at_level(logging.WARNING, logger='agents.warmup'):
+        timings = warmup.warm_up()
+
+    assert list(timings) == ['imports', 'cache', 'rate_limiter', 'router', 'pipeline', 'async_pipeline']
+    assert built == ['get_cache', 'get_rate_limiter', 'get_router', 'get_pipeline', 'get_async_pipeline']
+    assert 'Warm-up step client failed' in caplog.text
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Job worker for Time Composer
+
+Runs queued /api/jobs enhancements outside the web workers, so long
+dictations and batches are not bound by the gunicorn request timeout.
+
+Usage (from the backend directory):
+    python worker.py
+"""
+
+import argparse
+import contextvars
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from agents import get_pipeline
+from api.routes.enhance import format_enhance_response, format_narrative
+from config import Config
+from jobs import get_job_store, initial_progress, public_job
+from logs import configure_logging, set_request_id
+
+_stopping = False
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def notify_webhook(job):
+    """POST the finished job to its webhook, if webhooks are enabled"""
+    if not job.get('webhook') or not Config.JOBS_WEBHOOKS_ENABLED:
+        return
+    import requests
+    try:
+        requests.post(job['webhook'], json=public_job(job), timeout=10)
+    except Exception as e:
+        print(f"Warning: Webhook for job {job['id']} failed: {e}")
+
+
+def run_item(pipeline, payload, item, progress, lock, report):
+    """Run one job item through the pipeline, reporting its progress as it goes.
+
+    progress is shared by the job's items; it is only changed under lock.
+    """
+    outcome = {'index': item['index'], 'id': item.get('id')}
+    key = str(item['index'])
+    try:
+        events = pipeline.iter_run(item['text'], item.get('mode') or payload.get('mode'),
+                                   use_cache=not payload.get('bypassCache', False))
+        for event, event_payload in events:
+            if event == 'separated':
+                with lock:
+                    progress['entriesTotal'] += len(event_payload['entries'])
+                    progress['partial'][key] = [None] * len(event_payload['entries'])
+            elif event == 'narrative':
+                with lock:
+                    progress['entriesDone'] += 1
+                    progress['partial'][key][event_payload['index']] = format_narrative(event_payload['narrative'])
+            elif event == 'result':
+                result = format_enhance_response(item['text'], event_payload, payload.get('compact', False))
+                outcome.update(status='ok', result=result)
+            report()
+    except JobCancelled:
+        raise
+    except Exception as e:
+        outcome.update(status='error', error=f'Enhancement failed: {str(e)}')
+
+    with lock:
+        progress['itemsDone'] += 1
+        progress['partial'].pop(key, None)
+    report()
+    return outcome
+
+
+def keep_alive(store, job, lost, stop):
+    """Heartbeat a running job every JOBS_HEARTBEAT_SECONDS until stop is set.
+
+    Items can go longer than JOBS_STALE_SECONDS without reporting progress,
+    so the heartbeat does not wait for it. Sets lost if the job was requeued.
+    """
+    while not stop.wait(Config.JOBS_HEARTBEAT_SECONDS):
+        if not store.heartbeat(job['id'], job['worker_pid']):
+            lost.set()
+            return
+
+
+def run_job(store, pipeline, job):
+    """Run a claimed job, up to JOBS_CONCURRENCY items at a time.
+
+    Progress always starts over: a job requeued after a worker died runs
+    every item again. partial holds the narratives refined so far for each
+    item in progress, by item index. Returns False, without recording a
+    result, if the job was requeued to another worker while it ran.
+    """
+    payload = job['payload']
+    progress = initial_progress(payload)
+    progress['partial'] = {}
+    lock = threading.Lock()
+    cancelled = threading.Event()
+    lost = threading.Event()
+    stop = threading.Event()
+
+    def report():
+        with lock:
+            if not store.update_progress(job['id'], job['worker_pid'], progress):
+                lost.set()
+        if lost.is_set() or cancelled.is_set() or store.cancel_requested(job['id']):
+            cancelled.set()
+            raise JobCancelled()
+
+    def run(item):
+        if cancelled.is_set():
+            raise JobCancelled()
+        return run_item(pipeline, payload, item, progress, lock, report)
+
+    results = []
+    heartbeat = threading.Thread(target=keep_alive, args=(store, job, lost, stop),
+                                 name='job-heartbeat', daemon=True)
+    heartbeat.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, Config.JOBS_CONCURRENCY), thread_name_prefix='job') as executor:
+            # Items run in a copy of this context so their logs carry the job id
+            futures = [executor.submit(contextvars.copy_context().run, run, item) for item in payload['items']]
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except JobCancelled:
+                    cancelled.set()
+    finally:
+        stop.set()
+        heartbeat.join()
+    results.sort(key=lambda outcome: outcome['index'])
+
+    if lost.is_set():
+        return False
+    progress.pop('partial', None)
+    if cancelled.is_set():
+        return store.finish(job['id'], job['worker_pid'], 'cancelled',
+                            result=job_result(payload, results), progress=progress)
+    if payload.get('single') and results[0]['status'] != 'ok':
+        return store.finish(job['id'], job['worker_pid'], 'failed', error=results[0]['error'], progress=progress)
+    return store.finish(job['id'], job['worker_pid'], 'succeeded',
+                        result=job_result(payload, results), progress=progress)
+
+
+def job_result(payload, results):
+    """Single-text jobs return the /api/enhance body; batches return per-item results"""
+    if payload.get('single'):
+        return results[0].get('result') if results else None
+    succeeded = sum(1 for outcome in results if outcome['status'] == 'ok')
+    return {'results': results, 'succeeded': succeeded, 'failed': len(results) - succeeded}
+
+
+def handle_signal(signum, frame):
+    global _stopping
+    _stopping = True
+    print("Worker stopping after the current job...")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run queued enhancement jobs')
+    parser.add_argument('--poll-interval', type=float, default=Config.JOBS_POLL_INTERVAL)
+    parser.add_argument('--once', action='store_true', help='exit when the queue is empty')
+    args = parser.parse_args()
+
+    configure_logging()
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    store = get_job_store()
+    pipeline = get_pipeline()
+    last_maintenance = 0.0
+    print(f"✓ Job worker started ({Config.JOBS_DB_PATH})")
+
+    while not _stopping:
+        if time.time() - last_maintenance > 60:
+            store.requeue_stale(Config.JOBS_STALE_SECONDS)
+            store.purge_expired()
+            last_maintenance = time.time()
+
+        job = store.claim()
+        if job is None:
+            if args.once:
+                break
+            time.sleep(args.poll_interval)
+            continue
+
+        print(f"Running job {job['id']} ({len(job['payload']['items'])} item(s))")
+        set_request_id(job['id'])  # correlate the job's pipeline logs
+        try:
+            finished = run_job(store, pipeline, job)
+        except Exception as e:
+            print(f"✗ Job {job['id']} failed: {e}")
+            finished = store.finish(job['id'], job['worker_pid'], 'failed', error=str(e))
+        if finished:
+            notify_webhook(store.get(job['id']))
+        else:
+            print(f"Warning: Job {job['id']} was requeued while running; its result was dropped")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -481,13 +481,22 @@ class AIAssistant {
             // Show what we heard
             this.addAssistantThinking('I heard you say: "' + this.finalTranscript.trim() + '"');
             
-            // Simulate AI processing steps
-            await this.simulateAIProcessing();
-            
             try {
-                // Process with enhancement API
+                // Stream the enhancement so the progress shown is the pipeline's own
                 console.log('🔄 Processing recorded text...');
-                const response = await api.enhance(this.finalTranscript);
+                this.updateThinkingMessage('Separator Agent: Cleaning text and identifying billable activities...');
+                let total = 0;
+                let refined = 0;
+                const response = await api.enhanceStream(this.finalTranscript, {
+                    onSeparated: ({ entries }) => {
+                        total = entries.length;
+                        this.updateThinkingMessage(`Refiner Agent: Crafting narratives for ${total} ${total === 1 ? 'activity' : 'activities'}...`);
+                    },
+                    onNarrative: () => {
+                        refined += 1;
+                        this.updateThinkingMessage(`Refiner Agent: ${refined} of ${total} narratives ready...`);
+                    }
+                });
                 console.log('✅ Enhancement complete');
                 
                 // Store original text in response for later use
@@ -578,19 +587,6 @@ class AIAssistant {
         return num;
     }
 
-    async simulateAIProcessing() {
-        const steps = [
-            { message: 'Processing your input...', delay: 600 },
-            { message: 'Separator Agent: Cleaning text and identifying billable activities...', delay: 700 },
-            { message: 'Refiner Agent: Crafting professional billing narratives...', delay: 800 }
-        ];
-        
-        for (const step of steps) {
-            this.updateThinkingMessage(step.message);
-            await new Promise(resolve => setTimeout(resolve, step.delay));
-        }
-    }
-
     showConversationalResults(response) {
         this.currentMode = 'confirmation';
         this.lastResponse = response; // Store for saving later
@@ -40,6 +40,53 @@ const api = {
         }
         
         return response.json();
+    },
+
+    // Streaming variant of enhance(). Calls onSeparated({entries, totalHours}) once
+    // the activities are known and onNarrative(index, narrative) as each one is
+    // refined, then resolves with the same object enhance() returns.
+    async enhanceStream(text, { onSeparated, onNarrative } = {}) {
+        const response = await fetch(`${API_BASE}/enhance/stream`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ text })
+        });
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.error || 'Enhancement failed');
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                }
+                const payload = data ? JSON.parse(data) : {};
+
+                if (event === 'separated' && onSeparated) onSeparated(payload);
+                else if (event === 'narrative' && onNarrative) onNarrative(payload.index, payload.narrative);
+                else if (event === 'done') return payload;
+                else if (event === 'error') throw new Error(payload.error || 'Enhancement failed');
+            }
+        }
+
+        throw new Error('Enhancement stream ended unexpectedly');
     }
 };
 